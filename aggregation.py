@@ -0,0 +1,183 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import AGG_CACHE_MAX_BYTES, PRECOMPUTE_AGGREGATES, PRECOMPUTE_MAX_GROUPS
+from lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# 界面上的统计指标名称与pandas聚合函数的对应关系
+AGG_FUNCS = {
+    '计数': 'count',
+    '求和': 'sum',
+    '平均值': 'mean',
+    '最大值': 'max',
+    '最小值': 'min',
+    '中位数': 'median',
+    '标准差': 'std'
+}
+
+# 可由更细分组的结果合并得到的聚合，平均值由求和与计数推导
+BASE_AGGS = ['count', 'sum', 'min', 'max']
+DECOMPOSABLE_AGGS = set(BASE_AGGS) | {'mean'}
+
+# 由细分组合并到粗分组时各基础聚合的合并方式
+MERGE_FUNCS = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def _select(result: pd.DataFrame, funcs: List[str]) -> Optional[pd.DataFrame]:
+    """从缓存的聚合结果中取出所需的列，缺少时返回None"""
+    columns = {}
+    for func in funcs:
+        if func in result.columns:
+            columns[func] = result[func]
+        elif func == 'mean' and {'sum', 'count'} <= set(result.columns):
+            columns[func] = result['sum'] / result['count'].replace(0, np.nan)
+        else:
+            return None
+    return pd.DataFrame(columns, index=result.index)
+
+
+def _null_columns(df: pd.DataFrame, group_cols) -> frozenset:
+    """含空值的分组列（分组时这些行被丢弃）"""
+    return frozenset(col for col in group_cols if df[col].hasnans)
+
+
+class AggregationCache:
+    """
+    按 (文件标识, 分组列, 统计列) 缓存分组聚合结果，按字节预算进行LRU淘汰
+
+    每次计算都附带计数、求和、最小值、最大值，后续请求这些聚合及平均值时直接取用；
+    较粗的分组可由已缓存的较细分组再次聚合得到。
+    """
+
+    def __init__(self, max_bytes: int):
+        # 条目为 (结果, 含空值的分组列)；超过整个预算的结果不缓存
+        self._entries = LRUCache(max_bytes, sizeof=lambda entry: int(entry[0].memory_usage(deep=True).sum()))
+
+    def _find_finer(self, fingerprint: tuple, group_cols: tuple, value_col: str) -> Optional[tuple]:
+        """
+        查找分组列包含所需分组列的已缓存条目，优先分组数最少的
+
+        较细分组会丢弃多出的分组列为空的行，这些行在较粗分组中仍然计入，
+        因此多出的分组列含空值的条目不能用于合并。
+        """
+        wanted = set(group_cols)
+        candidates = [
+            (result, null_cols) for (fp, cols, col), (result, null_cols) in self._entries.items()
+            if fp == fingerprint and col == value_col and wanted < set(cols)
+            and set(BASE_AGGS) <= set(result.columns) and not (null_cols - wanted)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda entry: len(entry[0]))
+
+    def aggregate(self, df: pd.DataFrame, fingerprint: tuple, group_cols: List[str], value_col: str,
+                  funcs: List[str]) -> pd.DataFrame:
+        """返回按 group_cols 分组后 value_col 的 funcs 聚合结果，列顺序与 funcs 一致"""
+        key = (fingerprint, tuple(group_cols), value_col)
+        entry = self._entries.get(key)
+        cached = None if entry is None else entry[0]
+        if cached is not None:
+            selected = _select(cached, funcs)
+            if selected is not None:
+                return selected
+
+        if set(funcs) <= DECOMPOSABLE_AGGS:
+            finer = self._find_finer(fingerprint, tuple(group_cols), value_col)
+            if finer is not None:
+                result, null_cols = finer
+                merged = result[BASE_AGGS].groupby(level=list(group_cols), observed=True).agg(MERGE_FUNCS)
+                self._entries.put(key, (merged, null_cols & set(group_cols)))
+                return _select(merged, funcs)
+
+        extra = [func for func in funcs if func not in DECOMPOSABLE_AGGS]
+        if cached is not None:
+            # 保留已缓存的其它聚合，避免来回切换指标时重复计算
+            extra += [func for func in cached.columns if func not in BASE_AGGS and func not in extra]
+        result = df.groupby(list(group_cols), observed=True)[value_col].agg(BASE_AGGS + extra)
+        self._entries.put(key, (result, _null_columns(df, group_cols)))
+        return _select(result, funcs)
+
+    def entries_of(self, fingerprint: tuple) -> List[tuple]:
+        """文件已缓存的可合并结果，每项为 (分组列, 统计列, 结果, 含空值的分组列)"""
+        return [
+            (cols, col, result, null_cols) for (fp, cols, col), (result, null_cols) in self._entries.items()
+            if fp == fingerprint and set(BASE_AGGS) <= set(result.columns)
+        ]
+
+    def extend(self, entries: List[tuple], fingerprint: tuple, tail: pd.DataFrame) -> int:
+        """
+        文件追加行后由原文件的结果 entries（见 entries_of）增量得到新文件的结果，返回更新的条目数
+
+        只对新增的行 tail 分组计算基础聚合，再与原结果按分组合并；中位数等不可合并的聚合不保留。
+        """
+        count = 0
+        for group_cols, value_col, result, null_cols in entries:
+            if not set(group_cols) | {value_col} <= set(tail.columns):
+                continue
+            partial = tail.groupby(list(group_cols), observed=True)[value_col].agg(BASE_AGGS)
+            merged = pd.concat([result[BASE_AGGS], partial])
+            merged = merged.groupby(level=list(group_cols), observed=True).agg(MERGE_FUNCS)
+            self._entries.put((fingerprint, group_cols, value_col),
+                              (merged, null_cols | _null_columns(tail, group_cols)))
+            count += 1
+        return count
+
+    def invalidate(self, filepath: str) -> None:
+        """移除指定文件的全部结果（含各筛选条件下的结果）"""
+        path = os.path.abspath(filepath)
+        self._entries.discard_where(lambda key: key[0][0] == path)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+aggregation_cache = AggregationCache(AGG_CACHE_MAX_BYTES)
+
+# 后台预计算使用的单线程执行器
+_precompute_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='agg-precompute')
+
+
+def precompute_single_groupings(df: pd.DataFrame, fingerprint: tuple) -> int:
+    """为每个低基数分类列与每个数值列预先计算单列分组的基础聚合，返回计算的组合数"""
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    group_cols = [
+        col for col in df.select_dtypes(exclude=[np.number]).columns
+        if df[col].nunique() <= PRECOMPUTE_MAX_GROUPS
+    ]
+    count = 0
+    for group_col in group_cols:
+        for value_col in numeric_cols:
+            aggregation_cache.aggregate(df, fingerprint, [group_col], value_col, BASE_AGGS)
+            count += 1
+    return count
+
+
+def schedule_precompute(load: Callable[[], pd.DataFrame], fingerprint: tuple,
+                        before: Optional[Callable[[pd.DataFrame], None]] = None) -> None:
+    """
+    在后台线程中加载数据并预计算常用的单列分组
+
+    before 在预计算之前以加载的数据框调用（如文件追加行后增量更新已有的缓存），
+    预计算时已缓存的组合不再重复计算。
+    """
+    if not PRECOMPUTE_AGGREGATES and before is None:
+        return
+
+    def run():
+        try:
+            df = load()
+            if before is not None:
+                before(df)
+            if PRECOMPUTE_AGGREGATES:
+                precompute_single_groupings(df, fingerprint)
+        except Exception as e:
+            logger.warning("预计算分组聚合失败: %s", e)
+
+    _precompute_executor.submit(run)
@@ -1,26 +1,36 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import os
-from datetime import datetime
-from config import PAGE_TITLE, PAGE_ICON
-from users import is_authenticated, show_login_page, logout, get_current_user
-
-# 设置matplotlib中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
-plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
-
-# 设置Seaborn样式
-sns.set_style("whitegrid")
-sns.set_context("notebook", font_scale=1.2)
-
-# 设置页面标题
-st.set_page_config(page_title=PAGE_TITLE, page_icon=PAGE_ICON, layout="wide")
-
-# 设置全局样式
-st.markdown("""
+import json
+import functools
+from collections import deque
+from datetime import date
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from config import (PAGE_TITLE, PAGE_ICON, MAX_FILE_SIZE, PAGE_SIZE_OPTIONS, VIOLIN_BINS, COMBINED_MEDIAN_BINS,
+                    INGEST_POLL_SECONDS, FILTER_MAX_OPTIONS, PERF_SESSION_HISTORY, SESSION_STATE_PERF_TRACES,
+                    SESSION_STATE_PERF_PROFILE_NEXT, PERF_PANEL_TOKEN)
+from users import is_authenticated, show_login_page, logout, get_current_user, is_admin
+from loader import load_dataframe, get_file_key, get_compaction_report, get_column_profile
+from pagination import page_count, page_slice
+from chart_cache import chart_cache, dataframe_fingerprint, figure_to_png
+from aggregation import AGG_FUNCS
+from engine import get_engine
+from storage import file_store, UNCHANGED, UPDATED, APPENDED, DUPLICATE, INGESTING, FAILED, READY
+from jobs import ingest_queue, ingest_in_background, resume_pending_ingests
+from schema import DATE_KINDS
+from column_profile import ORDERED_KINDS, suggest_x_axis, suggest_y_axis, value_bin_edges, summary_table
+from filters import (OP_IN, OP_RANGE, OP_NULL, OP_NOT_NULL, column_values, normalize_filters,
+                     describe_filters)
+import core
+import charts
+import combined
+import perf
+from core import process_dataframe
+from charts import CHART_TYPES
+from perf import stage, metrics, PLOT, SERIALIZE
+
+# 全局样式
+GLOBAL_STYLE = """
     <style>
         div[data-testid="stVerticalBlock"] div[data-testid="stHorizontalBlock"] {
             position: sticky;
@@ -66,16 +76,7 @@ st.markdown("""
             margin: 0;
         }
     </style>
-""", unsafe_allow_html=True)
-
-def process_percentage(df):
-    """处理百分比字段，转换为数值类型"""
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            # 检查是否为百分比格式
-            if df[col].str.contains('%').any():
-                df[col] = df[col].str.rstrip('%').astype('float') / 100
-    return df
+"""
 
 def format_percentage(value):
     """将数值格式化为百分比显示"""
@@ -84,379 +85,642 @@ def format_percentage(value):
     return value
 
 def save_uploaded_files(files):
-    """保存上传的多个文件到data目录"""
-    if not os.path.exists('data'):
-        os.makedirs('data')
-    
+    """保存上传的多个文件并加入后台导入队列，内容未变化的文件不重复写入和导入"""
     saved_files = []
     for file in files:
         if file.name.endswith('.csv'):
+            # 同一次上传在页面重跑时不再重复处理
+            if st.session_state.get(f"uploaded_{file.file_id}"):
+                continue
+            st.session_state[f"uploaded_{file.file_id}"] = True
+            if file.size > MAX_FILE_SIZE:
+                st.error(f"文件 {file.name} 超过大小限制")
+                continue
             filename = file.name
-            filepath = os.path.join('data', filename)
-            with open(filepath, 'wb') as f:
-                f.write(file.getbuffer())
+            # 分块写入并计算内容哈希，相同内容只保存一份
+            status, _ = file_store.store_upload(file, filename)
+            if status == UNCHANGED:
+                st.info(f"文件 {filename} 内容未变化，已跳过")
+                continue
+            if status == UPDATED:
+                st.warning(f"文件 {filename} 内容已更新，已替换原有数据")
+            elif status == APPENDED:
+                st.info(f"文件 {filename} 在末尾追加了数据，只导入新增的部分")
+            elif status == DUPLICATE:
+                st.info(f"文件 {filename} 与已有文件内容相同，共用同一份数据")
+            # 解析、类型推断与统计在后台进程中进行，页面无需等待
+            if file_store.status_of(filename) != READY:
+                ingest_in_background(filename)
             saved_files.append(filename)
     
     return saved_files
 
 def get_saved_files():
     """获取已保存的CSV文件列表"""
-    if not os.path.exists('data'):
-        return []
     # 按文件名排序
-    return sorted([f for f in os.listdir('data') if f.endswith('.csv')])
+    return file_store.list_files()
 
-def get_numeric_columns(df):
-    """获取数值类型的列"""
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+def get_numeric_columns(df, profile=None):
+    """获取数值类型的列，没有时给出提示"""
+    numeric_cols = core.get_numeric_columns(df, profile)
     if not numeric_cols:
         st.warning("当前数据中没有数值类型的列")
     return numeric_cols
 
-def get_categorical_columns(df):
-    """获取分类类型的列"""
-    categorical_cols = df.select_dtypes(exclude=[np.number]).columns.tolist()
+def get_categorical_columns(df, profile=None):
+    """获取分类类型的列，没有时给出提示"""
+    categorical_cols = core.get_categorical_columns(df, profile)
     if not categorical_cols:
         st.warning("当前数据中没有分类类型的列")
     return categorical_cols
 
-def get_date_columns(df):
-    """获取日期类型的列"""
-    date_cols = []
-    for col in df.columns:
-        # 只检查包含特定关键词的列
-        if any(keyword in col.lower() for keyword in ['date', 'time', '日期', '时间']):
-            try:
-                # 尝试将列转换为日期时间格式
-                pd.to_datetime(df[col], errors='raise')
-                date_cols.append(col)
-            except:
-                continue
-    return date_cols
-
-def process_dataframe(df):
-    """预处理数据框"""
-    # 处理百分比
-    df = process_percentage(df)
-    
-    # 处理日期列
-    date_cols = get_date_columns(df)
-    if date_cols:
-        for col in date_cols:
-            try:
-                # 转换为日期时间并只保留日期部分
-                df[col] = pd.to_datetime(df[col]).dt.date
-            except:
-                st.warning(f"列 '{col}' 转换为日期类型失败")
-    
-    return df
-
-def sort_dataframe(df, sort_cols, ascending=True):
-    """对数据框进行排序"""
-    if not sort_cols:
-        return df
+def sort_dataframe(df, sort_cols, ascending=True, filepath=None):
+    """按多列排序，返回排序后的行位置，出错时提示并返回None（见 core.sort_dataframe）"""
     try:
-        # 转换日期列
-        df_copy = df.copy()
-        date_cols = get_date_columns(df)
-        for col in sort_cols:
-            if col in date_cols:
-                df_copy[col] = pd.to_datetime(df_copy[col])
-        return df_copy.sort_values(by=sort_cols, ascending=ascending)
+        return core.sort_dataframe(df, sort_cols, ascending, filepath=filepath)
     except Exception as e:
         st.error(f"排序时出错: {str(e)}")
-        return df
-
-def calculate_statistics(df, group_by_cols, value_col, agg_funcs):
-    """计算统计指标"""
-    if not group_by_cols or not value_col:
         return None
-    
-    # 检查所有分组列是否存在
-    for col in group_by_cols:
-        if col not in df.columns:
-            st.error(f"分组列 '{col}' 不存在于数据中")
-            return None
-    
-    if value_col not in df.columns:
-        st.error(f"统计列 '{value_col}' 不存在于数据中")
-        return None
-    
+
+def calculate_statistics(df, group_by_cols, value_col, agg_funcs, filepath=None, filters=()):
+    """计算统计指标，出错时提示并返回None（见 core.calculate_statistics）"""
     try:
-        agg_dict = {
-            '计数': 'count',
-            '求和': 'sum',
-            '平均值': 'mean',
-            '最大值': 'max',
-            '最小值': 'min',
-            '中位数': 'median',
-            '标准差': 'std'
-        }
-        
-        selected_aggs = {value_col: [agg_dict[func] for func in agg_funcs]}
-        result = df.groupby(group_by_cols).agg(selected_aggs)
-        result.columns = result.columns.droplevel(0)  # 删除多级索引
-        return result
+        return core.calculate_statistics(df, group_by_cols, value_col, agg_funcs, filepath=filepath, filters=filters)
     except Exception as e:
         st.error(f"计算统计指标时出错: {str(e)}")
         return None
 
-def create_visualization(df, chart_type, x_axis, y_axis):
-    """创建可视化图表"""
-    if x_axis not in df.columns:
-        st.error(f"列 '{x_axis}' 不存在于数据中")
+def create_visualization(df, chart_type, x_axis, y_axis, bin_edges=None):
+    """创建可视化图表，出错时提示并返回None（见 charts.create_visualization）"""
+    try:
+        return charts.create_visualization(df, chart_type, x_axis, y_axis, bin_edges=bin_edges)
+    except Exception as e:
+        st.error(f"创建图表时出错: {str(e)}")
         return None
-    
-    if y_axis not in df.columns:
-        st.error(f"列 '{y_axis}' 不存在于数据中")
+
+def show_chart(df, chart_type, x_axis, y_axis, fingerprint=None, bin_edges=None, positions=None):
+    """
+    显示图表，相同数据与参数的图表直接使用缓存的渲染结果
+
+    positions 为可选的行位置子集（如筛选结果），只在需要重新绘制时取出。
+    """
+    if fingerprint is None:
+        fingerprint = dataframe_fingerprint(df if positions is None else df.iloc[positions])
+    key = (fingerprint, chart_type, x_axis, y_axis)
+    image = chart_cache.get(key)
+    if image is None:
+        with stage(PLOT):
+            if positions is not None:
+                # 先选取绘图所需的列，只复制这些列中选中的行
+                df = df[list(dict.fromkeys([x_axis, y_axis]))].iloc[positions]
+            fig = create_visualization(df, chart_type, x_axis, y_axis, bin_edges=bin_edges)
+            if fig is None:
+                return
+            image = figure_to_png(fig)
+        chart_cache.put(key, image)
+    st.image(image)
+
+def render_paged_dataframe(df, widget_key, filepath=None, positions=None):
+    """分页显示数据框，只序列化当前页"""
+    total_rows = len(df) if positions is None else len(positions)
+    page_col1, page_col2, page_col3 = st.columns([1, 3, 1])
+    with page_col1:
+        page_size = st.selectbox("每页行数", PAGE_SIZE_OPTIONS, key=f"page_size_{widget_key}")
+    with page_col2:
+        sort_cols = st.multiselect(
+            "排序列（按选择顺序）",
+            df.columns.tolist(),
+            key=f"sort_columns_{widget_key}"
+        )
+    with page_col3:
+        page = st.number_input(
+            "页码",
+            min_value=1,
+            max_value=page_count(total_rows, page_size),
+            value=1,
+            key=f"page_{widget_key}"
+        )
+
+    ascending = []
+    if sort_cols:
+        for sort_col, order_col in zip(sort_cols, st.columns(len(sort_cols))):
+            with order_col:
+                sort_order = st.selectbox(
+                    f"{sort_col} 排序方向",
+                    ["升序", "降序"],
+                    key=f"sort_order_{widget_key}_{sort_col}"
+                )
+            ascending.append(sort_order == "升序")
+    permutation = sort_dataframe(df, sort_cols, ascending, filepath=filepath)
+    with stage(SERIALIZE):
+        page_df = page_slice(df, page, page_size, positions=positions, permutation=permutation)
+        st.dataframe(page_df, use_container_width=True, height=400)
+    st.caption(f"共 {total_rows} 行，第 {page} / {page_count(total_rows, page_size)} 页")
+
+def render_range_input(column, info, widget_key):
+    """数值或日期列的范围输入，返回 (下限, 上限)，无法筛选时返回None"""
+    if info['min'] is None or info['max'] is None:
+        st.caption(f"列 '{column}' 没有可比较的取值")
         return None
+    if info['kind'] in DATE_KINDS:
+        # 日期时间列按日期选择范围
+        lower, upper = date.fromisoformat(info['min'][:10]), date.fromisoformat(info['max'][:10])
+        selected = st.date_input(
+            f"{column} 范围",
+            value=(lower, upper),
+            min_value=lower,
+            max_value=upper,
+            key=widget_key
+        )
+        # 只选择了起始日期时暂不筛选
+        if len(selected) != 2:
+            return None
+        if info['kind'] == 'datetime':
+            # 上限包含结束日期当天的全部时刻
+            end = pd.Timestamp(selected[1]) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+            return pd.Timestamp(selected[0]), end
+        return tuple(selected)
+    cast = int if info['kind'] == 'int' else float
+    lower_col, upper_col = st.columns(2)
+    with lower_col:
+        lower = st.number_input(f"{column} 最小值", value=cast(info['min']), key=f"{widget_key}_min")
+    with upper_col:
+        upper = st.number_input(f"{column} 最大值", value=cast(info['max']), key=f"{widget_key}_max")
+    return lower, upper
+
+def render_filter_builder(df, profile, filepath, filename):
+    """渲染筛选条件编辑器，返回筛选条件"""
+    filters = []
+    with st.expander("数据筛选", expanded=bool(st.session_state.get(f"filter_columns_{filename}"))):
+        filter_cols = st.multiselect("筛选字段", df.columns.tolist(), key=f"filter_columns_{filename}")
+        for col in filter_cols:
+            info = profile['columns'][col]
+            ranged = info['kind'] in ORDERED_KINDS
+            mode_col, value_col = st.columns([1, 3])
+            with mode_col:
+                mode = st.selectbox(
+                    f"{col} 条件",
+                    ["范围" if ranged else "等于", "为空", "不为空"],
+                    key=f"filter_mode_{filename}_{col}"
+                )
+            with value_col:
+                if mode == "为空":
+                    filters.append((col, OP_NULL, None))
+                elif mode == "不为空":
+                    filters.append((col, OP_NOT_NULL, None))
+                elif ranged:
+                    bounds = render_range_input(col, info, f"filter_range_{filename}_{col}")
+                    if bounds is not None:
+                        filters.append((col, OP_RANGE, bounds))
+                else:
+                    if info['distinct'] <= FILTER_MAX_OPTIONS:
+                        values = st.multiselect(
+                            f"{col} 取值",
+                            column_values(df, col, key=get_file_key(filepath)),
+                            key=f"filter_values_{filename}_{col}"
+                        )
+                    else:
+                        text = st.text_input(f"{col} 取值（多个取值用逗号分隔）", key=f"filter_values_{filename}_{col}")
+                        values = [value.strip() for value in text.split(',') if value.strip()]
+                    if values:
+                        filters.append((col, OP_IN, tuple(values)))
+    return tuple(filters)
+
+def delete_file(filename):
+    """删除指定的文件"""
+    return file_store.delete(filename)
+
+def tracked(label):
+    """记录被装饰函数所在的一次重跑（页面或片段），并保存到会话的性能记录中"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ctx = get_script_run_ctx()
+            profile = st.session_state.pop(SESSION_STATE_PERF_PROFILE_NEXT, False)
+            trace = None
+            try:
+                with perf.rerun(label, session_id=ctx.session_id if ctx else '', user=get_current_user(),
+                                profile=profile) as trace:
+                    return func(*args, **kwargs)
+            finally:
+                # st.rerun() 以异常结束脚本，同样保留记录
+                if trace is not None:
+                    history = st.session_state.setdefault(SESSION_STATE_PERF_TRACES, deque(maxlen=PERF_SESSION_HISTORY))
+                    history.append(trace)
+        return wrapper
+    return decorator
+
+def can_view_perf_panel() -> bool:
+    """性能监控面板只对管理员，或地址中带有正确面板令牌（见 PERF_PANEL_TOKEN）的会话显示"""
+    if is_admin():
+        return True
+    return bool(PERF_PANEL_TOKEN) and st.query_params.get('perf') == PERF_PANEL_TOKEN
+
+def render_perf_panel():
+    """性能面板：最近一次重跑的阶段耗时、本会话与全进程的汇总、指标导出与cProfile分析"""
+    traces = list(st.session_state.get(SESSION_STATE_PERF_TRACES, []))
+    with st.expander("性能监控"):
+        st.caption("文件视图内的交互只重跑该片段，其记录在下次整页刷新时显示")
+        if traces:
+            last = traces[-1]
+            st.write(f"上次重跑（{last.label}）耗时 {last.seconds * 1000:.0f} ms，进程常驻内存 {last.rss / 2 ** 20:.0f} MB")
+            st.dataframe(pd.DataFrame([{
+                '阶段': '　' * span.depth + span.stage,
+                '开始(ms)': round(span.start * 1000, 1),
+                '耗时(ms)': round(span.seconds * 1000, 1),
+                '常驻内存变化(MB)': round(span.rss_delta / 2 ** 20, 1),
+                'Arrow内存变化(MB)': round(span.arrow_delta / 2 ** 20, 1),
+            } for span in last.spans]), use_container_width=True)
+            
+            st.write(f"本会话最近 {len(traces)} 次重跑")
+            spans = pd.DataFrame([{'阶段': span.stage, '耗时(ms)': span.seconds * 1000}
+                                  for trace in traces for span in trace.spans])
+            if not spans.empty:
+                summary = spans.groupby('阶段')['耗时(ms)'].agg(['count', 'sum', 'mean', 'max']).round(1)
+                summary.columns = ['次数', '总耗时(ms)', '平均(ms)', '最大(ms)']
+                st.dataframe(summary.sort_values('总耗时(ms)', ascending=False), use_container_width=True)
+        
+        st.write("全进程累计（所有会话）")
+        stages = metrics.snapshot()['stages']
+        if stages:
+            st.dataframe(pd.DataFrame([
+                {'阶段': name, '次数': values['count'], '总耗时(s)': round(values['seconds'], 3),
+                 '最大(ms)': round(values['max_seconds'] * 1000, 1)}
+                for name, values in sorted(stages.items())
+            ]).set_index('阶段'), use_container_width=True)
+        
+        export_col1, export_col2, export_col3 = st.columns(3)
+        with export_col1:
+            st.download_button(
+                "导出本会话记录（JSON）",
+                json.dumps([trace.to_dict() for trace in traces], ensure_ascii=False, indent=2),
+                file_name="perf_session.json",
+                mime="application/json"
+            )
+        with export_col2:
+            st.download_button(
+                "导出指标（Prometheus）",
+                metrics.to_prometheus(),
+                file_name="csv_viewer.prom",
+                mime="text/plain"
+            )
+        with export_col3:
+            if st.session_state.get(SESSION_STATE_PERF_PROFILE_NEXT):
+                st.info("下一次重跑将使用cProfile分析")
+            elif st.button("分析下一次重跑（cProfile）"):
+                st.session_state[SESSION_STATE_PERF_PROFILE_NEXT] = True
+                st.info("下一次重跑将使用cProfile分析")
+        
+        profiled = [trace for trace in traces if trace.profile]
+        if profiled:
+            trace = profiled[-1]
+            st.write(f"cProfile结果（{trace.label}，{trace.to_dict()['timestamp']}，耗时 {trace.seconds:.2f} s）")
+            st.code(trace.profile)
+
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def render_ingest_progress():
+    """显示后台导入进度，有文件导入完成时刷新整个页面"""
+    jobs = ingest_queue.active_jobs()
+    active = {job.job_id for job in jobs}
+    finished = st.session_state.get('ingest_jobs', set()) - active
+    st.session_state['ingest_jobs'] = active
+    if finished or not jobs:
+        st.rerun()
+    for job in jobs:
+        st.progress(job.progress, text=f"正在导入 {'、'.join(job.names)}（{job.progress:.0%}）")
+
+@st.fragment
+@tracked('file_view')
+def render_file_view(filename):
+    """渲染单个文件的分析视图，组件交互只重跑该片段"""
+    # 创建文件标题和删除按钮的容器
+    st.markdown('<div class="file-header">', unsafe_allow_html=True)
+    st.write("### 数据预览")
+    if st.button("🗑️", key=f"delete_{filename}", help="删除此文件", type="secondary"):
+        if delete_file(filename):
+            st.success(f"文件 {filename} 已删除")
+            st.rerun()
+        else:
+            st.error("删除文件失败")
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    # 设置中文字体
-    plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
-    plt.rcParams['axes.unicode_minus'] = False
+    # 尚未导入完成的文件只显示占位信息
+    status = file_store.status_of(filename)
+    if status == INGESTING:
+        st.info(f"文件 {filename} 正在导入中，完成后将自动显示")
+        return
+    if status == FAILED:
+        st.error(f"文件 {filename} 导入失败：{file_store.get_entry(filename)['error']}")
+        if st.button("重新导入", key=f"reingest_{filename}"):
+            ingest_in_background(filename)
+            st.rerun()
+        return
     
-    # 确保数据是可视化的格式
-    df = df.copy()
+    # 读取CSV文件（预处理结果按文件标识缓存）
+    filepath = file_store.path_of(filename)
+    df = load_dataframe(filepath, process_dataframe)
+    # 导入时生成的列概要，用于字段选择与列概要视图
+    profile = get_column_profile(filepath)
+    numeric_cols = get_numeric_columns(df, profile)
     
-    # 检查并转换 y 轴数据
-    if df[y_axis].dtype == 'object':
+    # 筛选条件作用于预览、图表与统计
+    filters = render_filter_builder(df, profile, filepath, filename)
+    filter_positions = None
+    view_fingerprint = get_file_key(filepath)
+    if filters:
         try:
-            df[y_axis] = pd.to_numeric(df[y_axis], errors='coerce')
-            if df[y_axis].isna().all():
-                st.error(f"列 '{y_axis}' 无法转换为数值类型")
-                return None
+            filter_positions = get_engine().filter(filepath, filters)
         except Exception as e:
-            st.error(f"转换列 '{y_axis}' 时出错: {str(e)}")
-            return None
+            st.error(f"筛选时出错: {str(e)}")
+            return
+        view_fingerprint = view_fingerprint + (normalize_filters(filters),)
+        st.caption(f"筛选后共 {len(filter_positions)} / {len(df)} 行：{describe_filters(filters)}")
     
-    # 检查数据是否为空
-    if df[y_axis].isna().all():
-        st.error(f"列 '{y_axis}' 所有值都为空")
-        return None
+    # 数据预览部分
+    st.write("### 数据预览")
+    preview_tab1, preview_tab2, preview_tab3 = st.tabs(["数据表格", "数据可视化", "列概要"])
     
-    # 创建图表
-    try:
-        fig, ax = plt.subplots(figsize=(12, 6))
-        
-        if chart_type == "柱状图":
-            # 如果数据点过多，只显示前20个
-            if len(df) > 20:
-                df = df.head(20)
-            sns.barplot(data=df, x=x_axis, y=y_axis, ax=ax, ci=None)
-        elif chart_type == "折线图":
-            sns.lineplot(data=df, x=x_axis, y=y_axis, ax=ax, ci=None)
-        elif chart_type == "散点图":
-            sns.scatterplot(data=df, x=x_axis, y=y_axis, ax=ax)
-        elif chart_type == "箱线图":
-            sns.boxplot(data=df, x=x_axis, y=y_axis, ax=ax)
-        elif chart_type == "小提琴图":
-            sns.violinplot(data=df, x=x_axis, y=y_axis, ax=ax)
-        
-        # 设置标签和样式
-        plt.xticks(rotation=45, ha='right', fontsize=10)
-        plt.yticks(fontsize=10)
-        ax.set_xlabel(x_axis, fontsize=12)
-        ax.set_ylabel(y_axis, fontsize=12)
-        ax.set_title(f"{chart_type}: {x_axis} vs {y_axis}", fontsize=14, pad=20)
+    with preview_tab1:
+        render_paged_dataframe(df, f"preview_{filename}", filepath=filepath, positions=filter_positions)
+        compaction_report = get_compaction_report(filepath)
+        if compaction_report is not None:
+            before_mb = compaction_report['原内存(MB)'].sum()
+            after_mb = compaction_report['新内存(MB)'].sum()
+            with st.expander(f"内存占用：{before_mb:.1f}MB → {after_mb:.1f}MB"):
+                st.dataframe(compaction_report, use_container_width=True)
+    
+    with preview_tab2:
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            chart_type = st.selectbox(
+                "选择图表类型",
+                CHART_TYPES,
+                key=f"raw_chart_type_{filename}"
+            )
+            x_options = df.columns.tolist()
+            suggested_x = suggest_x_axis(profile)
+            x_axis = st.selectbox(
+                "选择X轴",
+                x_options,
+                index=x_options.index(suggested_x) if suggested_x in x_options else 0,
+                key=f"raw_x_axis_{filename}"
+            )
+            suggested_y = suggest_y_axis(profile, exclude=x_axis)
+            y_axis = st.selectbox(
+                "选择Y轴",
+                numeric_cols,
+                index=numeric_cols.index(suggested_y) if suggested_y in numeric_cols else 0,
+                key=f"raw_y_axis_{filename}"
+            )
         
-        # 调整布局
-        plt.tight_layout()
-        return fig
-    except Exception as e:
-        st.error(f"创建图表时出错: {str(e)}")
-        return None
-
-def delete_file(filename):
-    """删除指定的文件"""
-    filepath = os.path.join('data', filename)
-    if os.path.exists(filepath):
-        os.remove(filepath)
-        return True
-    return False
-
-# 检查用户是否已登录
-if not is_authenticated():
-    show_login_page()
-else:
-    # 显示顶部导航栏
-    col1, col2, col3 = st.columns([1, 8, 1])
-    with col1:
-        st.write(f"欢迎, {get_current_user()}")
-    # 暂时注释掉登出功能
-    # with col3:
-    #     if st.button("登出"):
-    #         logout()
-    #         st.rerun()
+        with col2:
+            if x_axis and y_axis:
+                show_chart(df, chart_type, x_axis, y_axis, fingerprint=view_fingerprint,
+                           bin_edges=value_bin_edges(profile, y_axis, VIOLIN_BINS), positions=filter_positions)
     
-    # 主要应用内容
-    st.title("CSV 文件分析系统")
+    with preview_tab3:
+        # 只读取列概要，不访问数据行
+        st.write(f"共 {profile['rows']} 行，{len(profile['columns'])} 列")
+        st.dataframe(
+            summary_table(profile),
+            use_container_width=True,
+            column_config={'分布': st.column_config.BarChartColumn('分布')}
+        )
+
+    # 数据统计分析
+    st.write("### 数据统计")
+    stat_tab1, stat_tab2 = st.tabs(["统计结果", "统计可视化"])
     
-    # 创建固定在右下角的上传按钮
-    with st.container():
-        st.markdown('<div class="upload-section">', unsafe_allow_html=True)
-        uploaded_files = st.file_uploader("上传CSV文件", type=["csv"], accept_multiple_files=True)
-        if uploaded_files:
-            saved_files = save_uploaded_files(uploaded_files)
-            if saved_files:
-                st.success(f"成功上传 {len(saved_files)} 个CSV文件")
-                st.rerun()
-        st.markdown('</div>', unsafe_allow_html=True)
+    # 在两个标签页之外定义统计选项
+    stat_col1, stat_col2 = st.columns(2)
+    with stat_col1:
+        group_by_cols = st.multiselect(
+            "选择分组字段（按选择顺序分组）",
+            get_categorical_columns(df, profile),
+            key=f"group_{filename}"
+        )
+        
+        value_col = st.selectbox(
+            "选择统计字段",
+            numeric_cols,
+            key=f"value_{filename}"
+        )
     
-    # 获取所有保存的文件
-    saved_files = get_saved_files()
+    with stat_col2:
+        agg_funcs = st.multiselect(
+            "选择统计指标",
+            list(AGG_FUNCS),
+            default=['计数', '平均值'],
+            key=f"agg_{filename}"
+        )
     
-    if saved_files:
-        # 创建标签页
-        tabs = st.tabs(saved_files)
-        
-        # 处理每个文件
-        for idx, (tab, filename) in enumerate(zip(tabs, saved_files)):
-            with tab:
-                # 创建文件标题和删除按钮的容器
-                st.markdown('<div class="file-header">', unsafe_allow_html=True)
-                st.write("### 数据预览")
-                if st.button("🗑️", key=f"delete_{idx}", help="删除此文件", type="secondary"):
-                    if delete_file(filename):
-                        st.success(f"文件 {filename} 已删除")
-                        st.rerun()
-                    else:
-                        st.error("删除文件失败")
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # 读取CSV文件
-                filepath = os.path.join('data', filename)
-                df = pd.read_csv(filepath)
-                df = process_dataframe(df)  # 预处理数据
-                
-                # 数据预览部分
-                st.write("### 数据预览")
-                preview_tab1, preview_tab2 = st.tabs(["数据表格", "数据可视化"])
-                
-                with preview_tab1:
-                    st.dataframe(df, use_container_width=True, height=400)
-                
-                with preview_tab2:
-                    col1, col2 = st.columns([1, 3])
-                    with col1:
-                        chart_type = st.selectbox(
-                            "选择图表类型",
-                            ["柱状图", "折线图", "散点图", "箱线图", "小提琴图"],
-                            key=f"raw_chart_type_{idx}"
-                        )
-                        x_axis = st.selectbox(
-                            "选择X轴",
-                            df.columns.tolist(),
-                            key=f"raw_x_axis_{idx}"
-                        )
-                        y_axis = st.selectbox(
-                            "选择Y轴",
-                            get_numeric_columns(df),
-                            key=f"raw_y_axis_{idx}"
+    if group_by_cols and value_col and agg_funcs:
+        stats_df = calculate_statistics(df, group_by_cols, value_col, agg_funcs, filepath=filepath, filters=filters)
+        if stats_df is not None:
+            with stat_tab1:
+                st.dataframe(stats_df, use_container_width=True)
+            
+            with stat_tab2:
+                viz_col1, viz_col2 = st.columns([1, 3])
+                with viz_col1:
+                    if len(agg_funcs) > 1:
+                        selected_metric = st.selectbox(
+                            "选择要可视化的指标",
+                            agg_funcs,
+                            key=f"metric_{filename}"
                         )
+                    else:
+                        selected_metric = agg_funcs[0]
                     
-                    with col2:
-                        if x_axis and y_axis:
-                            fig = create_visualization(df, chart_type, x_axis, y_axis)
-                            if fig:
-                                st.pyplot(fig)
-
-                # 数据统计分析
-                st.write("### 数据统计")
-                stat_tab1, stat_tab2 = st.tabs(["统计结果", "统计可视化"])
+                    chart_type = st.selectbox(
+                        "选择图表类型",
+                        CHART_TYPES,
+                        key=f"stat_chart_type_{filename}"
+                    )
                 
-                # 在两个标签页之外定义统计选项
-                stat_col1, stat_col2 = st.columns(2)
-                with stat_col1:
-                    group_by_cols = st.multiselect(
-                        "选择分组字段（按选择顺序分组）",
-                        get_categorical_columns(df),
-                        key=f"group_{idx}"
+                with viz_col2:
+                    show_chart(
+                        stats_df.reset_index(),
+                        chart_type,
+                        group_by_cols[0],
+                        selected_metric
                     )
-                    
-                    value_col = st.selectbox(
-                        "选择统计字段",
-                        get_numeric_columns(df),
-                        key=f"value_{idx}"
+
+    # 搜索功能
+    st.write("### 数据搜索")
+    search_query = st.text_input("输入搜索关键词", key=f"search_{filename}")
+    search_col1, search_col2, search_col3 = st.columns([1, 1, 4])
+    with search_col1:
+        search_case = st.checkbox("区分大小写", key=f"search_case_{filename}")
+    with search_col2:
+        search_regex = st.checkbox("正则表达式", key=f"search_regex_{filename}")
+    with search_col3:
+        search_columns = st.multiselect(
+            "搜索范围（默认全部列）",
+            df.columns.tolist(),
+            key=f"search_columns_{filename}"
+        )
+    if search_query:
+        try:
+            positions = get_engine().search(
+                filepath, search_query,
+                case=search_case, regex=search_regex, columns=search_columns or None
+            )
+        except Exception as e:
+            st.error(f"搜索时出错: {str(e)}")
+            return
+        if filter_positions is not None:
+            # 只保留同时满足筛选条件的行
+            positions = np.intersect1d(positions, filter_positions, assume_unique=True)
+        search_tab1, search_tab2 = st.tabs(["搜索结果", "结果可视化"])
+        
+        with search_tab1:
+            st.write(f"搜索结果（共 {len(positions)} 条记录）：")
+            render_paged_dataframe(df, f"search_results_{filename}", filepath=filepath, positions=positions)
+        
+        with search_tab2:
+            if len(positions):
+                col1, col2 = st.columns([1, 3])
+                with col1:
+                    chart_type = st.selectbox(
+                        "选择图表类型",
+                        CHART_TYPES,
+                        key=f"search_chart_type_{filename}"
                     )
-                
-                with stat_col2:
-                    agg_funcs = st.multiselect(
-                        "选择统计指标",
-                        ['计数', '求和', '平均值', '最大值', '最小值', '中位数', '标准差'],
-                        default=['计数', '平均值'],
-                        key=f"agg_{idx}"
+                    x_axis = st.selectbox(
+                        "选择X轴",
+                        df.columns.tolist(),
+                        key=f"search_x_axis_{filename}"
+                    )
+                    y_axis = st.selectbox(
+                        "选择Y轴",
+                        numeric_cols,
+                        key=f"search_y_axis_{filename}"
                     )
                 
-                if group_by_cols and value_col and agg_funcs:
-                    stats_df = calculate_statistics(df, group_by_cols, value_col, agg_funcs)
-                    if stats_df is not None:
-                        with stat_tab1:
-                            st.dataframe(stats_df, use_container_width=True)
-                        
-                        with stat_tab2:
-                            viz_col1, viz_col2 = st.columns([1, 3])
-                            with viz_col1:
-                                if len(agg_funcs) > 1:
-                                    selected_metric = st.selectbox(
-                                        "选择要可视化的指标",
-                                        agg_funcs,
-                                        key=f"metric_{idx}"
-                                    )
-                                else:
-                                    selected_metric = agg_funcs[0]
-                                
-                                chart_type = st.selectbox(
-                                    "选择图表类型",
-                                    ["柱状图", "折线图", "散点图", "箱线图", "小提琴图"],
-                                    key=f"stat_chart_type_{idx}"
-                                )
-                            
-                            with viz_col2:
-                                fig = create_visualization(
-                                    stats_df.reset_index(),
-                                    chart_type,
-                                    group_by_cols[0],
-                                    selected_metric
-                                )
-                                if fig:
-                                    st.pyplot(fig)
-
-                # 搜索功能
-                st.write("### 数据搜索")
-                search_query = st.text_input("输入搜索关键词", key=f"search_{idx}")
-                if search_query:
-                    df_filtered = df[df.apply(lambda row: row.astype(str).str.contains(search_query).any(), axis=1)]
-                    search_tab1, search_tab2 = st.tabs(["搜索结果", "结果可视化"])
-                    
-                    with search_tab1:
-                        st.write(f"搜索结果（共 {len(df_filtered)} 条记录）：")
-                        st.dataframe(df_filtered, use_container_width=True)
-                    
-                    with search_tab2:
-                        if not df_filtered.empty:
-                            col1, col2 = st.columns([1, 3])
-                            with col1:
-                                chart_type = st.selectbox(
-                                    "选择图表类型",
-                                    ["柱状图", "折线图", "散点图", "箱线图", "小提琴图"],
-                                    key=f"search_chart_type_{idx}"
-                                )
-                                x_axis = st.selectbox(
-                                    "选择X轴",
-                                    df_filtered.columns.tolist(),
-                                    key=f"search_x_axis_{idx}"
-                                )
-                                y_axis = st.selectbox(
-                                    "选择Y轴",
-                                    get_numeric_columns(df_filtered),
-                                    key=f"search_y_axis_{idx}"
-                                )
-                            
-                            with col2:
-                                if x_axis and y_axis:
-                                    fig = create_visualization(df_filtered, chart_type, x_axis, y_axis)
-                                    if fig:
-                                        st.pyplot(fig)
+                with col2:
+                    if x_axis and y_axis:
+                        search_fingerprint = (
+                            view_fingerprint, search_query, search_case, search_regex, tuple(search_columns)
+                        )
+                        show_chart(df, chart_type, x_axis, y_axis, fingerprint=search_fingerprint, positions=positions)
+
+
+@st.fragment
+@tracked('combined_view')
+def render_combined_view(saved_files):
+    """多文件合并统计：对结构相同的多个文件做同一分组统计，各文件分别计算部分聚合后合并"""
+    st.write("### 多文件合并统计")
+    ready_files = [name for name in saved_files if file_store.status_of(name) == READY]
+    selected = st.multiselect("选择要合并统计的文件（至少两个）", ready_files, key="combined_files")
+    if len(selected) < 2:
+        return
+
+    paths = [file_store.path_of(name) for name in selected]
+    try:
+        schema = combined.combined_schema({name: combined.file_schema(path) for name, path in zip(selected, paths)})
+    except ValueError as e:
+        st.error(f"所选文件的结构不兼容：{str(e)}")
+        return
+
+    stat_col1, stat_col2 = st.columns(2)
+    with stat_col1:
+        group_by_cols = st.multiselect(
+            "选择分组字段（按选择顺序分组）",
+            combined.categorical_columns(schema),
+            key="combined_group"
+        )
+        value_col = st.selectbox("选择统计字段", combined.numeric_columns(schema), key="combined_value")
+    with stat_col2:
+        agg_funcs = st.multiselect(
+            "选择统计指标",
+            list(AGG_FUNCS),
+            default=['计数', '平均值'],
+            key="combined_agg"
+        )
+    if not (group_by_cols and value_col and agg_funcs):
+        return
+
+    try:
+        stats_df = combined.combined_statistics(paths, group_by_cols, value_col, agg_funcs)
+    except Exception as e:
+        st.error(f"合并统计时出错: {str(e)}")
+        return
+    caption = f"由 {len(paths)} 个文件分别计算的部分结果合并得到"
+    if '中位数' in agg_funcs:
+        caption += f"；中位数由 {COMBINED_MEDIAN_BINS} 分箱的直方图估算，为近似值"
+    st.caption(caption)
+
+    combined_tab1, combined_tab2 = st.tabs(["统计结果", "统计可视化"])
+    with combined_tab1:
+        st.dataframe(stats_df, use_container_width=True)
+    with combined_tab2:
+        viz_col1, viz_col2 = st.columns([1, 3])
+        with viz_col1:
+            selected_metric = st.selectbox("选择要可视化的指标", agg_funcs, key="combined_metric")
+            chart_type = st.selectbox("选择图表类型", CHART_TYPES, key="combined_chart_type")
+        with viz_col2:
+            show_chart(stats_df.reset_index(), chart_type, group_by_cols[0], selected_metric)
 
+
+@tracked('page')
+def main():
+    """页面入口：登录检查、文件上传与文件视图"""
+    # 设置页面标题
+    st.set_page_config(page_title=PAGE_TITLE, page_icon=PAGE_ICON, layout="wide")
+    # 设置全局样式
+    st.markdown(GLOBAL_STYLE, unsafe_allow_html=True)
+    
+    # 检查用户是否已登录
+    if not is_authenticated():
+        show_login_page()
     else:
-        st.info("暂无CSV文件，请点击右下角上传按钮添加文件")
+        # 显示顶部导航栏
+        col1, col2, col3 = st.columns([1, 8, 1])
+        with col1:
+            st.write(f"欢迎, {get_current_user()}")
+        # 暂时注释掉登出功能
+        # with col3:
+        #     if st.button("登出"):
+        #         logout()
+        #         st.rerun()
+    
+        # 主要应用内容
+        st.title("CSV 文件分析系统")
+    
+        # 创建固定在右下角的上传按钮
+        with st.container():
+            st.markdown('<div class="upload-section">', unsafe_allow_html=True)
+            uploaded_files = st.file_uploader("上传CSV文件", type=["csv"], accept_multiple_files=True)
+            if uploaded_files:
+                saved_files = save_uploaded_files(uploaded_files)
+                if saved_files:
+                    st.success(f"成功上传 {len(saved_files)} 个CSV文件")
+                    st.rerun()
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+        # 显示后台导入进度（服务重启时继续未完成的导入）
+        resume_pending_ingests()
+        if ingest_queue.active_jobs():
+            render_ingest_progress()
+    
+        # 获取所有保存的文件
+        saved_files = get_saved_files()
+    
+        if saved_files:
+            # 只渲染选中的文件，文件数量增加不影响单次交互的开销
+            selected_file = st.selectbox("选择文件", saved_files, key="selected_file")
+            render_file_view(selected_file)
+            if len(saved_files) > 1:
+                render_combined_view(saved_files)
+
+        else:
+            st.info("暂无CSV文件，请点击右下角上传按钮添加文件")
+    
+        if can_view_perf_panel():
+            render_perf_panel()
+
+
+# streamlit run 以 __main__ 运行本脚本；作为模块导入（如基准测试）时不渲染页面
+if __name__ == "__main__":
+    main()
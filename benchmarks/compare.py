@@ -0,0 +1,56 @@
+"""
+对比两次基准测试的结果
+
+用法：
+    python benchmarks/compare.py benchmarks/results/基线.json benchmarks/results/新结果.json --threshold 1.1
+
+耗时或Python堆峰值超过基线 threshold 倍的阶段标记为退化（常驻内存的前后之差受回收时机影响，只作参考，不参与判定），存在退化时以状态码1退出。
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return {(result['rows'], result['stage']): result for result in report['results']}
+
+
+def ratio(new, old):
+    if new is None or old is None or old == 0:
+        return None
+    return new / old
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比两次基准测试的结果')
+    parser.add_argument('baseline', help='基线结果文件')
+    parser.add_argument('current', help='本次结果文件')
+    parser.add_argument('--threshold', type=float, default=1.1, help='判定为退化的倍数')
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    regressions = 0
+    print(f"{'行数':>10} {'阶段':<34} {'基线(s)':>10} {'本次(s)':>10} {'耗时比':>7} {'堆峰值比':>7}")
+    for key in sorted(current, key=lambda k: (k[0], k[1])):
+        if key not in baseline:
+            continue
+        old, new = baseline[key], current[key]
+        time_ratio = ratio(new['seconds'], old['seconds'])
+        # 旧版本的结果中Python堆峰值记为 peak_mb
+        memory_ratio = ratio(new.get('py_heap_peak_mb', new.get('peak_mb')),
+                             old.get('py_heap_peak_mb', old.get('peak_mb')))
+        regressed = any(r is not None and r > args.threshold for r in (time_ratio, memory_ratio))
+        regressions += regressed
+        print(f"{key[0]:>10} {key[1]:<34} {old['seconds']:>10.3f} {new['seconds']:>10.3f} "
+              f"{'' if time_ratio is None else f'{time_ratio:.2f}':>7} "
+              f"{'' if memory_ratio is None else f'{memory_ratio:.2f}':>7}"
+              f"{'  ← 退化' if regressed else ''}")
+    print(f"共 {regressions} 个阶段退化")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
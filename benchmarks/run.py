@@ -0,0 +1,216 @@
+"""
+性能基准测试：直接调用不依赖Streamlit的核心函数（core.py、charts.py），测量各热点路径的耗时与内存
+
+每个阶段记录常驻内存与pyarrow内存池分配在阶段前后的变化（包含pyarrow、DuckDB在Python堆之外的分配），
+以及 tracemalloc 测得的Python堆峰值（只含Python对象与numpy/pandas经Python分配器的内存，
+不含pyarrow与DuckDB，对Arrow相关阶段偏低）。
+
+每个规模先生成合成CSV（见 generate.py），再依次测量导入、加载、统计、筛选、搜索、排序与绘图，
+冷启动（清空缓存）与缓存命中分别记录。结果写入JSON，可用 compare.py 对比两次运行。
+
+用法：
+    python benchmarks/run.py                          # 默认 10k 与 1M 行
+    python benchmarks/run.py --rows 10000 1000000 10000000 --engine duckdb
+    python benchmarks/run.py --stages ingest search   # 只运行名称包含指定关键词的阶段
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from aggregation import aggregation_cache  # noqa: E402
+from charts import create_visualization  # noqa: E402
+from chart_cache import chart_cache, figure_to_png  # noqa: E402
+from core import calculate_statistics, process_dataframe, sort_dataframe  # noqa: E402
+from engine import get_engine, use_engine  # noqa: E402
+from filters import OP_IN, OP_RANGE, filter_index_cache  # noqa: E402
+from loader import dataframe_cache, ingest_file, invalidate_file, load_dataframe, remove_sidecar  # noqa: E402
+from pagination import page_slice, sort_permutation_cache  # noqa: E402
+from perf import arrow_allocated_bytes, current_rss_bytes  # noqa: E402
+from search import search_index_cache  # noqa: E402
+
+from generate import generate_csv  # noqa: E402
+
+DEFAULT_ROWS = [10_000, 1_000_000]
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+GROUP_COLS = ['地区', 'channel']
+VALUE_COL = '销售额'
+AGG_LABELS = ['计数', '平均值', '中位数']
+FILTERS = [('地区', OP_IN, ('华东', '华南')), (VALUE_COL, OP_RANGE, (100, 500))]
+SEARCH_QUERY = 'city_12'
+SORT_COLS = ['地区', VALUE_COL]
+SORT_ASCENDING = [True, False]
+CHARTS = [
+    ('柱状图', '地区', VALUE_COL),
+    ('折线图', '订单日期', VALUE_COL),
+    ('散点图', '数量', VALUE_COL),
+    ('箱线图', 'channel', VALUE_COL),
+    ('小提琴图', 'channel', VALUE_COL),
+]
+
+
+def clear_caches():
+    """清空进程内的全部缓存，用于测量冷启动"""
+    for cache in (dataframe_cache, aggregation_cache, sort_permutation_cache, search_index_cache,
+                  chart_cache, filter_index_cache):
+        cache.clear()
+    gc.collect()
+
+
+def measure(func, setup=None, trace_memory=True) -> dict:
+    """
+    运行一次计时并记录常驻内存与Arrow分配的变化，再在 tracemalloc 下运行一次记录Python堆峰值
+    （tracemalloc 会拖慢计时，因此分开测量）
+    """
+    if setup is not None:
+        setup()
+    gc.collect()
+    rss_before, arrow_before = current_rss_bytes(), arrow_allocated_bytes()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    result = {
+        'seconds': round(seconds, 6),
+        'rss_delta_mb': round((current_rss_bytes() - rss_before) / 2 ** 20, 2),
+        'arrow_delta_mb': round((arrow_allocated_bytes() - arrow_before) / 2 ** 20, 2),
+    }
+    if trace_memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['py_heap_peak_mb'] = round(peak / 2 ** 20, 2)
+    return result
+
+
+def build_stages(path: str):
+    """返回 [(阶段名, 函数, 准备函数)]，准备函数为 clear_caches 的是冷启动测量"""
+    def ingest():
+        remove_sidecar(path)
+        invalidate_file(path)
+        ingest_file(path, process_dataframe)
+
+    def preprocess():
+        process_dataframe(pd.read_csv(path))
+
+    def statistics():
+        df = load_dataframe(path)
+        calculate_statistics(df, GROUP_COLS, VALUE_COL, AGG_LABELS, filepath=path)
+
+    def coarser_statistics():
+        df = load_dataframe(path)
+        calculate_statistics(df, GROUP_COLS[:1], VALUE_COL, ['计数', '平均值'], filepath=path)
+
+    def filtered_statistics():
+        df = load_dataframe(path)
+        calculate_statistics(df, GROUP_COLS, VALUE_COL, AGG_LABELS, filepath=path, filters=FILTERS)
+
+    def search():
+        get_engine().search(path, SEARCH_QUERY)
+
+    def filter_rows():
+        get_engine().filter(path, FILTERS)
+
+    def sort():
+        df = load_dataframe(path)
+        permutation = sort_dataframe(df, SORT_COLS, SORT_ASCENDING, filepath=path)
+        page_slice(df, 100, 1000, permutation=permutation)
+
+    def warm_load():
+        load_dataframe(path)
+
+    stages = [
+        ('ingest', ingest, None),
+        ('process_dataframe', preprocess, None),
+        ('load_dataframe.cold', warm_load, clear_caches),
+        ('load_dataframe.warm', warm_load, warm_load),
+        ('calculate_statistics.cold', statistics, lambda: (clear_caches(), warm_load())),
+        ('calculate_statistics.warm', statistics, None),
+        ('calculate_statistics.coarser', coarser_statistics, None),
+        ('calculate_statistics.filtered', filtered_statistics, None),
+        ('filter.cold', filter_rows, lambda: (clear_caches(), warm_load())),
+        ('filter.warm', filter_rows, None),
+        ('search.cold', search, lambda: (clear_caches(), warm_load())),
+        ('search.warm', search, None),
+        ('sort_dataframe.cold', sort, lambda: (clear_caches(), warm_load())),
+        ('sort_dataframe.warm', sort, None),
+    ]
+    for chart_type, x_axis, y_axis in CHARTS:
+        def render(chart_type=chart_type, x_axis=x_axis, y_axis=y_axis):
+            figure_to_png(create_visualization(load_dataframe(path), chart_type, x_axis, y_axis))
+        stages.append((f'create_visualization.{chart_type}', render, warm_load))
+    return stages
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV文件分析系统性能基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='数据规模（行数）')
+    parser.add_argument('--engine', choices=['pandas', 'duckdb'], default='pandas', help='执行引擎')
+    parser.add_argument('--stages', nargs='*', help='只运行名称包含这些关键词的阶段')
+    parser.add_argument('--no-memory', action='store_true', help='不测量Python堆峰值（跳过 tracemalloc 运行）')
+    parser.add_argument('--output', help='结果文件路径，默认写入 benchmarks/results/')
+    args = parser.parse_args()
+
+    engine = use_engine(args.engine)
+    results = []
+    for rows in args.rows:
+        path = generate_csv(os.path.join(DATA_DIR, f'sales_{rows}.csv'), rows)
+        for name, func, setup in build_stages(path):
+            if args.stages and not any(keyword in name for keyword in args.stages):
+                continue
+            result = measure(func, setup, trace_memory=not args.no_memory)
+            result.update(rows=rows, stage=name)
+            results.append(result)
+            peak = f" Python堆峰值 {result['py_heap_peak_mb']:>8.1f} MB" if 'py_heap_peak_mb' in result else ''
+            print(f"{rows:>10} {name:<34} {result['seconds']:>9.3f} s  常驻 {result['rss_delta_mb']:>+8.1f} MB"
+                  f"  Arrow {result['arrow_delta_mb']:>+8.1f} MB{peak}", flush=True)
+        clear_caches()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'engine': engine.name,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + f'-{engine.name}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+多会话内存压力测试：模拟N个并发会话打开相同的文件，报告进程常驻内存
+
+Streamlit的会话是同一进程中的线程，因此每个会话用一个线程模拟：加载每个文件、取预览页、
+筛选并取出结果页与绘图所需的列，会话状态保留到全部会话就绪后再测量内存。
+测量前先回收并发期间分配器缓存的空闲内存（pyarrow内存池与glibc malloc_trim），使常驻内存反映仍在使用的数据，
+并发时的瞬时峰值另行报告。每种模式与会话数在独立的子进程中运行，互不影响：
+
+    mmap  共享的只读内存映射数据集（MMAP_DATASETS=True）
+    heap  共享的堆内存数据框缓存（MMAP_DATASETS=False）
+    copy  每个会话各自读取并压缩一份数据框（不共享时的情形，作为对照）
+
+用法：
+    python benchmarks/sessions.py                                   # 默认 2 个 1M 行文件，1/10/30 个会话
+    python benchmarks/sessions.py --rows 5000000 --files 3 --sessions 1 30 --modes mmap heap
+"""
+import argparse
+import ctypes
+import gc
+import json
+import os
+import subprocess
+import resource
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pyarrow as pa  # noqa: E402
+
+import loader  # noqa: E402
+from compaction import compact_dataframe  # noqa: E402
+from engine import get_engine  # noqa: E402
+from filters import OP_IN, OP_RANGE, filter_dataframe  # noqa: E402
+from pagination import page_slice  # noqa: E402
+from perf import current_rss_bytes  # noqa: E402
+
+from generate import generate_csv  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+MODES = ['mmap', 'heap', 'copy']
+DEFAULT_SESSIONS = [1, 10, 30]
+
+PAGE_SIZE = 1000
+FILTERS = [('地区', OP_IN, ('华东', '华南')), ('销售额', OP_RANGE, (100, 500))]
+CHART_COLUMNS = ['订单日期', '销售额']
+
+
+def memory_mb() -> dict:
+    """常驻内存及其中的匿名内存与文件映射部分（后两者仅Linux可用）"""
+    result = {'rss_mb': round(current_rss_bytes() / 2 ** 20, 1)}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('RssAnon', 'RssFile'):
+                    result[key.lower().replace('rss', 'rss_') + '_mb'] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return result
+
+
+def release_free_memory() -> None:
+    """回收Python、pyarrow内存池与分配器缓存的空闲内存（非glibc平台不回收分配器缓存）"""
+    gc.collect()
+    pa.default_memory_pool().release_unused()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def peak_rss_mb() -> float:
+    # Linux下 ru_maxrss 的单位为KB，macOS下为字节
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20, 1)
+
+
+def prepare_files(rows: int, files: int) -> list:
+    """生成并导入测试文件，预先写好内存映射数据集文件，返回CSV路径"""
+    paths = []
+    for i in range(files):
+        path = generate_csv(os.path.join(DATA_DIR, f'sessions_{rows}_{i}.csv'), rows, seed=i)
+        if not loader.has_fresh_sidecar(path):
+            loader.ingest_file(path)
+        if not loader.has_fresh_arrow(path):
+            loader.write_dataset(path)
+        paths.append(path)
+    return paths
+
+
+def open_session(mode: str, paths: list) -> list:
+    """模拟一个会话打开全部文件，返回会话保留的状态"""
+    state = []
+    for path in paths:
+        if mode == 'copy':
+            df, _ = compact_dataframe(pd.read_parquet(loader.sidecar_path(path)))
+            positions = filter_dataframe(df, FILTERS)
+        else:
+            # 与页面相同，筛选索引按文件在会话间共享
+            df = loader.load_dataframe(path)
+            positions = get_engine().filter(path, FILTERS)
+        preview = page_slice(df, 0, PAGE_SIZE)
+        results = page_slice(df, 0, PAGE_SIZE, positions=positions)
+        # 绘图只取所需的列，用完即释放
+        chart_rows = len(df[CHART_COLUMNS].iloc[positions])
+        state.append((df, preview, positions, results, chart_rows))
+    return state
+
+
+def run_child(mode: str, sessions: int, paths: list) -> dict:
+    """在当前进程中模拟指定数量的并发会话并测量内存"""
+    loader.MMAP_DATASETS = mode == 'mmap'
+    release_free_memory()
+    baseline = memory_mb()
+    states = [None] * sessions
+    barrier = threading.Barrier(sessions)
+
+    def session(i):
+        # 所有会话同时开始，模拟并发打开
+        barrier.wait()
+        states[i] = open_session(mode, paths)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    result = {'mode': mode, 'sessions': sessions, 'seconds': round(seconds, 3), 'baseline': baseline,
+              'peak_rss_mb': peak_rss_mb()}
+    release_free_memory()
+    result.update(memory_mb())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多会话内存压力测试')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='每个文件的行数')
+    parser.add_argument('--files', type=int, default=2, help='文件数量')
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS, help='并发会话数')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='加载模式')
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'SESSIONS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    paths = prepare_files(args.rows, args.files)
+    if args.child:
+        mode, sessions = args.child
+        print(json.dumps(run_child(mode, int(sessions), paths)))
+        return
+
+    size_mb = sum(os.path.getsize(loader.arrow_path(path)) for path in paths) / 2 ** 20
+    print(f"{args.files} 个文件 × {args.rows} 行，数据集文件共 {size_mb:.1f} MB")
+    print(f"{'模式':<6}{'会话数':>6}{'RSS(MB)':>10}{'匿名(MB)':>10}{'文件映射(MB)':>14}{'新增RSS(MB)':>13}"
+          f"{'峰值(MB)':>10}{'耗时(s)':>9}")
+    results = []
+    for mode in args.modes:
+        for sessions in args.sessions:
+            command = [sys.executable, os.path.abspath(__file__), '--rows', str(args.rows), '--files',
+                       str(args.files), '--child', mode, str(sessions)]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            added = result['rss_mb'] - result['baseline']['rss_mb']
+            print(f"{mode:<8}{sessions:>6}{result['rss_mb']:>10.1f}{result.get('rss_anon_mb', np.nan):>10.1f}"
+                  f"{result.get('rss_file_mb', np.nan):>14.1f}{added:>13.1f}{result['peak_rss_mb']:>10.1f}"
+                  f"{result['seconds']:>9.2f}", flush=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'files': args.files, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import io
+
+import pandas as pd
+
+from config import CHART_CACHE_MAX_BYTES, CHART_DPI
+from lru import LRUCache
+
+
+def dataframe_fingerprint(df: pd.DataFrame) -> tuple:
+    """按内容计算数据框指纹，用于没有文件标识的小数据框（如统计结果）"""
+    hashed = pd.util.hash_pandas_object(df, index=True)
+    return (tuple(map(str, df.columns)), len(df), int(hashed.sum()))
+
+
+def figure_to_png(fig) -> bytes:
+    """将图表渲染为PNG字节并关闭图表，避免pyplot中的图表不断累积"""
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format='png', dpi=CHART_DPI)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+# 按 (数据指纹, 图表类型, X轴, Y轴) 缓存渲染后的图表，按字节预算进行LRU淘汰
+chart_cache = LRUCache(CHART_CACHE_MAX_BYTES, sizeof=len)
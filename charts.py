@@ -0,0 +1,168 @@
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from config import (LARGE_CHART_ROW_THRESHOLD, DOWNSAMPLE_POINTS, BAR_TOP_N, BOX_MAX_GROUPS, VIOLIN_BINS,
+                    HEXBIN_GRIDSIZE, MAX_XTICKS)
+from downsample import OTHER_LABEL, line_series, top_n_with_other, top_groups, box_stats, violin_stats
+
+# 支持的图表类型
+CHART_TYPES = ["柱状图", "折线图", "散点图", "箱线图", "小提琴图"]
+
+_plotting = None
+_plotting_lock = threading.Lock()
+
+
+def plotting():
+    """
+    首次绘图时才导入并配置matplotlib与seaborn，返回 (pyplot, seaborn)
+
+    两者导入较慢，页面启动和不含图表的重跑无需承担；字体与样式只设置一次。
+    """
+    global _plotting
+    with _plotting_lock:
+        if _plotting is None:
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+
+            # 设置中文字体
+            plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
+            plt.rcParams['axes.unicode_minus'] = False  # 用来正常显示负号
+            # 设置Seaborn样式
+            sns.set_style("whitegrid")
+            sns.set_context("notebook", font_scale=1.2)
+            _plotting = (plt, sns)
+        return _plotting
+
+
+def draw_large_scatter(ax, fig, df: pd.DataFrame, x_axis: str, y_axis: str) -> str:
+    """大数据量散点图：数值或日期X轴使用六边形分箱，其余随机抽样，返回采样说明"""
+    import matplotlib.dates as mdates
+
+    _, sns = plotting()
+    data = df[[x_axis, y_axis]].dropna() if x_axis != y_axis else df[[x_axis]].dropna()
+    x_values = data[x_axis]
+    if pd.api.types.is_numeric_dtype(x_values) and not pd.api.types.is_bool_dtype(x_values):
+        x_numeric = x_values.to_numpy(dtype=float)
+        is_date = False
+    elif pd.api.types.infer_dtype(x_values, skipna=True) in ('date', 'datetime', 'datetime64'):
+        x_numeric = mdates.date2num(pd.to_datetime(x_values).to_numpy())
+        is_date = True
+    else:
+        sample = data.sample(min(DOWNSAMPLE_POINTS, len(data)), random_state=0)
+        sns.scatterplot(data=sample, x=x_axis, y=y_axis, ax=ax)
+        return f"随机抽样 {len(sample)} 点"
+    hexbin = ax.hexbin(x_numeric, data[y_axis].to_numpy(dtype=float), gridsize=HEXBIN_GRIDSIZE, mincnt=1, cmap='viridis')
+    if is_date:
+        ax.xaxis_date()
+    fig.colorbar(hexbin, ax=ax, label='行数')
+    return f"六边形分箱密度图（{HEXBIN_GRIDSIZE} 格）"
+
+
+def create_visualization(df: pd.DataFrame, chart_type: str, x_axis: str, y_axis: str,
+                         bin_edges: Optional[np.ndarray] = None):
+    """
+    创建可视化图表，bin_edges 为小提琴图预先确定的分箱边界
+
+    列不存在或无法绘制时抛出 ValueError。
+    """
+    if x_axis not in df.columns:
+        raise ValueError(f"列 '{x_axis}' 不存在于数据中")
+    if y_axis not in df.columns:
+        raise ValueError(f"列 '{y_axis}' 不存在于数据中")
+
+    # 只取绘图需要的列（写时复制，不修改共享或内存映射的原数据）
+    df = df[list(dict.fromkeys([x_axis, y_axis]))]
+    if isinstance(df[x_axis].dtype, pd.CategoricalDtype):
+        # 不显示数据中不存在的类别
+        df[x_axis] = df[x_axis].cat.remove_unused_categories()
+
+    # 检查并转换 y 轴数据
+    if df[y_axis].dtype == 'object':
+        df[y_axis] = pd.to_numeric(df[y_axis], errors='coerce')
+        if df[y_axis].isna().all():
+            raise ValueError(f"列 '{y_axis}' 无法转换为数值类型")
+
+    # 检查数据是否为空
+    if df[y_axis].isna().all():
+        raise ValueError(f"列 '{y_axis}' 所有值都为空")
+
+    plt, sns = plotting()
+    from matplotlib.ticker import MaxNLocator
+
+    # 创建图表
+    fig = None
+    try:
+        fig, ax = plt.subplots(figsize=(12, 6))
+        # 数据量超过阈值时使用降采样或分箱绘制
+        large = len(df) > LARGE_CHART_ROW_THRESHOLD
+        note = None
+
+        if chart_type == "柱状图":
+            n_categories = df[x_axis].nunique()
+            if n_categories > BAR_TOP_N or large:
+                # 类别过多时保留行数最多的前N个，其余合并为“其他”
+                bar_df = top_n_with_other(df, x_axis, y_axis, BAR_TOP_N)
+                sns.barplot(data=bar_df, x=x_axis, y=y_axis, ax=ax, ci=None)
+                if n_categories > BAR_TOP_N:
+                    note = f"显示行数最多的 {BAR_TOP_N} 个类别，其余 {n_categories - BAR_TOP_N} 个合并为“{OTHER_LABEL}”"
+            else:
+                sns.barplot(data=df, x=x_axis, y=y_axis, ax=ax, ci=None)
+        elif chart_type == "折线图":
+            if large:
+                series, n_points = line_series(df, x_axis, y_axis, DOWNSAMPLE_POINTS)
+                x_values = series.index.astype(str) if isinstance(series.index, pd.CategoricalIndex) else series.index
+                ax.plot(x_values, series.to_numpy())
+                note = f"按X取均值，LTTB降采样 {n_points} → {len(series)} 点"
+            else:
+                sns.lineplot(data=df, x=x_axis, y=y_axis, ax=ax, ci=None)
+        elif chart_type == "散点图":
+            if large:
+                note = draw_large_scatter(ax, fig, df, x_axis, y_axis)
+            else:
+                sns.scatterplot(data=df, x=x_axis, y=y_axis, ax=ax)
+        elif chart_type == "箱线图":
+            if large:
+                groups = top_groups(df, x_axis, BOX_MAX_GROUPS)
+                ax.bxp(box_stats(df, x_axis, y_axis, groups), showfliers=False)
+                note = f"由分位数绘制（不含离群点），共 {len(groups)} 组"
+            else:
+                sns.boxplot(data=df, x=x_axis, y=y_axis, ax=ax)
+        elif chart_type == "小提琴图":
+            if large:
+                groups = top_groups(df, x_axis, BOX_MAX_GROUPS)
+                stats, labels = violin_stats(df, x_axis, y_axis, groups, VIOLIN_BINS, edges=bin_edges)
+                if stats:
+                    positions = list(range(len(stats)))
+                    ax.violin(stats, positions=positions, showmedians=True)
+                    ax.set_xticks(positions)
+                    ax.set_xticklabels(labels)
+                note = f"由 {VIOLIN_BINS} 分箱直方图绘制，共 {len(labels)} 组"
+            else:
+                sns.violinplot(data=df, x=x_axis, y=y_axis, ax=ax)
+
+        if large and len(ax.get_xticks()) > MAX_XTICKS:
+            # 类别过多时只标注部分刻度，避免绘制大量标签
+            ax.xaxis.set_major_locator(MaxNLocator(nbins=MAX_XTICKS))
+
+        # 设置标签和样式
+        plt.xticks(rotation=45, ha='right', fontsize=10)
+        plt.yticks(fontsize=10)
+        ax.set_xlabel(x_axis, fontsize=12)
+        ax.set_ylabel(y_axis, fontsize=12)
+        ax.set_title(f"{chart_type}: {x_axis} vs {y_axis}", fontsize=14, pad=20)
+        if note:
+            # 在图上标注所用的采样方式
+            ax.text(0.99, 0.99, f"{len(df)} 行数据：{note}", transform=ax.transAxes,
+                    ha='right', va='top', fontsize=9, color='gray',
+                    bbox=dict(facecolor='white', alpha=0.7, edgecolor='none'))
+
+        # 调整布局
+        plt.tight_layout()
+        return fig
+    except Exception:
+        if fig is not None:
+            plt.close(fig)
+        raise
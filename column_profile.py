@@ -0,0 +1,307 @@
+import base64
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from config import (INGEST_CHUNK_ROWS, PROFILE_TOP_K, PROFILE_HIST_BINS, PROFILE_EXACT_DISTINCT_MAX,
+                    PROFILE_HLL_PRECISION, PROFILE_KEEP_COUNTS_MAX, BAR_TOP_N)
+from schema import DATE_KINDS, date_kind
+
+# 数值类型的列，可作为统计字段与Y轴
+NUMERIC_KINDS = ('int', 'float', 'percent')
+
+# 可比较大小的列类型，记录最小值与最大值
+ORDERED_KINDS = NUMERIC_KINDS + DATE_KINDS
+
+# 列类型在界面上的名称
+KIND_LABELS = {
+    'int': '整数',
+    'float': '小数',
+    'percent': '百分比',
+    'bool': '布尔',
+    'date': '日期',
+    'datetime': '日期时间',
+    'string': '文本',
+    'empty': '空',
+}
+
+
+def _plain(value):
+    """转换为可写入JSON的值"""
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class HyperLogLog:
+    """HyperLogLog基数估算，寄存器可合并与序列化"""
+
+    def __init__(self, precision: int = PROFILE_HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values: pd.Series) -> None:
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes << np.uint64(self.precision)
+        # 剩余位中首个1的位置（从1开始），全为0时取最大值
+        bit_length = np.minimum(np.frexp(rest.astype(np.float64))[1], 64)
+        rank = np.where(rest == 0, 64 - self.precision + 1, 65 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # 小基数时使用线性计数
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_string(self) -> str:
+        return base64.b64encode(self.registers.tobytes()).decode('ascii')
+
+    @classmethod
+    def from_string(cls, text: str) -> 'HyperLogLog':
+        registers = np.frombuffer(base64.b64decode(text), dtype=np.uint8).copy()
+        return cls(int(np.log2(len(registers))), registers)
+
+
+def histogram_edges(kind: str, lo, hi, bins: int = PROFILE_HIST_BINS) -> Optional[np.ndarray]:
+    """由最小值与最大值确定数值列的分箱边界"""
+    if kind not in NUMERIC_KINDS or lo is None or hi is None:
+        return None
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(float(lo), float(hi), bins + 1)
+
+
+class ColumnProfiler:
+    """
+    逐块累积单列的概要：空值数、最小值、最大值、基数、最常见取值与直方图
+
+    不同值较少时精确计数；超过 PROFILE_EXACT_DISTINCT_MAX 后只保留计数最多的取值，
+    基数改由HyperLogLog估算。
+    """
+
+    def __init__(self, kind: str, edges: Optional[np.ndarray] = None):
+        self.kind = kind
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.counts = pd.Series(dtype='int64')
+        self.counts_exact = True
+        self.hll = HyperLogLog()
+        self.edges = edges
+        self.histogram = np.zeros(len(edges) - 1, dtype=np.int64) if edges is not None else None
+
+    def update(self, values: pd.Series) -> None:
+        self.nulls += int(values.isna().sum())
+        values = values.dropna()
+        if not len(values):
+            return
+        if self.kind in ORDERED_KINDS:
+            lo, hi = values.min(), values.max()
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+        self.hll.add(values)
+
+        counts = values.value_counts(sort=False)
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(object)
+        self.counts = counts if self.counts.empty else self.counts.add(counts, fill_value=0).astype('int64')
+        if len(self.counts) > PROFILE_EXACT_DISTINCT_MAX:
+            self.counts = self.counts.nlargest(PROFILE_EXACT_DISTINCT_MAX)
+            self.counts_exact = False
+
+        if self.histogram is not None:
+            self.histogram += np.histogram(values.to_numpy(dtype=float), bins=self.edges)[0]
+
+    def to_dict(self) -> dict:
+        counts = self.counts.sort_values(ascending=False, kind='stable')
+        top = counts.head(PROFILE_TOP_K)
+        return {
+            'kind': self.kind,
+            'nulls': self.nulls,
+            'min': _plain(self.min),
+            'max': _plain(self.max),
+            'distinct': len(self.counts) if self.counts_exact else self.hll.estimate(),
+            'distinct_exact': self.counts_exact,
+            'top': [[_plain(value), int(count)] for value, count in top.items()],
+            'histogram': None if self.histogram is None else {
+                'edges': self.edges.tolist(),
+                'counts': self.histogram.tolist(),
+            },
+            'hll': self.hll.to_string(),
+            # 不同值较少时保留全部取值的计数，文件追加行后可精确合并
+            'counts': [[_plain(value), int(count)] for value, count in counts.items()]
+            if self.counts_exact and len(counts) <= PROFILE_KEEP_COUNTS_MAX else None,
+        }
+
+
+def merge_profile(base: dict, tail: ColumnProfiler) -> dict:
+    """
+    合并同一列已有部分的概要与新增部分的累积结果（用于文件追加行后增量更新）
+
+    已有部分保留了全部取值的计数时基数与常见值可精确合并，否则常见值为近似结果，
+    基数由合并后的HyperLogLog估算；直方图沿用已有的分箱边界，新增的值超出范围时由调用方重新分箱。
+    """
+    merged = tail.to_dict()
+    hll = HyperLogLog.from_string(base['hll'])
+    hll.merge(tail.hll)
+    base_counts = base.get('counts')
+    counts = {value: count for value, count in (base_counts if base_counts is not None else base['top'])}
+    for value, count in tail.counts.items():
+        value = _plain(value)
+        counts[value] = counts.get(value, 0) + int(count)
+    exact = base_counts is not None and tail.counts_exact
+    ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    top = ranked[:PROFILE_TOP_K]
+    bounds = [value for value in (base['min'], merged['min']) if value is not None]
+    upper = [value for value in (base['max'], merged['max']) if value is not None]
+    merged.update(
+        nulls=base['nulls'] + tail.nulls,
+        min=min(bounds) if bounds else None,
+        max=max(upper) if upper else None,
+        distinct=len(counts) if exact else hll.estimate(),
+        distinct_exact=exact,
+        top=[[value, count] for value, count in top],
+        hll=hll.to_string(),
+        counts=[[value, count] for value, count in ranked] if exact and len(ranked) <= PROFILE_KEEP_COUNTS_MAX else None,
+    )
+    if base['histogram'] is not None and merged['histogram'] is not None:
+        merged['histogram']['counts'] = [
+            a + b for a, b in zip(base['histogram']['counts'], merged['histogram']['counts'])
+        ]
+    return merged
+
+
+def column_histogram(path: str, column: str, edges: np.ndarray, batch_rows: int = INGEST_CHUNK_ROWS) -> dict:
+    """分块读取Parquet文件中的一列计算直方图"""
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=[column]):
+        values = batch.column(0).to_pandas().dropna()
+        counts += np.histogram(values.to_numpy(dtype=float), bins=edges)[0]
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def profile_parquet(path: str, kinds: Dict[str, str], column_stats: Dict[str, dict],
+                    batch_rows: int = INGEST_CHUNK_ROWS) -> dict:
+    """逐列分块读取Parquet文件生成列概要，直方图边界使用导入时统计的最小值与最大值"""
+    parquet = pq.ParquetFile(path)
+    columns = {}
+    for col, kind in kinds.items():
+        stats = column_stats.get(col, {})
+        profiler = ColumnProfiler(kind, histogram_edges(kind, stats.get('min'), stats.get('max')))
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=[col]):
+            profiler.update(batch.column(0).to_pandas())
+        columns[col] = profiler.to_dict()
+    return {'rows': parquet.metadata.num_rows, 'columns': columns}
+
+
+def infer_kind(values: pd.Series) -> str:
+    """由已转换的列推断列类型（用于没有导入元数据的数据框）"""
+    if pd.api.types.is_bool_dtype(values):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(values):
+        return 'int'
+    if pd.api.types.is_float_dtype(values):
+        return 'float' if values.notna().any() else 'empty'
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return date_kind(values)
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+    if inferred == 'date':
+        return 'date'
+    if inferred == 'datetime':
+        return date_kind(pd.to_datetime(values, errors='coerce'))
+    return 'string'
+
+
+def profile_dataframe(df: pd.DataFrame) -> dict:
+    """为内存中的数据框生成列概要"""
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # 压缩后的分类列按原始取值统计
+            values = values.astype(values.cat.categories.dtype)
+        kind = infer_kind(values)
+        edges = None
+        if kind in NUMERIC_KINDS and values.notna().any():
+            edges = histogram_edges(kind, values.min(), values.max())
+        profiler = ColumnProfiler(kind, edges)
+        profiler.update(values)
+        columns[col] = profiler.to_dict()
+    return {'rows': len(df), 'columns': columns}
+
+
+def numeric_columns(profile: dict) -> List[str]:
+    """数值类型的列"""
+    return [col for col, info in profile['columns'].items() if info['kind'] in NUMERIC_KINDS]
+
+
+def categorical_columns(profile: dict) -> List[str]:
+    """可用于分组的非数值列（不含全空列）"""
+    return [
+        col for col, info in profile['columns'].items()
+        if info['kind'] not in NUMERIC_KINDS and info['kind'] != 'empty'
+    ]
+
+
+def suggest_x_axis(profile: dict) -> Optional[str]:
+    """建议的X轴：日期列优先，其次是类别数适中的分类列"""
+    columns = profile['columns']
+    for col, info in columns.items():
+        if info['kind'] in DATE_KINDS:
+            return col
+    for col in categorical_columns(profile):
+        if 1 < columns[col]['distinct'] <= BAR_TOP_N:
+            return col
+    return next(iter(columns), None)
+
+
+def suggest_y_axis(profile: dict, exclude: Optional[str] = None) -> Optional[str]:
+    """建议的Y轴：第一个有非空值的数值列"""
+    rows = profile['rows']
+    for col in numeric_columns(profile):
+        if col != exclude and profile['columns'][col]['nulls'] < rows:
+            return col
+    return None
+
+
+def value_bin_edges(profile: dict, column: str, bins: int) -> Optional[np.ndarray]:
+    """按列的取值范围等分的分箱边界"""
+    info = profile['columns'].get(column)
+    if info is None:
+        return None
+    return histogram_edges(info['kind'], info['min'], info['max'], bins)
+
+
+def summary_table(profile: dict) -> pd.DataFrame:
+    """列概要表格，分布列为直方图的各箱计数"""
+    rows = []
+    for col, info in profile['columns'].items():
+        distinct = f"{info['distinct']:,}" if info['distinct_exact'] else f"≈{info['distinct']:,}"
+        rows.append({
+            '列名': str(col),
+            '类型': KIND_LABELS.get(info['kind'], info['kind']),
+            '空值数': info['nulls'],
+            '不同值数': distinct,
+            '最小值': '' if info['min'] is None else str(info['min']),
+            '最大值': '' if info['max'] is None else str(info['max']),
+            '常见值': '、'.join(f"{value}（{count}）" for value, count in info['top'][:3]),
+            '分布': info['histogram']['counts'] if info['histogram'] else None,
+        })
+    return pd.DataFrame(rows).set_index('列名')
@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aggregation import AGG_FUNCS
+from column_profile import NUMERIC_KINDS, histogram_edges
+from config import COMBINED_WORKERS, COMBINED_MEDIAN_BINS, COMBINED_CACHE_SIZE
+from loader import get_column_profile, get_file_key, load_dataframe
+from lru import LRUCache
+from perf import timed, AGGREGATE
+
+# 直方图中表示分箱序号的索引层名称
+BIN_LEVEL = '__bin__'
+
+# 各文件部分聚合中可直接合并的统计量；m2 为组内离差平方和，用于合并标准差
+PARTIAL_AGGS = ['count', 'sum', 'min', 'max']
+MERGE_FUNCS = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def file_schema(filepath: str) -> Dict[str, str]:
+    """文件的列类型（取自列概要）"""
+    return {col: info['kind'] for col, info in get_column_profile(filepath)['columns'].items()}
+
+
+def combined_schema(schemas: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    """
+    检查多个文件的列类型是否兼容，返回合并后的列类型
+
+    各文件须有相同的列（顺序可以不同）；同一列的类型须一致，整数与小数视为兼容（合并为小数），
+    全空列与任何类型兼容。不兼容时抛出 ValueError，说明哪些文件的哪些列不一致。
+    """
+    names = list(schemas)
+    first = schemas[names[0]]
+    problems = []
+    for name in names[1:]:
+        missing = [col for col in first if col not in schemas[name]]
+        extra = [col for col in schemas[name] if col not in first]
+        if missing:
+            problems.append(f"{name} 缺少列 {', '.join(map(str, missing))}")
+        if extra:
+            problems.append(f"{name} 多出列 {', '.join(map(str, extra))}")
+    if problems:
+        raise ValueError("文件的列不一致：" + "；".join(problems))
+
+    merged = {}
+    for col in first:
+        kinds = {schemas[name][col] for name in names} - {'empty'}
+        if not kinds:
+            merged[col] = 'empty'
+        elif len(kinds) == 1:
+            merged[col] = kinds.pop()
+        elif kinds == {'int', 'float'}:
+            merged[col] = 'float'
+        else:
+            detail = '、'.join(f"{name}: {schemas[name][col]}" for name in names)
+            problems.append(f"列 '{col}' 的类型不一致（{detail}）")
+    if problems:
+        raise ValueError("；".join(problems))
+    return merged
+
+
+def numeric_columns(schema: Dict[str, str]) -> List[str]:
+    """数值类型的列"""
+    return [col for col, kind in schema.items() if kind in NUMERIC_KINDS]
+
+
+def categorical_columns(schema: Dict[str, str]) -> List[str]:
+    """可用于分组的非数值列（不含全空列）"""
+    return [col for col, kind in schema.items() if kind not in NUMERIC_KINDS and kind != 'empty']
+
+
+def median_edges(paths: Sequence[str], value_col: str, bins: int = COMBINED_MEDIAN_BINS) -> Optional[np.ndarray]:
+    """所有文件共用的中位数分箱边界，按列概要中各文件取值范围的并集等分"""
+    infos = [get_column_profile(path)['columns'][value_col] for path in paths]
+    lows = [info['min'] for info in infos if info['min'] is not None]
+    highs = [info['max'] for info in infos if info['max'] is not None]
+    if not lows:
+        return None
+    return histogram_edges(infos[0]['kind'], min(lows), max(highs), bins)
+
+
+def partial_aggregate(df: pd.DataFrame, group_cols: List[str], value_col: str,
+                      edges: Optional[np.ndarray]) -> Tuple[pd.DataFrame, Optional[pd.Series]]:
+    """
+    单个文件的部分聚合，返回 (分组统计量, 分组直方图)
+
+    分组统计量包含计数、求和、最小值、最大值与组内离差平方和 m2；
+    分组直方图按共用的分箱边界统计各组落入每个分箱的行数（只保留非零的分箱）。
+    """
+    grouped = df.groupby(group_cols, observed=True)[value_col]
+    stats = grouped.agg(PARTIAL_AGGS)
+    stats['m2'] = (grouped.var(ddof=0) * stats['count']).fillna(0.0)
+    if edges is None:
+        return stats, None
+
+    values = df[value_col].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(values)
+    # 右端点并入最后一个分箱
+    bins = np.clip(np.searchsorted(edges, values[valid], side='right') - 1, 0, len(edges) - 2)
+    keyed = df.loc[valid, group_cols].assign(**{BIN_LEVEL: bins})
+    sketch = keyed.groupby(group_cols + [BIN_LEVEL], observed=True).size()
+    return stats, sketch
+
+
+def _order_statistic(counts: pd.Series, cumulative: pd.Series, rank: pd.Series) -> pd.Series:
+    """各组第 rank 个值（从0开始）的估计：所在分箱内按行数等分的位置"""
+    before = cumulative - counts
+    found = counts[(before <= rank) & (cumulative > rank)]
+    index = found.index
+    bins = index.get_level_values(BIN_LEVEL).to_numpy()
+    fraction = (rank.loc[index].to_numpy() - before.loc[index].to_numpy() + 0.5) / found.to_numpy()
+    return pd.Series(bins + fraction, index=index.droplevel(BIN_LEVEL))
+
+
+def _sketch_median(sketch: pd.Series, group_cols: List[str], edges: np.ndarray) -> pd.Series:
+    """
+    由合并后的分组直方图估算各组中位数
+
+    与pandas一致，行数为偶数时取中间两个值的平均；每个值的估计都在其所在分箱内，误差不超过一个分箱的宽度。
+    """
+    counts = sketch.sort_index()
+    groups = counts.groupby(level=group_cols, observed=True, sort=False)
+    cumulative = groups.cumsum()
+    total = groups.transform('sum')
+    lower = _order_statistic(counts, cumulative, (total - 1) // 2)
+    upper = _order_statistic(counts, cumulative, total // 2)
+    # 分箱序号（含箱内位置）换算为取值
+    position = (lower + upper.reindex(lower.index)) / 2
+    width = edges[1] - edges[0]
+    return edges[0] + position * width
+
+
+def merge_partials(parts: Sequence[Tuple[pd.DataFrame, Optional[pd.Series]]], group_cols: List[str],
+                   edges: Optional[np.ndarray]) -> pd.DataFrame:
+    """
+    合并各文件的部分聚合，返回各组的 count、sum、min、max、mean、std、median
+
+    标准差按各部分的计数、均值与离差平方和精确合并（与pandas一致使用样本标准差）；
+    中位数由合并后的直方图估算，误差不超过一个分箱的宽度。
+    """
+    stats = pd.concat([part for part, _ in parts])
+    level = list(range(len(group_cols))) if len(group_cols) > 1 else 0
+    grouped = stats.groupby(level=level, observed=True)
+    merged = grouped.agg(MERGE_FUNCS)
+    # 各部分均值与总体均值的偏差并入离差平方和
+    total_count = grouped['count'].transform('sum')
+    total_mean = grouped['sum'].transform('sum') / total_count.replace(0, np.nan)
+    part_mean = stats['sum'] / stats['count'].replace(0, np.nan)
+    deviation = (stats['count'] * (part_mean - total_mean) ** 2).fillna(0.0)
+    m2 = (stats['m2'] + deviation).groupby(level=level, observed=True).sum()
+    merged.index.names = group_cols
+    m2.index.names = group_cols
+
+    merged['mean'] = merged['sum'] / merged['count'].replace(0, np.nan)
+    merged['std'] = np.sqrt(m2 / (merged['count'] - 1).where(merged['count'] > 1))
+    if edges is not None:
+        sketch = pd.concat([part for _, part in parts if part is not None])
+        sketch = sketch.groupby(level=group_cols + [BIN_LEVEL], observed=True).sum()
+        merged['median'] = _sketch_median(sketch, group_cols, edges).reindex(merged.index)
+    else:
+        merged['median'] = np.nan
+    return merged.sort_index()
+
+
+# 合并统计的结果，按 (各文件标识, 分组列, 统计列) 缓存
+_results = LRUCache(COMBINED_CACHE_SIZE)
+
+
+def _file_partial(filepath: str, group_cols: List[str], value_col: str, edges: Optional[np.ndarray]):
+    # 只加载需要的列（内存映射时为零拷贝的投影）
+    df = load_dataframe(filepath, columns=list(dict.fromkeys(group_cols + [value_col])))
+    return partial_aggregate(df, group_cols, value_col, edges)
+
+
+@timed(AGGREGATE)
+def combined_statistics(paths: Sequence[str], group_by_cols: Sequence[str], value_col: str,
+                        agg_funcs: Sequence[str]) -> pd.DataFrame:
+    """
+    跨多个文件计算分组统计，结果与把各文件拼接后调用 calculate_statistics 一致（中位数为近似值）
+
+    各文件在线程池中分别计算部分聚合，再合并为最终结果，任何时候都不拼接文件的数据。
+    agg_funcs 为界面上的指标名称（见 AGG_FUNCS），结果列使用相同的名称。
+    """
+    group_cols = list(group_by_cols)
+    key = (tuple(get_file_key(path) for path in paths), tuple(group_cols), value_col)
+    merged = _results.get(key)
+    if merged is None:
+        edges = median_edges(paths, value_col)
+        with ThreadPoolExecutor(max_workers=min(COMBINED_WORKERS, len(paths)),
+                                thread_name_prefix='combined') as executor:
+            parts = list(executor.map(lambda path: _file_partial(path, group_cols, value_col, edges), paths))
+        merged = merge_partials(parts, group_cols, edges)
+        _results.put(key, merged)
+    result = merged[[AGG_FUNCS[func] for func in agg_funcs]]
+    # 列名使用界面上的指标名称
+    result.columns = list(agg_funcs)
+    return result
@@ -0,0 +1,53 @@
+from typing import Tuple
+
+import pandas as pd
+
+from config import CATEGORY_MAX_UNIQUE_RATIO
+
+
+def _is_text_column(s: pd.Series) -> bool:
+    if not (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+        return False
+    return pd.api.types.infer_dtype(s, skipna=True) in ('string', 'empty')
+
+
+def _compact_text(s: pd.Series) -> pd.Series:
+    """低基数文本列转为category，其余转为Arrow字符串"""
+    non_null = s.count()
+    if non_null and s.nunique(dropna=True) <= non_null * CATEGORY_MAX_UNIQUE_RATIO:
+        return s.astype('category')
+    try:
+        return s.astype(pd.StringDtype('pyarrow'))
+    except ImportError:
+        return s
+
+
+def compact_column(s: pd.Series) -> pd.Series:
+    """压缩单列的存储类型，不改变取值"""
+    if pd.api.types.is_bool_dtype(s):
+        return s
+    if pd.api.types.is_integer_dtype(s):
+        return pd.to_numeric(s, downcast='integer')
+    # 小数列保持float64：单个取值降为float32虽然无损，求和、平均值等计算结果会损失精度
+    if _is_text_column(s):
+        return _compact_text(s)
+    return s
+
+
+def compact_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    压缩数据框的列类型
+
+    返回压缩后的数据框以及每列压缩前后类型与内存占用的报告。
+    """
+    before = df.memory_usage(deep=True, index=False)
+    compacted = pd.DataFrame({col: compact_column(df[col]) for col in df.columns}, index=df.index)
+    after = compacted.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        '原类型': df.dtypes.astype(str),
+        '新类型': compacted.dtypes.astype(str),
+        '原内存(MB)': before / 1024 / 1024,
+        '新内存(MB)': after / 1024 / 1024,
+    })
+    report.index.name = '列名'
+    return compacted, report
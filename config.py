@@ -7,13 +7,99 @@ USERS: Dict[str, str] = {
     "user1": "admin888"
 }
 
+# 用户角色，未列出的用户（包括未启用登录时的访客）使用默认角色
+ROLE_ADMIN = "admin"
+ROLE_USER = "user"
+USER_ROLES: Dict[str, str] = {
+    "admin": ROLE_ADMIN,
+}
+DEFAULT_ROLE = ROLE_USER
+
 # 会话状态键
 SESSION_STATE_USER = "user"
 SESSION_STATE_AUTHENTICATED = "authenticated"
+SESSION_STATE_PERF_TRACES = "perf_traces"  # 本会话的重跑性能记录
+SESSION_STATE_PERF_PROFILE_NEXT = "perf_profile_next"  # 下一次重跑是否使用cProfile分析
 
 # 页面配置
 PAGE_TITLE = "CSV文件分析系统"
 PAGE_ICON = "📊"
 
 # 其他配置
-MAX_FILE_SIZE = 200 * 1024 * 1024  # 200MB 
\ No newline at end of file
+DATA_DIR = 'data'  # 上传文件的保存目录
+MAX_FILE_SIZE = 4 * 1024 * 1024 * 1024  # 4GB，需与 .streamlit/config.toml 中的 maxUploadSize 保持一致
+
+# 数据框缓存的内存预算（按 DataFrame.memory_usage(deep=True) 计算）
+DATAFRAME_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+
+# 共享数据集配置
+MMAP_DATASETS = True  # 导入任务将数据写入Arrow IPC文件，完整加载时以只读内存映射在会话间共享
+
+# 搜索索引配置
+SEARCH_INDEX_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 搜索索引缓存的字节预算
+SEARCH_NGRAM_MAX_UNIQUES = 100_000  # 唯一值超过该数量的列不建立倒排索引
+
+# 流式导入配置
+INGEST_CHUNK_ROWS = 200_000  # 每个解析块的行数
+UPLOAD_COPY_CHUNK_BYTES = 8 * 1024 * 1024  # 上传文件分块写入磁盘的大小
+INGEST_WORKERS = 0  # 后台导入进程数，0表示按CPU核数（最多4个）
+INGEST_POLL_SECONDS = 1.0  # 导入进度的刷新间隔（秒）
+
+# 类型压缩配置
+CATEGORY_MAX_UNIQUE_RATIO = 0.5  # 唯一值占比不超过该值的文本列转为category
+
+# 类型推断配置
+INFER_SAMPLE_ROWS = 10_000  # 抽样推断列类型的行数
+
+# 列概要配置
+PROFILE_TOP_K = 10  # 每列记录的最常见取值数量
+PROFILE_HIST_BINS = 20  # 数值列直方图的分箱数
+PROFILE_EXACT_DISTINCT_MAX = 10_000  # 不同值超过该数量时改用HyperLogLog估算基数
+PROFILE_HLL_PRECISION = 12  # HyperLogLog的精度（2^p个寄存器，相对误差约1.04/sqrt(2^p)）
+PROFILE_KEEP_COUNTS_MAX = 1000  # 不同值不超过该数量时在元数据中保留全部取值的计数（追加行后可精确合并）
+
+# 筛选配置
+FILTER_INDEX_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 列索引缓存的字节预算
+FILTER_BITMAP_CACHE_VALUES = 64  # 每列缓存位图的取值数量
+FILTER_MAX_OPTIONS = 1000  # 不同值不超过该数量时以下拉列表选择取值
+
+# 分页预览配置
+PAGE_SIZE_OPTIONS = [100, 500, 1000, 5000]  # 每页行数选项
+SORT_CACHE_SIZE = 16  # 最多缓存的排序排列数量
+
+# 大数据量图表配置
+LARGE_CHART_ROW_THRESHOLD = 100_000  # 超过该行数时启用降采样/分箱绘制
+DOWNSAMPLE_POINTS = 2_000  # 折线图降采样及散点图抽样的点数
+BAR_TOP_N = 20  # 柱状图保留的类别数，其余合并为“其他”
+BOX_MAX_GROUPS = 30  # 箱线图/小提琴图最多显示的分组数
+VIOLIN_BINS = 50  # 小提琴图直方图分箱数
+HEXBIN_GRIDSIZE = 60  # 散点图六边形分箱的网格大小
+MAX_XTICKS = 30  # 大数据量图表X轴最多显示的刻度数
+
+# 图表缓存配置
+CHART_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 渲染结果缓存的字节预算
+CHART_DPI = 100  # 图表渲染分辨率
+
+# 分组聚合缓存配置
+AGG_CACHE_MAX_BYTES = 128 * 1024 * 1024  # 聚合结果缓存的字节预算
+PRECOMPUTE_AGGREGATES = True  # 导入后在后台预计算单列分组
+PRECOMPUTE_MAX_GROUPS = 1000  # 唯一值不超过该数量的分类列参与预计算
+
+# 多文件合并统计配置
+COMBINED_WORKERS = 4  # 并行计算各文件部分聚合的线程数
+COMBINED_MEDIAN_BINS = 4096  # 估算中位数的可合并直方图分箱数（误差不超过取值范围的 1/分箱数）
+COMBINED_CACHE_SIZE = 16  # 最多缓存的合并统计结果数量
+
+# 执行引擎配置
+QUERY_ENGINE = "pandas"  # 统计、搜索与排序的执行引擎："pandas" 或 "duckdb"
+DUCKDB_THREADS = 0  # DuckDB使用的线程数，0表示使用默认值（CPU核数）
+
+# 性能监控配置
+PERF_ENABLED = True  # 记录各阶段耗时与内存（管理员可在页面底部查看）
+PERF_SESSION_HISTORY = 50  # 每个会话保留的重跑记录数
+PERF_LOG_FILE = ''  # 每次重跑追加一行JSON的日志文件，为空表示不写入
+PERF_PROMETHEUS_FILE = ''  # Prometheus文本格式的指标文件（供node_exporter textfile采集），为空表示不写入
+PERF_PROFILE_TOP = 40  # cProfile结果显示的函数数量
+# 性能面板的访问令牌：非空时，地址带 ?perf=<令牌> 的会话也显示性能面板
+# （默认关闭了登录验证，所有用户都是访客，无法按管理员角色显示）
+PERF_PANEL_TOKEN = ''
@@ -0,0 +1,81 @@
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from aggregation import AGG_FUNCS
+from column_profile import numeric_columns, categorical_columns
+from engine import get_engine
+from filters import Filter
+from pagination import compute_sort_permutation
+from perf import timed, AGGREGATE, PREPROCESS, SORT
+from schema import infer_and_convert
+
+
+def get_numeric_columns(df: pd.DataFrame, profile: Optional[dict] = None) -> List[str]:
+    """获取数值类型的列，有列概要时直接使用概要中的列类型"""
+    if profile is not None:
+        return numeric_columns(profile)
+    return df.select_dtypes(include=[np.number]).columns.tolist()
+
+
+def get_categorical_columns(df: pd.DataFrame, profile: Optional[dict] = None) -> List[str]:
+    """获取分类类型的列，有列概要时直接使用概要中的列类型"""
+    if profile is not None:
+        return categorical_columns(profile)
+    return df.select_dtypes(exclude=[np.number]).columns.tolist()
+
+
+@timed(PREPROCESS)
+def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """预处理数据框（抽样推断列类型，百分比转小数，日期列只保留日期）"""
+    df, _, _ = infer_and_convert(df)
+    return df
+
+
+@timed(SORT)
+def sort_dataframe(df: pd.DataFrame, sort_cols: Sequence[str], ascending: Union[bool, Sequence[bool]] = True,
+                   filepath: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    按多列排序，返回排序后的行位置（不复制数据框），不排序时返回None
+
+    ascending 可为单个布尔值或与 sort_cols 对应的列表；提供文件路径时排列按 (文件, 排序列, 方向)
+    缓存，重复排序只需查找缓存。
+    """
+    if not sort_cols:
+        return None
+    if isinstance(ascending, bool):
+        ascending = [ascending] * len(sort_cols)
+    # 日期列在预处理时已完成转换，可直接排序
+    if filepath is None:
+        return compute_sort_permutation(df, list(sort_cols), list(ascending))
+    return get_engine().sort(filepath, list(sort_cols), list(ascending))
+
+
+@timed(AGGREGATE)
+def calculate_statistics(df: pd.DataFrame, group_by_cols: Sequence[str], value_col: str, agg_funcs: Sequence[str],
+                         filepath: Optional[str] = None, filters: Sequence[Filter] = ()) -> Optional[pd.DataFrame]:
+    """
+    计算统计指标，提供文件路径时交由配置的执行引擎在筛选后的数据上计算
+
+    agg_funcs 为界面上的指标名称（见 AGG_FUNCS），结果列使用相同的名称；
+    未选择分组或统计字段时返回None，列不存在时抛出 ValueError。
+    """
+    if not group_by_cols or not value_col:
+        return None
+
+    # 检查所有分组列是否存在
+    for col in group_by_cols:
+        if col not in df.columns:
+            raise ValueError(f"分组列 '{col}' 不存在于数据中")
+    if value_col not in df.columns:
+        raise ValueError(f"统计列 '{value_col}' 不存在于数据中")
+
+    funcs = [AGG_FUNCS[func] for func in agg_funcs]
+    if filepath is None:
+        result = df.groupby(list(group_by_cols), observed=True)[value_col].agg(funcs)
+    else:
+        result = get_engine().aggregate(filepath, list(group_by_cols), value_col, funcs, filters)
+    # 列名使用界面上的指标名称
+    result.columns = list(agg_funcs)
+    return result
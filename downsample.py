@@ -0,0 +1,125 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 柱状图中合并长尾类别的标签
+OTHER_LABEL = '其他'
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样
+
+    x 需为单调递增的数值，返回保留点的位置（包含首尾两点）。
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def line_series(df: pd.DataFrame, x: str, y: str, n_out: int) -> Tuple[pd.Series, int]:
+    """
+    按x求y均值（与seaborn折线图的估计方式一致）后做LTTB降采样
+
+    返回降采样后的序列及降采样前的点数。
+    """
+    series = df.groupby(x, observed=True, sort=True)[y].mean().dropna()
+    if len(series) <= n_out:
+        return series, len(series)
+    index = series.index
+    if pd.api.types.is_numeric_dtype(index):
+        positions = index.to_numpy(dtype=float)
+    elif pd.api.types.is_datetime64_any_dtype(index):
+        positions = index.asi8.astype(float)
+    else:
+        positions = np.arange(len(index), dtype=float)
+    keep = lttb_indices(positions, series.to_numpy(dtype=float), n_out)
+    return series.iloc[keep], len(series)
+
+
+def top_n_with_other(df: pd.DataFrame, x: str, y: str, n: int) -> pd.DataFrame:
+    """
+    按类别求y均值，保留行数最多的前n个类别，其余合并为“其他”
+
+    行数相同时按y总和从大到小排列。
+    """
+    grouped = df.groupby(x, observed=True)[y].agg(['count', 'sum', 'mean'])
+    grouped = grouped.sort_values(['count', 'sum'], ascending=False)
+    top = grouped.head(n)
+    result = pd.DataFrame({x: top.index.astype(str), y: top['mean'].to_numpy()})
+    rest = grouped.iloc[n:]
+    if len(rest) and rest['count'].sum():
+        other_mean = rest['sum'].sum() / rest['count'].sum()
+        result = pd.concat([result, pd.DataFrame({x: [OTHER_LABEL], y: [other_mean]})], ignore_index=True)
+    return result
+
+
+def top_groups(df: pd.DataFrame, x: str, n: int) -> List:
+    """行数最多的前n个类别"""
+    return df[x].value_counts(sort=True).head(n).index.tolist()
+
+
+def box_stats(df: pd.DataFrame, x: str, y: str, groups: List) -> List[dict]:
+    """由分位数计算箱线图所需的统计量（供 Axes.bxp 使用，不含离群点）"""
+    grouped = df[df[x].isin(groups)].groupby(x, observed=True)[y]
+    quantiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    bounds = grouped.agg(['min', 'max'])
+    stats = []
+    for group in groups:
+        if group not in quantiles.index:
+            continue
+        q1, med, q3 = quantiles.loc[group, [0.25, 0.5, 0.75]]
+        iqr = q3 - q1
+        stats.append({
+            'label': str(group),
+            'q1': q1,
+            'med': med,
+            'q3': q3,
+            'whislo': max(bounds.loc[group, 'min'], q1 - 1.5 * iqr),
+            'whishi': min(bounds.loc[group, 'max'], q3 + 1.5 * iqr),
+            'fliers': [],
+        })
+    return stats
+
+
+def violin_stats(df: pd.DataFrame, x: str, y: str, groups: List, bins: int,
+                 edges: Optional[np.ndarray] = None) -> Tuple[List[dict], List[str]]:
+    """由直方图计算小提琴图所需的密度（供 Axes.violin 使用），edges 为预先确定的分箱边界"""
+    if edges is None:
+        values = df[y].dropna()
+        edges = np.histogram_bin_edges(values.to_numpy(dtype=float), bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    grouped = df[df[x].isin(groups)].groupby(x, observed=True)[y]
+    stats, labels = [], []
+    for group, group_values in grouped:
+        group_values = group_values.dropna().to_numpy(dtype=float)
+        if not len(group_values):
+            continue
+        density, _ = np.histogram(group_values, bins=edges, density=True)
+        stats.append({
+            'coords': centers,
+            'vals': density,
+            'mean': group_values.mean(),
+            'median': np.median(group_values),
+            'min': group_values.min(),
+            'max': group_values.max(),
+        })
+        labels.append(str(group))
+    return stats, labels
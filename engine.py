@@ -0,0 +1,248 @@
+import logging
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config import QUERY_ENGINE, DUCKDB_THREADS
+from loader import load_dataframe, get_file_key, has_fresh_sidecar, sidecar_path
+from aggregation import aggregation_cache
+from search import search_dataframe
+from pagination import cached_sort_permutation, sort_cache_key, sort_permutation_cache
+from filters import (OP_IN, OP_RANGE, OP_NULL, OP_NOT_NULL, Filter, filter_columns, filter_dataframe,
+                     normalize_filters)
+from perf import timed, AGGREGATE, FILTER, SEARCH, SORT
+
+logger = logging.getLogger(__name__)
+
+# DuckDB中与pandas聚合函数对应的SQL表达式，{col} 为统计列
+DUCKDB_AGGS = {
+    'count': 'count({col})',
+    'sum': 'coalesce(sum({col}), 0)',
+    'mean': 'avg({col})',
+    'max': 'max({col})',
+    'min': 'min({col})',
+    'median': 'median({col})',
+    'std': 'stddev_samp({col})',
+}
+
+
+class PandasEngine:
+    """在内存中的数据框上执行统计、筛选、搜索和排序"""
+
+    name = 'pandas'
+
+    @timed(AGGREGATE)
+    def aggregate(self, filepath: str, group_cols: List[str], value_col: str, funcs: List[str],
+                  filters: Sequence[Filter] = ()) -> pd.DataFrame:
+        df = load_dataframe(filepath, columns=list(dict.fromkeys(list(group_cols) + [value_col])))
+        fingerprint = get_file_key(filepath)
+        if filters:
+            # 筛选后的结果按筛选条件区分缓存
+            df = df.iloc[self.filter(filepath, filters)]
+            fingerprint = fingerprint + (normalize_filters(filters),)
+        return aggregation_cache.aggregate(df, fingerprint, group_cols, value_col, funcs)
+
+    @timed(FILTER)
+    def filter(self, filepath: str, filters: Sequence[Filter]) -> np.ndarray:
+        df = load_dataframe(filepath, columns=filter_columns(filters))
+        return filter_dataframe(df, filters, key=get_file_key(filepath))
+
+    @timed(SEARCH)
+    def search(self, filepath: str, query: str, case: bool = False, regex: bool = False,
+               columns: Optional[List[str]] = None) -> np.ndarray:
+        df = load_dataframe(filepath)
+        return search_dataframe(df, query, key=get_file_key(filepath), case=case, regex=regex, columns=columns)
+
+    @timed(SORT)
+    def sort(self, filepath: str, columns: List[str], ascending: List[bool]) -> np.ndarray:
+        df = load_dataframe(filepath, columns=list(columns))
+        return cached_sort_permutation(get_file_key(filepath), df, columns, ascending)
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _sql_value(value) -> str:
+    """将筛选条件中的取值转为SQL字面量"""
+    if isinstance(value, (bool, np.bool_)):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    if hasattr(value, 'isoformat'):
+        timestamp = pd.Timestamp(value)
+        if timestamp == timestamp.normalize():
+            return f"DATE {_quote_literal(timestamp.date().isoformat())}"
+        return f"TIMESTAMP {_quote_literal(timestamp.isoformat(sep=' '))}"
+    return _quote_literal(value)
+
+
+def _filter_condition(filters: Sequence[Filter]) -> str:
+    """筛选条件对应的WHERE子句（不含WHERE），没有条件时为 TRUE"""
+    conditions = []
+    for column, op, value in filters:
+        col = _quote_identifier(column)
+        if op == OP_NULL:
+            conditions.append(f"{col} IS NULL")
+        elif op == OP_NOT_NULL:
+            conditions.append(f"{col} IS NOT NULL")
+        elif op == OP_IN:
+            values = ', '.join(_sql_value(v) for v in value)
+            conditions.append(f"{col} IN ({values})" if values else 'FALSE')
+        elif op == OP_RANGE:
+            lower, upper = value
+            if lower is not None:
+                conditions.append(f"{col} >= {_sql_value(lower)}")
+            if upper is not None:
+                conditions.append(f"{col} <= {_sql_value(upper)}")
+        else:
+            raise ValueError(f"未知的筛选条件: {op}")
+    return ' AND '.join(conditions) or 'TRUE'
+
+
+class DuckDBEngine:
+    """
+    使用进程内DuckDB直接查询列式旁路文件
+
+    多线程执行且无需将整个文件载入内存，只有结果集会转为pandas。
+    文件没有可用的旁路文件时交由pandas引擎处理。
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, threads: int = DUCKDB_THREADS):
+        import duckdb
+
+        self._connection = duckdb.connect(database=':memory:')
+        if threads:
+            self._connection.execute(f"SET threads TO {int(threads)}")
+        self._local = threading.local()
+        self._fallback = PandasEngine()
+
+    def _cursor(self):
+        # DuckDB连接不能在线程间共享，每个线程使用各自的游标
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._connection.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def _source(self, filepath: str) -> Optional[str]:
+        if not has_fresh_sidecar(filepath):
+            return None
+        return f"read_parquet({_quote_literal(sidecar_path(filepath))}, file_row_number = true)"
+
+    def _positions(self, sql: str) -> np.ndarray:
+        rows = self._cursor().execute(sql).fetchnumpy()
+        return rows['file_row_number'].astype(np.int64)
+
+    @timed(AGGREGATE)
+    def aggregate(self, filepath: str, group_cols: List[str], value_col: str, funcs: List[str],
+                  filters: Sequence[Filter] = ()) -> pd.DataFrame:
+        source = self._source(filepath)
+        if source is None:
+            return self._fallback.aggregate(filepath, group_cols, value_col, funcs, filters)
+        groups = ', '.join(_quote_identifier(col) for col in group_cols)
+        value = _quote_identifier(value_col)
+        selects = ', '.join(
+            f"{DUCKDB_AGGS[func].format(col=value)} AS {_quote_identifier(func)}" for func in funcs
+        )
+        # 与pandas一致：分组键为空的行不参与分组，结果按分组键排序
+        not_null = ' AND '.join(f"{_quote_identifier(col)} IS NOT NULL" for col in group_cols)
+        sql = (f"SELECT {groups}, {selects} FROM {source} WHERE {not_null} AND {_filter_condition(filters)} "
+               f"GROUP BY {groups} ORDER BY {groups}")
+        relation = self._cursor().sql(sql)
+        result = relation.df()
+        for col, col_type in zip(relation.columns, relation.types):
+            # 日期列与pandas引擎保持一致，只保留日期部分
+            if str(col_type) == 'DATE':
+                result[col] = result[col].dt.date
+        return result.set_index(list(group_cols))
+
+    @timed(FILTER)
+    def filter(self, filepath: str, filters: Sequence[Filter]) -> np.ndarray:
+        source = self._source(filepath)
+        if source is None:
+            return self._fallback.filter(filepath, filters)
+        sql = (f"SELECT file_row_number FROM {source} WHERE {_filter_condition(filters)} "
+               f"ORDER BY file_row_number")
+        return self._positions(sql)
+
+    @timed(SEARCH)
+    def search(self, filepath: str, query: str, case: bool = False, regex: bool = False,
+               columns: Optional[List[str]] = None) -> np.ndarray:
+        source = self._source(filepath)
+        if source is None:
+            return self._fallback.search(filepath, query, case=case, regex=regex, columns=columns)
+        if columns is None:
+            columns = self._cursor().execute(f"SELECT * FROM {source} LIMIT 0").df().columns.tolist()
+            columns = [col for col in columns if col != 'file_row_number']
+        conditions = []
+        for col in columns:
+            text = f"CAST({_quote_identifier(col)} AS VARCHAR)"
+            if regex:
+                options = '' if case else ", 'i'"
+                conditions.append(f"regexp_matches({text}, {_quote_literal(query)}{options})")
+            elif case:
+                conditions.append(f"contains({text}, {_quote_literal(query)})")
+            else:
+                conditions.append(f"contains(lower({text}), {_quote_literal(query.lower())})")
+        sql = (f"SELECT file_row_number FROM {source} WHERE {' OR '.join(conditions)} "
+               f"ORDER BY file_row_number")
+        return self._positions(sql)
+
+    @timed(SORT)
+    def sort(self, filepath: str, columns: List[str], ascending: List[bool]) -> np.ndarray:
+        source = self._source(filepath)
+        if source is None:
+            return self._fallback.sort(filepath, columns, ascending)
+        cache_key = sort_cache_key(get_file_key(filepath), columns, ascending)
+        permutation = sort_permutation_cache.get(cache_key)
+        if permutation is None:
+            order = ', '.join(
+                f"{_quote_identifier(col)} {'ASC' if asc else 'DESC'} NULLS LAST"
+                for col, asc in zip(columns, ascending)
+            )
+            sql = f"SELECT file_row_number FROM {source} ORDER BY {order}, file_row_number"
+            permutation = self._positions(sql)
+            sort_permutation_cache.put(cache_key, permutation)
+        return permutation
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """获取 config.QUERY_ENGINE 指定的执行引擎，DuckDB不可用时退回pandas"""
+    with _engine_lock:
+        if _engine is None:
+            _select_engine(QUERY_ENGINE)
+        return _engine
+
+
+def use_engine(name: str):
+    """切换执行引擎（如基准测试中分别测量两种引擎），返回实际使用的引擎"""
+    with _engine_lock:
+        _select_engine(name)
+        return _engine
+
+
+def _select_engine(name: str) -> None:
+    global _engine
+    if name == 'duckdb':
+        try:
+            _engine = DuckDBEngine()
+        except ImportError:
+            logger.warning("未安装duckdb，使用pandas执行引擎")
+            _engine = PandasEngine()
+    else:
+        _engine = PandasEngine()
@@ -0,0 +1,257 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import FILTER_INDEX_CACHE_MAX_BYTES, FILTER_BITMAP_CACHE_VALUES
+from lru import LRUCache
+
+# 筛选条件的运算符
+OP_IN = 'in'                # 等于/属于：值为取值元组
+OP_RANGE = 'range'          # 范围（闭区间）：值为 (下限, 上限)，None 表示不限
+OP_NULL = 'is_null'         # 为空
+OP_NOT_NULL = 'not_null'    # 不为空
+
+# 单个筛选条件：(列名, 运算符, 值)
+Filter = Tuple[str, str, Any]
+
+
+def normalize_filters(filters: Sequence[Filter]) -> Tuple[Filter, ...]:
+    """转换为可哈希、与顺序无关的形式，用作缓存键"""
+    normalized = []
+    for column, op, value in filters:
+        if op == OP_IN:
+            value = tuple(sorted(set(value), key=lambda v: (type(v).__name__, str(v))))
+        elif op == OP_RANGE:
+            value = tuple(value)
+        else:
+            value = None
+        normalized.append((column, op, value))
+    return tuple(sorted(normalized, key=lambda f: (str(f[0]), f[1], str(f[2]))))
+
+
+def _pack(mask: np.ndarray) -> np.ndarray:
+    return np.packbits(mask)
+
+
+def _unpack(bits: np.ndarray, rows: int) -> np.ndarray:
+    return np.unpackbits(bits, count=rows).astype(bool)
+
+
+def _plain_values(series: pd.Series) -> pd.Series:
+    """压缩后的分类列按原始取值处理"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
+
+
+class BitmapIndex:
+    """
+    分类列的位图索引
+
+    保存每行取值的编码，每个取值的行集合以压缩位图表示并按需缓存，
+    等于/属于条件由取值位图按位或得到。缓存的位图增加时调用 on_grow（如由所在缓存重新计入占用）。
+    """
+
+    def __init__(self, series: pd.Series):
+        codes, uniques = pd.factorize(_plain_values(series))
+        self.rows = len(series)
+        self.codes = codes.astype(np.int32)
+        self.uniques = pd.Index(uniques)
+        self.null_bits = _pack(codes < 0)
+        self._bitmaps: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.on_grow: Optional[Callable[[], None]] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.null_bits.nbytes + len(self._bitmaps) * len(self.null_bits)
+
+    def values(self) -> List:
+        """列中出现的全部取值（不含空值），按值排序"""
+        try:
+            return sorted(self.uniques.tolist())
+        except TypeError:
+            return sorted(self.uniques.tolist(), key=str)
+
+    def _value_bitmap(self, code: int) -> np.ndarray:
+        with self._lock:
+            bits = self._bitmaps.get(code)
+            if bits is not None:
+                self._bitmaps.move_to_end(code)
+                return bits
+        bits = _pack(self.codes == code)
+        with self._lock:
+            count = len(self._bitmaps)
+            self._bitmaps[code] = bits
+            while len(self._bitmaps) > FILTER_BITMAP_CACHE_VALUES:
+                self._bitmaps.popitem(last=False)
+            grew = len(self._bitmaps) > count
+        # 在索引的锁之外通知，避免与缓存的锁互相等待
+        if grew and self.on_grow is not None:
+            self.on_grow()
+        return bits
+
+    def isin(self, values: Sequence) -> np.ndarray:
+        codes = self.uniques.get_indexer(pd.Index(list(values), dtype=object))
+        codes = codes[codes >= 0]
+        if len(codes) > FILTER_BITMAP_CACHE_VALUES:
+            return _pack(np.isin(self.codes, codes))
+        bits = np.zeros_like(self.null_bits)
+        for code in codes:
+            np.bitwise_or(bits, self._value_bitmap(int(code)), out=bits)
+        return bits
+
+
+class SortedIndex:
+    """
+    数值列与日期列的有序索引
+
+    保存非空值排序后的取值与行位置，范围条件通过二分查找得到行位置后转为位图。
+    """
+
+    def __init__(self, series: pd.Series):
+        values = _plain_values(series)
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            keys = values.to_numpy(dtype=float, na_value=np.nan)
+            nulls = np.isnan(keys)
+            self.is_date = False
+        else:
+            keys = pd.to_datetime(values, errors='coerce').to_numpy(dtype='datetime64[ns]')
+            nulls = np.isnat(keys)
+            self.is_date = True
+        self.rows = len(series)
+        positions = np.flatnonzero(~nulls)
+        order = np.argsort(keys[positions], kind='stable')
+        self.positions = positions[order].astype(np.int64)
+        self.sorted_keys = keys[positions][order]
+        self.null_bits = _pack(nulls)
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.sorted_keys.nbytes + self.null_bits.nbytes
+
+    def _key(self, bound):
+        if self.is_date:
+            return np.datetime64(pd.Timestamp(bound), 'ns')
+        return float(bound)
+
+    def between(self, lower, upper) -> np.ndarray:
+        start = 0 if lower is None else np.searchsorted(self.sorted_keys, self._key(lower), side='left')
+        end = len(self.sorted_keys) if upper is None else np.searchsorted(self.sorted_keys, self._key(upper), side='right')
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[self.positions[start:end]] = True
+        return _pack(mask)
+
+
+def build_column_index(series: pd.Series):
+    """数值与日期列建立有序索引，其余列建立位图索引"""
+    values = _plain_values(series)
+    if pd.api.types.is_bool_dtype(values):
+        return BitmapIndex(series)
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        return SortedIndex(series)
+    if pd.api.types.infer_dtype(values, skipna=True) in ('date', 'datetime'):
+        return SortedIndex(series)
+    return BitmapIndex(series)
+
+
+class FilterIndexCache:
+    """
+    按 (文件标识, 列名) 缓存列索引，按字节预算进行LRU淘汰
+
+    位图索引放入缓存后按需构建的取值位图也计入占用；单个索引超过预算时仍保留最近使用的一项。
+    """
+
+    def __init__(self, max_bytes: int):
+        self._entries = LRUCache(max_bytes, sizeof=lambda index: index.nbytes, keep_last=True)
+
+    def get(self, key: tuple, column: str, series: pd.Series):
+        cache_key = (key, column)
+        index = self._entries.get(cache_key)
+        if index is not None:
+            return index
+        index = build_column_index(series)
+        if isinstance(index, BitmapIndex):
+            index.on_grow = lambda: self._entries.resize(cache_key)
+        self._entries.put(cache_key, index)
+        return index
+
+    def invalidate(self, filepath: str) -> None:
+        """移除指定文件的全部列索引"""
+        path = os.path.abspath(filepath)
+        self._entries.discard_where(lambda key: key[0][0] == path)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._entries.total
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+filter_index_cache = FilterIndexCache(FILTER_INDEX_CACHE_MAX_BYTES)
+
+
+def column_index(df: pd.DataFrame, column: str, key: Optional[tuple] = None):
+    """获取列索引，提供 key（文件标识）时复用缓存"""
+    if key is None:
+        return build_column_index(df[column])
+    return filter_index_cache.get(key, column, df[column])
+
+
+def column_values(df: pd.DataFrame, column: str, key: Optional[tuple] = None) -> List:
+    """分类列中出现的全部取值，用于筛选条件的选项"""
+    index = column_index(df, column, key)
+    return index.values() if isinstance(index, BitmapIndex) else []
+
+
+def filter_dataframe(df: pd.DataFrame, filters: Sequence[Filter], key: Optional[tuple] = None) -> np.ndarray:
+    """
+    返回同时满足全部筛选条件的行位置（升序）
+
+    每个条件由对应列的索引得到压缩位图，多个条件按位与合并。
+    """
+    bits = None
+    for column, op, value in filters:
+        index = column_index(df, column, key)
+        if op == OP_NULL:
+            condition = index.null_bits
+        elif op == OP_NOT_NULL:
+            condition = np.invert(index.null_bits)
+        elif op == OP_IN:
+            condition = index.isin(value)
+        elif op == OP_RANGE:
+            if not isinstance(index, SortedIndex):
+                raise ValueError(f"列 '{column}' 不支持范围筛选")
+            condition = index.between(*value)
+        else:
+            raise ValueError(f"未知的筛选条件: {op}")
+        bits = condition.copy() if bits is None else np.bitwise_and(bits, condition, out=bits)
+    if bits is None:
+        return np.arange(len(df))
+    return np.flatnonzero(_unpack(bits, len(df)))
+
+
+def filter_columns(filters: Sequence[Filter]) -> List[str]:
+    """筛选条件涉及的列（去重并保持顺序）"""
+    return list(dict.fromkeys(column for column, _, _ in filters))
+
+
+def describe_filters(filters: Sequence[Filter]) -> str:
+    """筛选条件的文字说明"""
+    parts = []
+    for column, op, value in filters:
+        if op == OP_IN:
+            parts.append(f"{column} ∈ {{{', '.join(map(str, value))}}}")
+        elif op == OP_RANGE:
+            lower, upper = value
+            parts.append(f"{'' if lower is None else f'{lower} ≤ '}{column}{'' if upper is None else f' ≤ {upper}'}")
+        elif op == OP_NULL:
+            parts.append(f"{column} 为空")
+        else:
+            parts.append(f"{column} 不为空")
+    return '，'.join(parts)
@@ -0,0 +1,243 @@
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import INGEST_CHUNK_ROWS, INFER_SAMPLE_ROWS
+from schema import ARROW_TYPES, DATE_KINDS, TEXT_KINDS, apply_schema, propose_schema
+from column_profile import ColumnProfiler, column_histogram, histogram_edges, merge_profile, profile_parquet
+
+# 元数据旁路文件的后缀
+META_SUFFIX = '.meta.json'
+
+
+def meta_path(filepath: str) -> str:
+    """获取CSV文件对应的元数据文件路径"""
+    return filepath + META_SUFFIX
+
+
+class ColumnStatsAccumulator:
+    """逐块累积列统计信息（行数、空值数、最小值、最大值）"""
+
+    def __init__(self, schema: Dict[str, str]):
+        self.schema = schema
+        self.rows = 0
+        self.columns = {col: {'nulls': 0, 'min': None, 'max': None} for col in schema}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        for col, kind in self.schema.items():
+            stats = self.columns[col]
+            stats['nulls'] += int(chunk[col].isna().sum())
+            if kind in ('int', 'float', 'percent') + DATE_KINDS:
+                values = chunk[col].dropna()
+                if len(values):
+                    lo, hi = values.min(), values.max()
+                    stats['min'] = lo if stats['min'] is None else min(stats['min'], lo)
+                    stats['max'] = hi if stats['max'] is None else max(stats['max'], hi)
+
+    def to_dict(self) -> dict:
+        def plain(value):
+            if value is None:
+                return None
+            if hasattr(value, 'isoformat'):
+                return value.isoformat()
+            return value.item() if hasattr(value, 'item') else value
+
+        return {
+            'rows': self.rows,
+            'columns': {
+                col: {key: plain(value) for key, value in stats.items()}
+                for col, stats in self.columns.items()
+            },
+        }
+
+
+def cached_schema(filepath: str) -> Optional[Tuple[Dict[str, str], Dict[str, str]]]:
+    """读取已缓存的列类型与日期格式，元数据早于CSV文件时视为失效"""
+    path = meta_path(filepath)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(filepath):
+        return None
+    meta = read_meta(filepath)
+    return meta['schema'], meta.get('date_formats', {})
+
+
+def _write_typed(filepath: str, tmp_path: str, kinds: Dict[str, str], formats: Dict[str, str],
+                 chunksize: int, progress: Optional[Callable[[float], None]] = None
+                 ) -> Optional[ColumnStatsAccumulator]:
+    """
+    按给定类型逐块转换并写入Parquet
+
+    某个数据块与类型不符时放宽 kinds/formats 并返回None，由调用方重新写入。
+    progress 在每块写入后以已读取字节的比例被调用。
+    """
+    arrow_schema = pa.schema([(col, ARROW_TYPES[kind]) for col, kind in kinds.items()])
+    text_columns = {col: str for col, kind in kinds.items() if kind in TEXT_KINDS}
+    stats = ColumnStatsAccumulator(kinds)
+    with open(filepath, 'rb') as source, pq.ParquetWriter(tmp_path, arrow_schema) as writer:
+        total_bytes = max(os.fstat(source.fileno()).st_size, 1)
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype=text_columns):
+            widened = apply_schema(chunk, kinds, formats)
+            if widened:
+                for col, (kind, fmt) in widened.items():
+                    kinds[col] = kind
+                    formats.pop(col, None)
+                    if fmt is not None:
+                        formats[col] = fmt
+                return None
+            stats.update(chunk)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False))
+            if progress is not None:
+                progress(min(source.tell() / total_bytes, 1.0))
+    return stats
+
+
+def stream_to_parquet(filepath: str, dest_path: str, chunksize: int = INGEST_CHUNK_ROWS,
+                      progress: Optional[Callable[[float], None]] = None) -> dict:
+    """
+    流式解析CSV并写入带类型的Parquet文件
+
+    列类型由开头的样本行推断（已缓存时直接复用），随后逐块用快速路径转换、写入并累积列统计，
+    内存峰值只与块大小相关。某个数据块与推断不符时放宽对应列的类型后重新写入。
+    写入完成后逐列生成列概要，返回包含列类型、日期格式、统计信息与列概要的元数据。
+    """
+    schema = cached_schema(filepath)
+    if schema is None:
+        kinds, formats = propose_schema(pd.read_csv(filepath, nrows=INFER_SAMPLE_ROWS))
+    else:
+        kinds, formats = schema
+
+    tmp_path = dest_path + '.tmp'
+    try:
+        stats = None
+        while stats is None:
+            stats = _write_typed(filepath, tmp_path, kinds, formats, chunksize, progress)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    meta = {'schema': kinds, 'date_formats': formats}
+    meta.update(stats.to_dict())
+    meta['profile'] = profile_parquet(dest_path, kinds, meta['columns'], chunksize)
+    with open(meta_path(filepath), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def _merge_bound(a, b, pick):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return pick(a, b)
+
+
+def merge_column_stats(base: dict, tail: dict) -> dict:
+    """合并两部分数据的行数与列统计（均为 ColumnStatsAccumulator.to_dict 的结果）"""
+    columns = {}
+    for col, stats in base['columns'].items():
+        other = tail['columns'][col]
+        columns[col] = {
+            'nulls': stats['nulls'] + other['nulls'],
+            'min': _merge_bound(stats['min'], other['min'], min),
+            'max': _merge_bound(stats['max'], other['max'], max),
+        }
+    return {'rows': base['rows'] + tail['rows'], 'columns': columns}
+
+
+def append_to_parquet(base_filepath: str, base_parquet: str, filepath: str, offset: int, dest_path: str,
+                      chunksize: int = INGEST_CHUNK_ROWS,
+                      progress: Optional[Callable[[float], None]] = None) -> dict:
+    """
+    文件只在末尾追加了数据时增量导入
+
+    复制追加前文件旁路中的行组，只解析 offset 字节之后新增的行，按已有的列类型转换；
+    列统计与列概要由追加前的元数据与新增行的累积结果合并得到。
+    表头变化或新增的行需要放宽列类型时抛出 ValueError，由调用方改为完整导入。
+    返回的元数据额外包含追加前的行数 base_rows。
+    """
+    base_meta = read_meta(base_filepath)
+    if base_meta is None or 'profile' not in base_meta:
+        raise ValueError("追加前的文件没有导入元数据")
+    kinds, formats = base_meta['schema'], base_meta.get('date_formats', {})
+    header = pd.read_csv(filepath, nrows=0).columns.tolist()
+    if header != list(kinds):
+        raise ValueError("表头与追加前的文件不一致")
+
+    arrow_schema = pa.schema([(col, ARROW_TYPES[kind]) for col, kind in kinds.items()])
+    text_columns = {col: str for col, kind in kinds.items() if kind in TEXT_KINDS}
+    stats = ColumnStatsAccumulator(kinds)
+    base_profile = base_meta['profile']['columns']
+    profilers = {}
+    for col, kind in kinds.items():
+        histogram = base_profile[col]['histogram']
+        profilers[col] = ColumnProfiler(kind, np.asarray(histogram['edges']) if histogram else None)
+
+    tmp_path = dest_path + '.tmp'
+    try:
+        with pq.ParquetWriter(tmp_path, arrow_schema) as writer:
+            # 已有的数据按行组原样复制，无需重新解析
+            base = pq.ParquetFile(base_parquet)
+            for i in range(base.num_row_groups):
+                writer.write_table(base.read_row_group(i))
+            with open(filepath, 'rb') as source:
+                total_bytes = max(os.fstat(source.fileno()).st_size - offset, 1)
+                source.seek(offset)
+                try:
+                    chunks = pd.read_csv(source, chunksize=chunksize, header=None, names=header, dtype=text_columns)
+                    for chunk in chunks:
+                        widened = apply_schema(chunk, dict(kinds), dict(formats))
+                        if widened:
+                            raise ValueError(f"新增的行中 {', '.join(map(str, widened))} 列与已有类型不符")
+                        stats.update(chunk)
+                        for col, profiler in profilers.items():
+                            profiler.update(chunk[col])
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False))
+                        if progress is not None:
+                            progress(min((source.tell() - offset) / total_bytes, 1.0))
+                except pd.errors.EmptyDataError:
+                    # 追加的只有空行
+                    pass
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    meta = {'schema': kinds, 'date_formats': formats}
+    meta.update(merge_column_stats(base_meta, stats.to_dict()))
+    columns = {}
+    for col, kind in kinds.items():
+        info = merge_profile(base_profile[col], profilers[col])
+        histogram = info['histogram']
+        edges = histogram_edges(kind, info['min'], info['max'])
+        if edges is not None and (histogram is None or info['min'] < histogram['edges'][0]
+                                  or info['max'] > histogram['edges'][-1]):
+            # 新增的值超出原有分箱范围，按合并后的范围重新分箱
+            info['histogram'] = column_histogram(dest_path, col, edges, chunksize)
+        columns[col] = info
+    meta['profile'] = {'rows': meta['rows'], 'columns': columns}
+    meta['base_rows'] = base_meta['rows']
+    with open(meta_path(filepath), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def read_meta(filepath: str) -> Optional[dict]:
+    """读取文件的元数据，不存在时返回None"""
+    path = meta_path(filepath)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove_meta(filepath: str) -> None:
+    """删除文件的元数据"""
+    path = meta_path(filepath)
+    if os.path.exists(path):
+        os.remove(path)
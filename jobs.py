@@ -0,0 +1,191 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import INGEST_WORKERS, MMAP_DATASETS
+from loader import (get_file_key, has_fresh_sidecar, ingest_file, invalidate_file, load_dataframe, remove_sidecar,
+                    write_dataset)
+from core import process_dataframe
+from storage import file_store, INGESTING
+from aggregation import aggregation_cache, schedule_precompute
+from search import search_index_cache
+
+logger = logging.getLogger(__name__)
+
+# 子进程中用于回报进度的队列，由进程池初始化时传入
+_progress_queue = None
+
+
+def _init_worker(progress_queue) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_ingest(job_id: str, filepath: str, base: Optional[Tuple[str, int]] = None) -> Optional[dict]:
+    """在子进程中导入文件并写好内存映射数据集文件，通过队列回报进度；base 为追加前的 (文件, 字节数)"""
+    def report(fraction: float) -> None:
+        _progress_queue.put((job_id, fraction))
+
+    try:
+        meta = ingest_file(filepath, process_dataframe, progress=report, base=base)
+        if MMAP_DATASETS and has_fresh_sidecar(filepath):
+            write_dataset(filepath)
+        return meta
+    finally:
+        # 子进程只负责生成旁路文件，不保留数据框缓存
+        invalidate_file(filepath)
+
+
+class IngestJob:
+    """一个导入任务的状态"""
+
+    def __init__(self, job_id: str, filepath: str, names: List[str], base: Optional[dict] = None):
+        self.job_id = job_id
+        self.filepath = filepath
+        self.names = names
+        # 追加导入时为追加前内容的 {hash, size, rows}
+        self.base = base
+        self.progress = 0.0
+        self.future: Optional[Future] = None
+
+
+class IngestJobQueue:
+    """
+    在进程池中并行导入上传的文件
+
+    解析、类型推断与统计在子进程中完成，页面无需等待；
+    同一内容同时只有一个任务，完成后由主进程的回调更新清单与缓存。
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 使用spawn而不是fork：Streamlit服务是多线程的，fork出的子进程会继承其它线程持有中的锁
+            # （缓存、日志、埋点），子进程中再获取这些锁可能永久阻塞；页面的 main() 已在 __main__ 保护下，
+            # spawn重新导入页面脚本时不会执行页面
+            context = multiprocessing.get_context('spawn')
+            self._progress_queue = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context,
+                initializer=_init_worker, initargs=(self._progress_queue,),
+            )
+        return self._executor
+
+    def submit(self, job_id: str, filepath: str, name: str,
+               on_done: Callable[[IngestJob, Future], None], base: Optional[dict] = None) -> IngestJob:
+        """提交导入任务，相同 job_id 的任务正在进行时只追加文件名；base 见 IngestJob"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if name not in job.names:
+                    job.names.append(name)
+                return job
+            job = IngestJob(job_id, filepath, [name], base)
+            base_file = None if base is None else (file_store.object_path(base['hash']), base['size'])
+            try:
+                future = self._get_executor().submit(_run_ingest, job_id, filepath, base_file)
+            except BrokenProcessPool:
+                # 子进程异常退出后进程池不可再用，重新创建
+                logger.warning("导入进程池已损坏，重新创建")
+                self._executor = None
+                future = self._get_executor().submit(_run_ingest, job_id, filepath, base_file)
+            job.future = future
+            self._jobs[job_id] = job
+
+        def done(finished: Future) -> None:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            try:
+                on_done(job, finished)
+            except Exception as e:
+                logger.warning("处理导入结果失败: %s", e)
+
+        future.add_done_callback(done)
+        return job
+
+    def _drain_progress(self) -> None:
+        if self._progress_queue is None:
+            return
+        while True:
+            try:
+                job_id, fraction = self._progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.progress = fraction
+
+    def active_jobs(self) -> List[IngestJob]:
+        """正在排队或执行的任务"""
+        with self._lock:
+            self._drain_progress()
+            return list(self._jobs.values())
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            self._drain_progress()
+            return self._jobs.get(job_id)
+
+
+ingest_queue = IngestJobQueue()
+
+
+def _extend_caches(base_index, base_aggregates: list, base_rows: int, key: tuple, df: pd.DataFrame) -> None:
+    """追加导入后由原内容已缓存的搜索索引与分组聚合增量得到新内容的结果"""
+    search_index_cache.extend(base_index, key, df, base_rows)
+    aggregation_cache.extend(base_aggregates, key, df.iloc[base_rows:])
+
+
+def _finish_ingest(job: IngestJob, future: Future) -> None:
+    """导入任务结束后在主进程中更新清单，并在后台预计算常用的单列分组统计"""
+    content_hash = job.job_id
+    error = future.exception()
+    if error is not None:
+        logger.warning("导入 %s 失败: %s", ', '.join(job.names), error)
+        file_store.record_failure(content_hash, str(error) or type(error).__name__)
+        return
+    meta = future.result()
+    before = None
+    if job.base is not None and meta is not None and 'base_rows' in meta:
+        # 原内容在记录导入结果时即被删除并清除缓存，需先取出其已缓存的索引与聚合结果
+        base_path = file_store.object_path(job.base['hash'])
+        if os.path.exists(base_path):
+            base_key = get_file_key(base_path)
+            before = partial(_extend_caches, search_index_cache.peek(base_key), aggregation_cache.entries_of(base_key),
+                             meta['base_rows'], get_file_key(job.filepath))
+    invalidate_file(job.filepath)
+    if not file_store.record_ingest(content_hash, meta):
+        # 导入期间文件已被删除
+        remove_sidecar(job.filepath)
+        return
+    schedule_precompute(partial(load_dataframe, job.filepath), get_file_key(job.filepath), before=before)
+
+
+def ingest_in_background(name: str) -> IngestJob:
+    """将已保存的文件加入导入队列"""
+    content_hash = file_store.get_entry(name)['hash']
+    file_store.record_pending(content_hash)
+    return ingest_queue.submit(content_hash, file_store.object_path(content_hash), name, _finish_ingest,
+                               base=file_store.append_base(content_hash))
+
+
+def resume_pending_ingests() -> None:
+    """重新提交上次运行中未完成的导入（如服务重启）"""
+    active = {name for job in ingest_queue.active_jobs() for name in job.names}
+    for name in file_store.list_files():
+        if name not in active and file_store.status_of(name) == INGESTING:
+            ingest_in_background(name)
@@ -0,0 +1,432 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from config import DATAFRAME_CACHE_MAX_BYTES, MMAP_DATASETS
+from ingest import append_to_parquet, stream_to_parquet, read_meta, remove_meta
+from compaction import compact_dataframe
+from column_profile import profile_dataframe
+from lru import LRUCache
+from aggregation import aggregation_cache
+from filters import filter_index_cache
+from pagination import sort_permutation_cache
+from search import search_index_cache
+from perf import timed, LOAD
+
+logger = logging.getLogger(__name__)
+
+# 计算内容哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 列式旁路文件的后缀
+SIDECAR_SUFFIX = '.parquet'
+
+# 内存映射数据集文件的后缀，以及其中保存类型压缩报告的元数据键
+ARROW_SUFFIX = '.arrow'
+COMPACTION_REPORT_KEY = b'compaction_report'
+
+# 在后台补写内存映射数据集文件
+_dataset_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='arrow-dataset')
+
+
+def compute_file_hash(filepath: str) -> str:
+    """分块计算文件内容哈希"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class DataFrameCache:
+    """
+    按文件标识缓存预处理后的数据框，按内存预算进行LRU淘汰
+
+    缓存键为 (路径, 修改时间, 文件大小, 内容哈希, 列投影)，模块级实例在所有会话间共享。
+    返回的数据框为共享对象，调用方不得原地修改（内存映射加载的列为只读）。
+    """
+
+    def __init__(self, max_bytes: int):
+        # 超过整个预算的数据框不缓存
+        self._entries = LRUCache(max_bytes, sizeof=lambda df: int(df.memory_usage(deep=True).sum()))
+        self._hashes = {}
+        self._load_locks = {}
+        self._lock = threading.RLock()
+
+    def file_key(self, filepath: str) -> tuple:
+        """获取文件标识，内容哈希按 (路径, 修改时间, 大小) 记忆，避免每次重算"""
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        stat_key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            content_hash = self._hashes.get(stat_key)
+        if content_hash is None:
+            content_hash = compute_file_hash(path)
+            with self._lock:
+                # 同一路径只保留最新的哈希记录
+                for key in [k for k in self._hashes if k[0] == path]:
+                    del self._hashes[key]
+                self._hashes[stat_key] = content_hash
+        return stat_key + (content_hash,)
+
+    def remember_hash(self, filepath: str, content_hash: str) -> None:
+        """登记已知的内容哈希（如存储层写入时已计算），避免重新读取文件"""
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        with self._lock:
+            for key in [k for k in self._hashes if k[0] == path]:
+                del self._hashes[key]
+            self._hashes[(path, stat.st_mtime_ns, stat.st_size)] = content_hash
+
+    def load_lock(self, file_key: tuple) -> threading.Lock:
+        """同一文件的加载锁，多个会话同时未命中时只加载一份，其余等待后直接命中缓存"""
+        with self._lock:
+            return self._load_locks.setdefault(file_key, threading.Lock())
+
+    def get(self, key: tuple) -> Optional[pd.DataFrame]:
+        return self._entries.get(key)
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        self._entries.put(key, df)
+
+    def invalidate(self, filepath: str) -> None:
+        """移除指定文件的全部缓存项"""
+        path = os.path.abspath(filepath)
+        self._entries.discard_where(lambda key: key[0] == path)
+        with self._lock:
+            for key in [k for k in self._hashes if k[0] == path]:
+                del self._hashes[key]
+            for key in [k for k in self._load_locks if k[0] == path]:
+                del self._load_locks[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        with self._lock:
+            self._hashes.clear()
+            self._load_locks.clear()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._entries.total
+
+
+# 进程级共享缓存
+dataframe_cache = DataFrameCache(DATAFRAME_CACHE_MAX_BYTES)
+
+# 完整加载时记录的类型压缩报告，按文件标识保存
+_compaction_reports = {}
+_reports_lock = threading.Lock()
+
+# 读取或生成的列概要，按文件标识保存
+_column_profiles = {}
+
+
+def get_file_key(filepath: str) -> tuple:
+    """获取文件标识，可作为下游缓存的键"""
+    return dataframe_cache.file_key(filepath)
+
+
+def register_file_hash(filepath: str, content_hash: str) -> None:
+    """登记文件的内容哈希"""
+    dataframe_cache.remember_hash(filepath, content_hash)
+
+
+def sidecar_path(filepath: str) -> str:
+    """获取CSV文件对应的Parquet旁路文件路径"""
+    return filepath + SIDECAR_SUFFIX
+
+
+def has_fresh_sidecar(filepath: str) -> bool:
+    """旁路文件存在且不早于CSV文件时视为有效"""
+    path = sidecar_path(filepath)
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(filepath)
+
+
+def write_sidecar(filepath: str, df: pd.DataFrame) -> bool:
+    """将预处理后的数据框写入Parquet旁路文件，失败时保留CSV读取路径"""
+    path = sidecar_path(filepath)
+    tmp_path = path + '.tmp'
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.warning("写入旁路文件 %s 失败: %s", path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def arrow_path(filepath: str) -> str:
+    """获取CSV文件对应的Arrow IPC数据集文件路径"""
+    return filepath + ARROW_SUFFIX
+
+
+def has_fresh_arrow(filepath: str) -> bool:
+    """数据集文件存在且不早于旁路文件时视为有效（重新导入后旁路文件会更新）"""
+    path = arrow_path(filepath)
+    return (has_fresh_sidecar(filepath) and os.path.exists(path)
+            and os.path.getmtime(path) >= os.path.getmtime(sidecar_path(filepath)))
+
+
+def write_arrow(filepath: str, df: pd.DataFrame, report: Optional[pd.DataFrame] = None) -> bool:
+    """
+    将压缩类型后的数据框写入未压缩的Arrow IPC文件，供各会话以内存映射共享
+
+    类型压缩报告保存在文件的元数据中，映射加载时无需重新压缩。失败时返回False。
+    """
+    path = arrow_path(filepath)
+    # 多个线程可能同时加载同一文件，临时文件按线程区分
+    tmp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if report is not None:
+            metadata = dict(table.schema.metadata or {})
+            metadata[COMPACTION_REPORT_KEY] = report.to_json(orient='split', force_ascii=False).encode('utf-8')
+            table = table.replace_schema_metadata(metadata)
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.warning("写入数据集文件 %s 失败: %s", path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+def _mapped_categorical(column: pa.ChunkedArray) -> Optional[pd.Series]:
+    """
+    将映射的字符串字典列转为分类列，不支持时返回None
+
+    编码直接引用映射页面中的字典索引（有空值时才复制一份编码），类别按默认的字符串类型转换
+    （pandas 3 起为引用映射页面的Arrow字符串）；默认的分类转换会在堆上为每个类别创建Python字符串，
+    近乎唯一的列（如客户编号）代价与整列相当。
+    """
+    if column.num_chunks != 1:
+        return None
+    chunk = column.chunk(0)
+    if not (pa.types.is_string(chunk.type.value_type) or pa.types.is_large_string(chunk.type.value_type)):
+        return None
+    indices = chunk.indices.fill_null(-1) if chunk.indices.null_count else chunk.indices
+    categories = pd.Index(chunk.dictionary.to_pandas())
+    dtype = pd.CategoricalDtype(categories, ordered=chunk.type.ordered)
+    return pd.Series(pd.Categorical.from_codes(indices.to_numpy(), dtype=dtype, validate=False), copy=False)
+
+
+def map_arrow(filepath: str) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    以只读内存映射打开数据集文件，返回 (数据框, 类型压缩报告)
+
+    数值与字符串列直接引用映射的页面（零拷贝），由操作系统按需换入并在进程间共享；
+    分类列的编码同样引用映射页面，堆上只有按唯一值数增长的类别哈希表；
+    日期列转换为 datetime.date 对象（与Parquet读取一致），位于堆内存。
+    """
+    source = pa.memory_map(arrow_path(filepath), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    report = None
+    raw_report = (table.schema.metadata or {}).get(COMPACTION_REPORT_KEY)
+    if raw_report is not None:
+        report = pd.read_json(io.StringIO(raw_report.decode('utf-8')), orient='split')
+        report.index.name = '列名'
+    categorical = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_dictionary(column.type):
+            series = _mapped_categorical(column)
+            if series is not None:
+                categorical[name] = series
+    rest = table.drop_columns(list(categorical)).to_pandas(split_blocks=True)
+    columns = {name: categorical[name] if name in categorical else rest[name] for name in table.column_names}
+    return pd.DataFrame(columns, copy=False), report
+
+
+def remove_sidecar(filepath: str) -> None:
+    """删除CSV文件对应的旁路文件、数据集文件与元数据"""
+    for path in (sidecar_path(filepath), arrow_path(filepath)):
+        if os.path.exists(path):
+            os.remove(path)
+    remove_meta(filepath)
+
+
+def ingest_file(filepath: str, processor: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                progress: Optional[Callable[[float], None]] = None,
+                base: Optional[Tuple[str, int]] = None) -> Optional[dict]:
+    """
+    流式解析CSV文件一次，写入带类型的列式旁路文件
+
+    成功时返回元数据；流式写入失败时整体解析并预处理后再尝试写入旁路文件。
+    progress 用于报告流式写入的进度（0~1）。
+    base 为 (追加前的文件, 其字节数)：文件只在末尾追加了数据时，复用追加前文件的旁路文件
+    只解析新增的行，无法增量导入时改为完整导入。
+    """
+    invalidate_file(filepath)
+    if base is not None and has_fresh_sidecar(base[0]):
+        base_path, offset = base
+        try:
+            return append_to_parquet(base_path, sidecar_path(base_path), filepath, offset, sidecar_path(filepath),
+                                     progress=progress)
+        except Exception as e:
+            logger.warning("增量导入 %s 失败，改为完整导入: %s", filepath, e)
+    try:
+        return stream_to_parquet(filepath, sidecar_path(filepath), progress=progress)
+    except Exception as e:
+        logger.warning("流式导入 %s 失败，改为整体解析: %s", filepath, e)
+    df = _read_csv(filepath, processor)
+    write_sidecar(filepath, df)
+    file_key = dataframe_cache.file_key(filepath)
+    dataframe_cache.put(file_key + (None,), _compact(file_key, df, None))
+    return None
+
+
+def _compact(file_key: tuple, df: pd.DataFrame, projection: Optional[tuple]) -> pd.DataFrame:
+    """压缩列类型，完整加载时记录压缩报告"""
+    df, report = compact_dataframe(df)
+    if projection is None:
+        with _reports_lock:
+            _compaction_reports[file_key] = report
+    return df
+
+
+def get_compaction_report(filepath: str) -> Optional[pd.DataFrame]:
+    """获取文件最近一次完整加载时的类型压缩报告"""
+    with _reports_lock:
+        return _compaction_reports.get(dataframe_cache.file_key(filepath))
+
+
+def get_column_profile(filepath: str) -> dict:
+    """
+    获取文件的列概要
+
+    优先使用导入时写入元数据的概要；旧版元数据或整体解析导入的文件由数据框生成一次。
+    """
+    file_key = dataframe_cache.file_key(filepath)
+    with _reports_lock:
+        profile = _column_profiles.get(file_key)
+    if profile is not None:
+        return profile
+    meta = read_meta(filepath) if has_fresh_sidecar(filepath) else None
+    if meta is not None and 'profile' in meta:
+        profile = meta['profile']
+    else:
+        profile = profile_dataframe(load_dataframe(filepath))
+    with _reports_lock:
+        _column_profiles[file_key] = profile
+    return profile
+
+
+def write_dataset(filepath: str) -> bool:
+    """
+    由旁路文件生成内存映射数据集文件：读取、压缩类型后写入，失败时返回False
+
+    在导入任务中调用，页面请求不承担数据集文件的写入。
+    """
+    df, report = compact_dataframe(pd.read_parquet(sidecar_path(filepath)))
+    return write_arrow(filepath, df, report)
+
+
+def _load_mapped(filepath: str, file_key: tuple) -> pd.DataFrame:
+    """以内存映射加载完整数据框并放入缓存"""
+    df, report = map_arrow(filepath)
+    if report is not None:
+        with _reports_lock:
+            _compaction_reports[file_key] = report
+    dataframe_cache.put(file_key + (None,), df)
+    return df
+
+
+def _read_csv(filepath: str, processor: Optional[Callable[[pd.DataFrame], pd.DataFrame]]) -> pd.DataFrame:
+    df = pd.read_csv(filepath)
+    if processor is not None:
+        df = processor(df)
+    return df
+
+
+@timed(LOAD)
+def load_dataframe(filepath: str,
+                   processor: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    读取预处理后的数据框，命中缓存时直接返回
+
+    优先读取列式旁路文件，指定 columns 时只加载所需的列；
+    旁路文件缺失或过期时重新导入，无法生成旁路文件时解析CSV。
+    加载后压缩列类型（低基数文本转category、数值无损降位）。
+    启用 MMAP_DATASETS 且导入任务已写好数据集文件时，完整数据以只读内存映射的Arrow文件加载，
+    所有会话共享同一份页面，列投影也直接从映射中选取；否则从旁路文件读入堆内存。
+    """
+    file_key = dataframe_cache.file_key(filepath)
+    projection = tuple(columns) if columns is not None else None
+
+    df = dataframe_cache.get(file_key + (projection,))
+    if df is not None:
+        return df
+
+    # 已缓存完整数据时直接投影
+    if projection is not None:
+        full_df = dataframe_cache.get(file_key + (None,))
+        if full_df is not None:
+            return full_df[list(projection)]
+
+    with dataframe_cache.load_lock(file_key):
+        # 等待期间其他会话可能已完成加载
+        df = dataframe_cache.get(file_key + (projection,))
+        if df is None and projection is not None:
+            df = dataframe_cache.get(file_key + (None,))
+            if df is not None:
+                df = df[list(projection)]
+        if df is None:
+            df = _load_uncached(filepath, processor, file_key, projection)
+    return df
+
+
+def _load_uncached(filepath: str, processor: Optional[Callable[[pd.DataFrame], pd.DataFrame]],
+                   file_key: tuple, projection: Optional[tuple]) -> pd.DataFrame:
+    if not has_fresh_sidecar(filepath):
+        ingest_file(filepath, processor)
+        file_key = dataframe_cache.file_key(filepath)
+
+    if MMAP_DATASETS and has_fresh_arrow(filepath):
+        df = _load_mapped(filepath, file_key)
+        return df if projection is None else df[list(projection)]
+
+    if has_fresh_sidecar(filepath):
+        df = pd.read_parquet(sidecar_path(filepath), columns=list(projection) if projection else None)
+        df = _compact(file_key, df, projection)
+        dataframe_cache.put(file_key + (projection,), df)
+        if MMAP_DATASETS and projection is None and not has_fresh_arrow(filepath):
+            # 导入时未写数据集文件（如旧版本导入的文件），在后台补写，之后的加载即可映射
+            with _reports_lock:
+                report = _compaction_reports.get(file_key)
+            _dataset_executor.submit(write_arrow, filepath, df, report)
+        return df
+
+    df = dataframe_cache.get(file_key + (None,))
+    if df is None:
+        df = _compact(file_key, _read_csv(filepath, processor), None)
+        dataframe_cache.put(file_key + (None,), df)
+    if projection is not None:
+        return df[list(projection)]
+    return df
+
+
+def invalidate_file(filepath: str) -> None:
+    """文件被写入或删除后使其缓存失效，包括由其数据建立的搜索、筛选、排序索引与聚合结果"""
+    dataframe_cache.invalidate(filepath)
+    path = os.path.abspath(filepath)
+    search_index_cache.invalidate(path)
+    filter_index_cache.invalidate(path)
+    aggregation_cache.invalidate(path)
+    # 排序缓存的键为 (文件标识, 排序列, 各列方向)
+    sort_permutation_cache.discard_where(lambda key: key[0][0] == path)
+    with _reports_lock:
+        for key in [k for k in _compaction_reports if k[0] == path]:
+            del _compaction_reports[key]
+        for key in [k for k in _column_profiles if k[0] == path]:
+            del _column_profiles[key]
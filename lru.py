@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+def _one(value: Any) -> int:
+    return 1
+
+
+class LRUCache:
+    """
+    线程安全的LRU缓存，占用超过预算时淘汰最久未使用的条目
+
+    每个条目的占用由 sizeof 计算（默认每项为1，即按条目数限制），缓存维护占用总量，淘汰时无需重新统计。
+    单项超过整个预算时不缓存；keep_last 为True时仍保留最近放入的一项。
+    缓存的对象在放入后变大（如惰性构建的索引）时，调用 resize 重新计算其占用。
+    """
+
+    def __init__(self, max_size: int, sizeof: Callable[[Any], int] = _one, keep_last: bool = False):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.keep_last = keep_last
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """放入条目并按预算淘汰，返回是否缓存"""
+        # 占用在锁外计算（数据框的深度统计可能较慢）
+        size = self.sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_size and not self.keep_last:
+                return False
+            self._entries[key] = (value, size)
+            self._total += size
+            self._evict()
+            return key in self._entries
+
+    def resize(self, key: Hashable) -> None:
+        """重新计算条目的占用（对象放入后变大或变小时调用），并按预算淘汰"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        size = self.sizeof(entry[0])
+        with self._lock:
+            current = self._entries.get(key)
+            # 期间已被替换或淘汰时不再更新
+            if current is None or current[0] is not entry[0]:
+                return
+            self._total += size - current[1]
+            self._entries[key] = (current[0], size)
+            self._evict()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """当前全部条目的快照（由旧到新）"""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """移除键满足条件的全部条目，返回移除的条目数"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._pop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    @property
+    def total(self) -> int:
+        """当前占用总量"""
+        return self._total
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total -= entry[1]
+
+    def _evict(self) -> None:
+        while self._total > self.max_size and self._entries:
+            if self.keep_last and len(self._entries) == 1:
+                break
+            _, (_, size) = self._entries.popitem(last=False)
+            self._total -= size
@@ -0,0 +1,96 @@
+import math
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import SORT_CACHE_SIZE
+from lru import LRUCache
+
+
+def _sort_codes(values: pd.Series, ascending: bool) -> np.ndarray:
+    """将一列转换为保持排序顺序的整数编码，空值排在最后"""
+    try:
+        codes, uniques = pd.factorize(values, sort=True)
+    except TypeError:
+        # 混合类型的列按字符串排序
+        codes, uniques = pd.factorize(values.astype(str), sort=True)
+    if not ascending:
+        codes = np.where(codes >= 0, len(uniques) - 1 - codes, codes)
+    return np.where(codes >= 0, codes, len(uniques))
+
+
+def compute_sort_permutation(df: pd.DataFrame, columns: Sequence[str],
+                             ascending: Sequence[bool]) -> np.ndarray:
+    """
+    计算按多列排序后的行位置，每列可指定方向，空值排在最后
+
+    单列时直接排序；多列时将各列编码后用 np.lexsort 稳定排序。
+    """
+    if len(columns) == 1:
+        values = df[columns[0]].reset_index(drop=True)
+        try:
+            ordered = values.sort_values(ascending=ascending[0], kind='stable', na_position='last')
+        except TypeError:
+            # 混合类型的列按字符串排序
+            ordered = values.astype(str).sort_values(ascending=ascending[0], kind='stable')
+        return ordered.index.to_numpy()
+    # np.lexsort 以最后一个键为主键
+    keys = [_sort_codes(df[col], asc) for col, asc in zip(reversed(columns), reversed(ascending))]
+    return np.lexsort(keys)
+
+
+# 缓存排序后的行位置，按条目数进行LRU淘汰
+sort_permutation_cache = LRUCache(SORT_CACHE_SIZE)
+
+
+def sort_cache_key(key: tuple, columns: Sequence[str], ascending: Sequence[bool]) -> tuple:
+    """排序排列的缓存键：(文件标识, 排序列, 各列方向)"""
+    return (key, tuple(columns), tuple(bool(asc) for asc in ascending))
+
+
+def cached_sort_permutation(key: tuple, df: pd.DataFrame, columns: Sequence[str],
+                            ascending: Sequence[bool]) -> np.ndarray:
+    """按 (文件标识, 排序列, 各列方向) 缓存的排序排列"""
+    cache_key = sort_cache_key(key, columns, ascending)
+    permutation = sort_permutation_cache.get(cache_key)
+    if permutation is None:
+        permutation = compute_sort_permutation(df, columns, ascending)
+        sort_permutation_cache.put(cache_key, permutation)
+    return permutation
+
+
+def page_count(total_rows: int, page_size: int) -> int:
+    """总页数，空数据时为1页"""
+    return max(1, math.ceil(total_rows / page_size))
+
+
+def page_bounds(total_rows: int, page: int, page_size: int) -> Tuple[int, int]:
+    """第 page 页（从1开始）对应的行区间"""
+    page = min(max(page, 1), page_count(total_rows, page_size))
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total_rows)
+
+
+def page_slice(df: pd.DataFrame, page: int, page_size: int,
+               positions: Optional[np.ndarray] = None,
+               permutation: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    取出一页数据
+
+    positions 为可选的行位置子集（如搜索结果），permutation 为全表的排序排列，
+    两者同时提供时按排列顺序保留子集中的行。只有当前页的行会被复制。
+    """
+    order = positions
+    if permutation is not None:
+        order = permutation
+        if positions is not None:
+            selected = np.zeros(len(df), dtype=bool)
+            selected[positions] = True
+            order = permutation[selected[permutation]]
+
+    total_rows = len(df) if order is None else len(order)
+    start, end = page_bounds(total_rows, page, page_size)
+    if order is None:
+        return df.iloc[start:end]
+    return df.iloc[order[start:end]]
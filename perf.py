@@ -0,0 +1,261 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from config import PERF_ENABLED, PERF_LOG_FILE, PERF_PROMETHEUS_FILE, PERF_PROFILE_TOP
+
+logger = logging.getLogger(__name__)
+
+# 埋点的阶段名称
+LOAD = 'load'              # 读取数据框（含缓存命中）
+PREPROCESS = 'preprocess'  # 类型推断与转换
+AGGREGATE = 'aggregate'    # 分组统计
+FILTER = 'filter'          # 列筛选
+SEARCH = 'search'          # 关键词搜索
+SORT = 'sort'              # 排序
+PLOT = 'plot'              # 绘图与PNG编码
+SERIALIZE = 'serialize'    # 表格序列化发送到前端
+
+# Prometheus指标名前缀
+METRIC_PREFIX = 'csv_viewer'
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss_bytes() -> int:
+    """当前进程的常驻内存，非Linux平台退回为历史峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # macOS下 ru_maxrss 的单位为字节，Linux下为KB
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def arrow_allocated_bytes() -> int:
+    """pyarrow内存池当前分配的字节数（尚未导入pyarrow时为0）"""
+    pa = sys.modules.get('pyarrow')
+    return pa.total_allocated_bytes() if pa is not None else 0
+
+
+class Span:
+    """
+    一次阶段调用的耗时与内存变化，depth 为嵌套层级（耗时包含内层阶段）
+
+    rss_delta 为阶段前后进程常驻内存之差，包含pyarrow与DuckDB等在Python堆之外的分配；
+    arrow_delta 为其中pyarrow内存池分配的变化。两者都是前后之差而不是阶段内的峰值。
+    """
+
+    __slots__ = ('stage', 'depth', 'start', 'seconds', 'rss_delta', 'arrow_delta')
+
+    def __init__(self, stage: str, depth: int, start: float):
+        self.stage = stage
+        self.depth = depth
+        self.start = start
+        self.seconds = 0.0
+        self.rss_delta = 0
+        self.arrow_delta = 0
+
+    def to_dict(self) -> dict:
+        return {'stage': self.stage, 'depth': self.depth, 'offset': round(self.start, 6),
+                'seconds': round(self.seconds, 6), 'rss_delta_mb': round(self.rss_delta / 2 ** 20, 2),
+                'arrow_delta_mb': round(self.arrow_delta / 2 ** 20, 2)}
+
+
+class RerunTrace:
+    """一次页面或片段重跑中记录的全部阶段"""
+
+    def __init__(self, label: str, session_id: str = '', user: str = ''):
+        self.label = label
+        self.session_id = session_id
+        self.user = user
+        self.timestamp = time.time()
+        self.seconds = 0.0
+        self.rss = 0
+        self.spans: List[Span] = []
+        self.profile: Optional[str] = None
+        self._started = time.perf_counter()
+        self._stack: List[str] = []
+
+    def stage_totals(self) -> Dict[str, float]:
+        """各阶段的累计耗时（包含其中嵌套的其他阶段）"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.stage] = totals.get(span.stage, 0.0) + span.seconds
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            'label': self.label,
+            'session_id': self.session_id,
+            'user': self.user,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.timestamp)),
+            'seconds': round(self.seconds, 6),
+            'rss_mb': round(self.rss / 2 ** 20, 1),
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+
+class PerfMetrics:
+    """进程级的累计指标（所有会话共享），可导出为Prometheus文本格式"""
+
+    def __init__(self):
+        self._stages: Dict[str, List[float]] = {}   # 阶段 -> [次数, 总耗时, 最大耗时]
+        self._reruns: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _observe(table: Dict[str, List[float]], name: str, seconds: float) -> None:
+        entry = table.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._observe(self._stages, stage, seconds)
+
+    def observe_rerun(self, label: str, seconds: float) -> None:
+        with self._lock:
+            self._observe(self._reruns, label, seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        with self._lock:
+            return {
+                kind: {name: {'count': int(count), 'seconds': total, 'max_seconds': peak}
+                       for name, (count, total, peak) in table.items()}
+                for kind, table in (('stages', self._stages), ('reruns', self._reruns))
+            }
+
+    def to_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for kind, label in (('stages', 'stage'), ('reruns', 'view')):
+            name = f"{METRIC_PREFIX}_{kind[:-1]}_seconds"
+            lines.append(f"# HELP {name} Wall time per instrumented {label}")
+            lines.append(f"# TYPE {name} summary")
+            for key, values in sorted(snapshot[kind].items()):
+                lines.append(f'{name}_count{{{label}="{key}"}} {values["count"]}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {values["seconds"]:.6f}')
+            lines.append(f"# HELP {name}_max Slowest single {label}")
+            lines.append(f"# TYPE {name}_max gauge")
+            for key, values in sorted(snapshot[kind].items()):
+                lines.append(f'{name}_max{{{label}="{key}"}} {values["max_seconds"]:.6f}')
+        lines.append(f"# HELP {METRIC_PREFIX}_resident_memory_bytes Resident memory of the server process")
+        lines.append(f"# TYPE {METRIC_PREFIX}_resident_memory_bytes gauge")
+        lines.append(f"{METRIC_PREFIX}_resident_memory_bytes {current_rss_bytes()}")
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._reruns.clear()
+
+
+metrics = PerfMetrics()
+
+# 当前线程正在记录的重跑（Streamlit每个会话的脚本在各自的线程中运行）
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def current_trace() -> Optional[RerunTrace]:
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def stage(name: str):
+    """记录一个阶段的耗时；同名阶段嵌套（如引擎退回到pandas实现）时只记录最外层"""
+    trace = current_trace()
+    if not PERF_ENABLED or (trace is not None and name in trace._stack):
+        yield
+        return
+    rss_before = current_rss_bytes()
+    arrow_before = arrow_allocated_bytes()
+    start = time.perf_counter()
+    span = None
+    if trace is not None:
+        span = Span(name, len(trace._stack), start - trace._started)
+        trace.spans.append(span)
+        trace._stack.append(name)
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe_stage(name, seconds)
+        if span is not None:
+            trace._stack.pop()
+            span.seconds = seconds
+            span.rss_delta = current_rss_bytes() - rss_before
+            span.arrow_delta = arrow_allocated_bytes() - arrow_before
+
+
+def timed(name: str):
+    """以 stage 包装整个函数的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def rerun(label: str, session_id: str = '', user: str = '', profile: bool = False):
+    """
+    记录一次重跑，返回新建的 RerunTrace
+
+    已在记录中（如整页重跑时执行片段）时不新建记录，返回None。
+    profile 为True时用cProfile分析本次重跑，结果文本保存在 trace.profile。
+    """
+    if not PERF_ENABLED or current_trace() is not None:
+        yield None
+        return
+    trace = RerunTrace(label, session_id, user)
+    _local.trace = trace
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield trace
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PERF_PROFILE_TOP)
+            trace.profile = output.getvalue()
+        _local.trace = None
+        trace.seconds = time.perf_counter() - trace._started
+        trace.rss = current_rss_bytes()
+        metrics.observe_rerun(label, trace.seconds)
+        export(trace)
+
+
+def export(trace: RerunTrace) -> None:
+    """按配置追加JSON日志并刷新Prometheus文本文件，写入失败只记录警告"""
+    try:
+        if PERF_LOG_FILE:
+            line = json.dumps(trace.to_dict(), ensure_ascii=False)
+            with _log_lock, open(PERF_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        if PERF_PROMETHEUS_FILE:
+            # 先写临时文件再替换，采集程序不会读到写了一半的文件
+            tmp_path = f"{PERF_PROMETHEUS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(metrics.to_prometheus())
+            os.replace(tmp_path, PERF_PROMETHEUS_FILE)
+    except OSError as e:
+        logger.warning("导出性能指标失败: %s", e)
@@ -0,0 +1,196 @@
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from config import INFER_SAMPLE_ROWS
+
+# 按列名识别日期列的关键词
+DATE_KEYWORDS = ['date', 'time', '日期', '时间']
+
+# 抽样推断时依次尝试的日期格式
+DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%Y/%m/%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y/%m/%d %H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y年%m月%d日',
+    '%d/%m/%Y',
+    '%m/%d/%Y',
+]
+
+# 纯数字日期格式只用于日期关键词列
+COMPACT_DATE_FORMATS = ['%Y%m%d']
+
+# 列类型对应的Arrow存储类型
+ARROW_TYPES = {
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'percent': pa.float64(),
+    'bool': pa.bool_(),
+    'date': pa.date32(),
+    'datetime': pa.timestamp('ns'),
+    'string': pa.string(),
+    'empty': pa.float64(),
+}
+
+# 需要按原始文本读取的列类型
+TEXT_KINDS = {'string', 'percent', 'date', 'datetime', 'empty'}
+
+# 日期类型：date 只保留日期部分，datetime 保留时刻
+DATE_KINDS = ('date', 'datetime')
+
+# 数值类型由低到高的提升顺序
+NUMERIC_ORDER = ['int', 'float', 'percent']
+
+
+def is_date_column_name(col) -> bool:
+    """列名包含日期关键词"""
+    return any(keyword in str(col).lower() for keyword in DATE_KEYWORDS)
+
+
+def sample_rows(df: pd.DataFrame, n: int = INFER_SAMPLE_ROWS) -> pd.DataFrame:
+    """抽取用于类型推断的样本行"""
+    if len(df) <= n:
+        return df
+    return df.sample(n, random_state=0)
+
+
+def detect_date_format(col, values: pd.Series) -> Optional[str]:
+    """在候选格式中找出能解析全部样本值的日期格式"""
+    formats = DATE_FORMATS + (COMPACT_DATE_FORMATS if is_date_column_name(col) else [])
+    for fmt in formats:
+        if pd.to_datetime(values, format=fmt, errors='coerce').notna().all():
+            return fmt
+    return None
+
+
+def date_kind(parsed: pd.Series) -> str:
+    """解析后的取值全部在零点时为日期，否则为日期时间"""
+    parsed = parsed.dropna()
+    return 'date' if (parsed == parsed.dt.normalize()).all() else 'datetime'
+
+
+def propose_kind(col, s: pd.Series) -> Tuple[str, Optional[str]]:
+    """根据样本推断列类型，返回 (类型, 日期格式)"""
+    if s.isna().all():
+        return 'empty', None
+    if pd.api.types.is_bool_dtype(s):
+        return 'bool', None
+    if pd.api.types.is_integer_dtype(s):
+        return 'int', None
+    if pd.api.types.is_float_dtype(s):
+        return 'float', None
+
+    values = s.dropna().astype(str).str.strip()
+    fmt = detect_date_format(col, values)
+    if fmt is not None:
+        return date_kind(pd.to_datetime(values, format=fmt, errors='coerce')), fmt
+    if is_date_column_name(col):
+        try:
+            return date_kind(pd.to_datetime(values, errors='raise', format='mixed')), None
+        except (ValueError, TypeError, OverflowError):
+            pass
+    if values.str.endswith('%').any():
+        if pd.to_numeric(values.str.rstrip('%'), errors='coerce').notna().all():
+            return 'percent', None
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        return ('int' if (numeric % 1 == 0).all() else 'float'), None
+    return 'string', None
+
+
+def merge_kind(a: Tuple[str, Optional[str]], b: Tuple[str, Optional[str]]) -> Tuple[str, Optional[str]]:
+    """合并两个推断结果，结果只会向更宽的类型提升"""
+    if a == b or b[0] == 'empty':
+        return a
+    if a[0] == 'empty':
+        return b
+    if a[0] in DATE_KINDS and b[0] in DATE_KINDS:
+        # 任一方含时刻时为日期时间；格式不一致时退回通用日期解析
+        kind = 'datetime' if 'datetime' in (a[0], b[0]) else 'date'
+        return kind, a[1] if a[1] == b[1] else None
+    if a[0] in NUMERIC_ORDER and b[0] in NUMERIC_ORDER:
+        return max(a[0], b[0], key=NUMERIC_ORDER.index), None
+    return 'string', None
+
+
+def propose_schema(df: pd.DataFrame) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """对样本行推断每列的类型，返回 (列类型, 日期格式)"""
+    sample = sample_rows(df)
+    kinds, formats = {}, {}
+    for col in df.columns:
+        kind, fmt = propose_kind(col, sample[col])
+        kinds[col] = kind
+        if fmt is not None:
+            formats[col] = fmt
+    return kinds, formats
+
+
+def convert_column(s: pd.Series, kind: str, fmt: Optional[str] = None) -> pd.Series:
+    """按列类型快速转换，无法解析的值置为空"""
+    if kind == 'percent':
+        return pd.to_numeric(s.astype(str).str.rstrip('%'), errors='coerce') / 100
+    if kind in DATE_KINDS:
+        parsed = pd.to_datetime(s, format=fmt or 'mixed', errors='coerce')
+        # 日期列出现含时刻的值时不截断，由 column_fits 判定为不符并放宽为日期时间
+        if kind == 'datetime' or (parsed.dropna() != parsed.dropna().dt.normalize()).any():
+            return parsed
+        return parsed.dt.date
+    if kind in ('int', 'float') and not pd.api.types.is_numeric_dtype(s):
+        return pd.to_numeric(s, errors='coerce')
+    return s
+
+
+def column_fits(raw: pd.Series, converted: pd.Series, kind: str) -> bool:
+    """检查转换是否丢失了非空值"""
+    if kind == 'string':
+        return True
+    if kind == 'empty':
+        return bool(raw.isna().all())
+    if kind == 'bool':
+        return pd.api.types.is_bool_dtype(raw)
+    if kind == 'date' and pd.api.types.is_datetime64_any_dtype(converted):
+        return False
+    if (raw.notna() & converted.isna()).any():
+        return False
+    if kind == 'int':
+        values = converted.dropna()
+        return pd.api.types.is_integer_dtype(values) or bool((values % 1 == 0).all())
+    return True
+
+
+def apply_schema(df: pd.DataFrame, kinds: Dict[str, str], formats: Dict[str, str]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    按推断的类型原地转换数据框各列
+
+    返回转换失败的列及其放宽后的类型，未返回的列已完成转换。
+    """
+    widened = {}
+    for col, kind in kinds.items():
+        fmt = formats.get(col)
+        converted = convert_column(df[col], kind, fmt)
+        if column_fits(df[col], converted, kind):
+            df[col] = converted
+            continue
+        merged = merge_kind((kind, fmt), propose_kind(col, df[col]))
+        widened[col] = merged if merged != (kind, fmt) else ('string', None)
+    return widened
+
+
+def infer_and_convert(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str], Dict[str, str]]:
+    """抽样推断并转换整个数据框，返回 (数据框, 列类型, 日期格式)"""
+    kinds, formats = propose_schema(df)
+    pending = dict(kinds)
+    while pending:
+        widened = apply_schema(df, pending, formats)
+        pending = {}
+        for col, (kind, fmt) in widened.items():
+            kinds[col] = pending[col] = kind
+            formats.pop(col, None)
+            if fmt is not None:
+                formats[col] = fmt
+    return df, kinds, formats
@@ -0,0 +1,247 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import SEARCH_INDEX_CACHE_MAX_BYTES, SEARCH_NGRAM_MAX_UNIQUES
+from lru import LRUCache
+
+# 倒排索引使用的n-gram长度
+NGRAM_SIZE = 3
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class ColumnSearchIndex:
+    """
+    单列的搜索索引
+
+    按唯一值保存字符串表示与每行的唯一值编码，扫描只作用于唯一值后再映射回行，不引用原数据；
+    唯一值数量不超过上限时额外建立小写三元组倒排索引。
+    """
+
+    def __init__(self, series: pd.Series, build_ngrams: bool = True):
+        # 空值的编码为 -1，不进入唯一值与倒排索引，也不参与匹配
+        codes, uniques = pd.factorize(series)
+        self.codes = codes.astype(np.int32) if len(uniques) < np.iinfo(np.int32).max else codes
+        self.strings = pd.Series(uniques).astype(str).reset_index(drop=True)
+        self._lower = None
+        self._nbytes = None
+        self.postings: Optional[Dict[str, np.ndarray]] = None
+        if build_ngrams:
+            # 缓存的索引预先生成小写文本，使占用在放入缓存后不再变化
+            self._lower = self.strings.str.lower()
+            if len(uniques) <= SEARCH_NGRAM_MAX_UNIQUES:
+                self._build_ngrams()
+
+    @property
+    def nbytes(self) -> int:
+        if self._nbytes is None:
+            size = self.codes.nbytes + int(self.strings.memory_usage(deep=True, index=False))
+            if self._lower is not None:
+                size += int(self._lower.memory_usage(deep=True, index=False))
+            if self.postings is not None:
+                size += sum(ids.nbytes for ids in self.postings.values())
+            self._nbytes = size
+        return self._nbytes
+
+    @property
+    def lower_strings(self) -> pd.Series:
+        if self._lower is None:
+            self._lower = self.strings.str.lower()
+        return self._lower
+
+    def _build_ngrams(self) -> None:
+        postings = defaultdict(list)
+        for unique_id, text in enumerate(self.lower_strings):
+            for gram in _ngrams(text):
+                postings[gram].append(unique_id)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def extended(self, tail: pd.Series) -> 'ColumnSearchIndex':
+        """
+        返回在末尾追加 tail 中各行后的索引，原索引不变
+
+        只对新增行的唯一值做字符串转换，新出现的字符串追加到唯一值末尾并补充倒排索引。
+        """
+        codes, uniques = pd.factorize(tail)
+        strings = pd.Series(uniques).astype(str)
+        known = pd.Series(np.arange(len(self.strings)), index=self.strings.to_numpy())
+        known = known[~known.index.duplicated()]
+        ids = known.reindex(strings.to_numpy()).to_numpy(dtype=float, copy=True)
+        missing = np.isnan(ids)
+        added = pd.Index(strings[missing]).unique()
+        ids[missing] = len(self.strings) + added.get_indexer(strings[missing])
+
+        index = object.__new__(ColumnSearchIndex)
+        index.strings = pd.concat([self.strings, pd.Series(added, dtype=self.strings.dtype)], ignore_index=True)
+        tail_codes = np.full(len(codes), -1, dtype=self.codes.dtype)
+        valid = codes >= 0
+        tail_codes[valid] = ids.astype(self.codes.dtype)[codes[valid]]
+        index.codes = np.concatenate([self.codes, tail_codes])
+        index._lower = None
+        index._nbytes = None
+        index.postings = None
+        if self.postings is not None and len(index.strings) <= SEARCH_NGRAM_MAX_UNIQUES:
+            additions = defaultdict(list)
+            for unique_id, text in enumerate(added.str.lower(), start=len(self.strings)):
+                for gram in _ngrams(text):
+                    additions[gram].append(unique_id)
+            index.postings = dict(self.postings)
+            for gram, new_ids in additions.items():
+                new_ids = np.asarray(new_ids, dtype=np.int32)
+                old_ids = index.postings.get(gram)
+                index.postings[gram] = new_ids if old_ids is None else np.concatenate([old_ids, new_ids])
+        return index
+
+    def _candidates(self, query: str) -> Optional[np.ndarray]:
+        """通过倒排索引求候选唯一值，无法使用索引时返回None"""
+        if self.postings is None or len(query) < NGRAM_SIZE:
+            return None
+        candidates = None
+        for gram in _ngrams(query.lower()):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return np.empty(0, dtype=np.int32)
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        return candidates
+
+    def match(self, query: str, case: bool = False, regex: bool = False) -> np.ndarray:
+        """返回匹配行的布尔掩码"""
+        if regex:
+            hits = self.strings.str.contains(query, case=case, regex=True).to_numpy(dtype=bool)
+        else:
+            strings = self.strings if case else self.lower_strings
+            needle = query if case else query.lower()
+            candidates = self._candidates(query)
+            if candidates is None:
+                hits = strings.str.contains(needle, regex=False).to_numpy(dtype=bool)
+            else:
+                hits = np.zeros(len(strings), dtype=bool)
+                if len(candidates):
+                    verified = strings.iloc[candidates].str.contains(needle, regex=False).to_numpy(dtype=bool)
+                    hits[candidates[verified]] = True
+        # 末尾补一个False，空值的编码 -1 恰好取到它
+        return np.append(hits, False)[self.codes]
+
+
+class SearchIndex:
+    """
+    单个文件的搜索索引，各列索引在首次搜索时按需建立
+
+    索引不保存数据框本身，建立列索引时使用搜索时传入的数据框；新的列索引建立后调用 on_grow
+    （如由所在缓存重新计入占用）。
+    """
+
+    def __init__(self, rows: int, build_ngrams: bool = True):
+        self.rows = rows
+        self.build_ngrams = build_ngrams
+        self._columns: Dict[str, ColumnSearchIndex] = {}
+        self._lock = threading.Lock()
+        self.on_grow: Optional[Callable[[], None]] = None
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            columns = list(self._columns.values())
+        return sum(index.nbytes for index in columns)
+
+    def column(self, df: pd.DataFrame, col: str) -> ColumnSearchIndex:
+        with self._lock:
+            index = self._columns.get(col)
+            if index is None:
+                index = ColumnSearchIndex(df[col], self.build_ngrams)
+                self._columns[col] = index
+                grew = True
+            else:
+                grew = False
+        # 在索引的锁之外通知，避免与缓存的锁互相等待
+        if grew and self.on_grow is not None:
+            self.on_grow()
+        return index
+
+    def extended(self, df: pd.DataFrame, base_rows: int) -> 'SearchIndex':
+        """df 为在原数据末尾追加行后的数据框，已建立的列索引只需处理 base_rows 之后的新增行"""
+        index = SearchIndex(len(df), self.build_ngrams)
+        with self._lock:
+            columns = dict(self._columns)
+        for col, column_index in columns.items():
+            if col in df.columns:
+                index._columns[col] = column_index.extended(df[col].iloc[base_rows:])
+        return index
+
+    def search(self, df: pd.DataFrame, query: str, case: bool = False, regex: bool = False,
+               columns: Optional[List[str]] = None) -> np.ndarray:
+        """返回任一列匹配的行位置，df 须为建立索引时的数据"""
+        mask = np.zeros(self.rows, dtype=bool)
+        for col in columns or df.columns:
+            mask |= self.column(df, col).match(query, case=case, regex=regex)
+        return np.flatnonzero(mask)
+
+
+class SearchIndexCache:
+    """按文件标识缓存搜索索引，按字节预算进行LRU淘汰"""
+
+    def __init__(self, max_bytes: int):
+        # 索引随搜索的列逐步建立，新建列索引后重新计入占用；单个索引超过预算时仍保留
+        self._entries = LRUCache(max_bytes, sizeof=lambda index: index.nbytes, keep_last=True)
+
+    def _put(self, key: tuple, index: SearchIndex) -> None:
+        index.on_grow = lambda: self._entries.resize(key)
+        self._entries.put(key, index)
+
+    def get(self, key: tuple, df: pd.DataFrame) -> SearchIndex:
+        index = self._entries.get(key)
+        if index is None or index.rows != len(df):
+            index = SearchIndex(len(df))
+            self._put(key, index)
+        return index
+
+    def peek(self, key: tuple) -> Optional[SearchIndex]:
+        """已缓存的索引，不存在时返回None"""
+        return self._entries.get(key)
+
+    def extend(self, base: Optional[SearchIndex], key: tuple, df: pd.DataFrame, base_rows: int) -> bool:
+        """文件追加行后由原文件的索引 base 增量得到新文件的索引，base 为None或行数不符时返回False"""
+        if base is None or base.rows != base_rows:
+            return False
+        self._put(key, base.extended(df, base_rows))
+        return True
+
+    def invalidate(self, filepath: str) -> None:
+        """移除指定文件的索引"""
+        path = os.path.abspath(filepath)
+        self._entries.discard_where(lambda key: key[0] == path)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._entries.total
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+search_index_cache = SearchIndexCache(SEARCH_INDEX_CACHE_MAX_BYTES)
+
+
+def search_dataframe(df: pd.DataFrame, query: str, key: Optional[tuple] = None,
+                     case: bool = False, regex: bool = False,
+                     columns: Optional[List[str]] = None) -> np.ndarray:
+    """
+    在数据框中搜索关键词，返回匹配行的位置
+
+    提供 key（文件标识）时复用缓存的索引，否则只做一次性扫描。
+    正则表达式无效时抛出 re.error。
+    """
+    if key is None:
+        index = SearchIndex(len(df), build_ngrams=False)
+    else:
+        index = search_index_cache.get(key, df)
+    return index.search(df, query, case=case, regex=regex, columns=columns)
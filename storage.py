@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from config import DATA_DIR, UPLOAD_COPY_CHUNK_BYTES
+from loader import compute_file_hash, invalidate_file, register_file_hash, remove_sidecar
+
+# 清单文件名与内容寻址的对象目录
+MANIFEST_NAME = 'manifest.json'
+OBJECTS_DIR = 'objects'
+
+# 保存上传文件的结果
+STORED = 'stored'          # 新文件
+UPDATED = 'updated'        # 同名文件的内容发生变化
+UNCHANGED = 'unchanged'    # 同名文件内容相同，未写入
+DUPLICATE = 'duplicate'    # 内容已以其它文件名保存，共用同一份数据
+APPENDED = 'appended'      # 同名文件只在末尾追加了数据，只需导入新增的部分
+
+# 文件的导入状态
+INGESTING = 'ingesting'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class FileStore:
+    """
+    内容寻址的上传文件存储
+
+    文件按内容哈希保存在 objects 目录中，相同内容只保存一份；
+    manifest.json 记录文件名、哈希、大小、行数、列类型、导入状态与导入时间，是文件列表的唯一来源。
+    同名文件的新内容以原内容为前缀时记为追加（append_base 指向原内容），原内容保留到增量导入结束。
+    """
+
+    def __init__(self, root: str = DATA_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._manifest: Dict[str, dict] = {}
+        self._manifest_mtime = None
+        self._lock = threading.RLock()
+
+    # 清单读写
+
+    def _load(self) -> Dict[str, dict]:
+        """读取清单，文件未变化时使用内存中的副本"""
+        with self._lock:
+            if not os.path.exists(self.manifest_path):
+                if self._manifest_mtime is None:
+                    self._manifest_mtime = 0
+                    self._migrate_legacy_files()
+                return self._manifest
+            mtime = os.path.getmtime(self.manifest_path)
+            if mtime != self._manifest_mtime:
+                with open(self.manifest_path, encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+                self._manifest_mtime = mtime
+                for entry in self._manifest.values():
+                    self._register(entry)
+            return self._manifest
+
+    def _save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+
+    def _register(self, entry: dict) -> None:
+        # 已知内容哈希，下游缓存无需重新计算
+        path = self.object_path(entry['hash'])
+        if os.path.exists(path):
+            register_file_hash(path, entry['hash'])
+
+    def _migrate_legacy_files(self) -> None:
+        """将旧版直接保存在数据目录下的CSV文件导入清单"""
+        if not os.path.isdir(self.root):
+            return
+        legacy = sorted(f for f in os.listdir(self.root) if f.endswith('.csv'))
+        for filename in legacy:
+            path = os.path.join(self.root, filename)
+            content_hash = compute_file_hash(path)
+            os.makedirs(self.objects_dir, exist_ok=True)
+            object_path = self.object_path(content_hash)
+            remove_sidecar(path)
+            if os.path.exists(object_path):
+                os.remove(path)
+            else:
+                os.replace(path, object_path)
+            self._manifest[filename] = self._new_entry(content_hash, os.path.getsize(object_path))
+            self._register(self._manifest[filename])
+        if legacy:
+            self._save()
+
+    @staticmethod
+    def _new_entry(content_hash: str, size: int, status: str = READY) -> dict:
+        return {
+            'hash': content_hash,
+            'size': size,
+            'rows': None,
+            'schema': None,
+            'status': status,
+            'error': None,
+            'ingested_at': None,
+        }
+
+    # 查询
+
+    def object_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_dir, content_hash + '.csv')
+
+    def list_files(self) -> List[str]:
+        """按文件名排序的文件列表"""
+        return sorted(self._load())
+
+    def get_entry(self, name: str) -> Optional[dict]:
+        entry = self._load().get(name)
+        return dict(entry) if entry is not None else None
+
+    def path_of(self, name: str) -> str:
+        """文件内容所在的路径"""
+        return self.object_path(self._load()[name]['hash'])
+
+    def status_of(self, name: str) -> Optional[str]:
+        """文件的导入状态，旧版清单中没有记录的视为已就绪"""
+        entry = self._load().get(name)
+        return entry.get('status', READY) if entry is not None else None
+
+    # 写入
+
+    def store_upload(self, src: BinaryIO, name: str,
+                     chunk_size: int = UPLOAD_COPY_CHUNK_BYTES) -> Tuple[str, str]:
+        """
+        分块写入上传内容并同时计算哈希
+
+        已有相同内容时不保留写入的数据，返回 (保存结果, 文件内容路径)。
+        """
+        os.makedirs(self.objects_dir, exist_ok=True)
+        tmp_path = os.path.join(self.objects_dir, f'.upload-{uuid.uuid4().hex}.tmp')
+        hasher = hashlib.blake2b(digest_size=16)
+        # 同名文件已导入时，同时计算与其等长前缀的哈希，用于识别只在末尾追加的情况
+        existing = self._load().get(name)
+        prefix_size = existing['size'] if existing is not None and existing.get('status', READY) == READY else None
+        prefix_hash = None
+        src.seek(0)
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in iter(lambda: src.read(chunk_size), b''):
+                    written = f.tell()
+                    if prefix_size is not None and prefix_hash is None and written + len(chunk) >= prefix_size:
+                        prefix_hasher = hasher.copy()
+                        prefix_hasher.update(chunk[:prefix_size - written])
+                        prefix_hash = prefix_hasher.hexdigest()
+                    hasher.update(chunk)
+                    f.write(chunk)
+                size = f.tell()
+            content_hash = hasher.hexdigest()
+            object_path = self.object_path(content_hash)
+
+            with self._lock:
+                manifest = self._load()
+                previous = manifest.get(name)
+                if previous is not None and previous['hash'] == content_hash:
+                    return UNCHANGED, object_path
+                known = os.path.exists(object_path)
+                appended = (
+                    not known and previous is not None and size > previous['size'] and prefix_hash == previous['hash']
+                    and self._ends_with_newline(tmp_path, previous['size']) and os.path.exists(self.object_path(previous['hash']))
+                )
+                if not known:
+                    os.replace(tmp_path, object_path)
+                manifest[name] = self._new_entry(content_hash, size, INGESTING)
+                if appended:
+                    manifest[name]['append_base'] = {
+                        'hash': previous['hash'], 'size': previous['size'], 'rows': previous['rows'],
+                    }
+                if known:
+                    # 复用已有内容的导入结果（或共用正在进行的导入）
+                    for other_name, other in manifest.items():
+                        if other_name != name and other['hash'] == content_hash:
+                            manifest[name].update(rows=other['rows'], schema=other['schema'],
+                                                  status=other.get('status', READY), error=other.get('error'),
+                                                  ingested_at=other['ingested_at'])
+                            break
+                self._register(manifest[name])
+                if previous is not None:
+                    self._release(previous['hash'])
+                    if previous.get('append_base'):
+                        self._release(previous['append_base']['hash'])
+                self._save()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if previous is not None:
+            return (APPENDED if appended else UPDATED), object_path
+        return (DUPLICATE if known else STORED), object_path
+
+    @staticmethod
+    def _ends_with_newline(path: str, size: int) -> bool:
+        """前 size 字节以换行结束，即原有的最后一行是完整的"""
+        with open(path, 'rb') as f:
+            f.seek(size - 1)
+            return f.read(1) == b'\n'
+
+    def _entries_of(self, content_hash: str) -> List[dict]:
+        return [entry for entry in self._load().values() if entry['hash'] == content_hash]
+
+    def append_base(self, content_hash: str) -> Optional[dict]:
+        """内容由追加得到时返回追加前内容的 {hash, size, rows}"""
+        for entry in self._entries_of(content_hash):
+            if entry.get('append_base'):
+                return dict(entry['append_base'])
+        return None
+
+    def _finish_append(self, entries: List[dict]) -> None:
+        """导入结束后不再需要保留追加前的内容"""
+        bases = {entry.pop('append_base')['hash'] for entry in entries if entry.get('append_base')}
+        for base_hash in bases:
+            self._release(base_hash)
+
+    def record_ingest(self, content_hash: str, meta: Optional[dict]) -> bool:
+        """记录导入得到的行数与列类型，内容已不被任何文件引用时返回False"""
+        with self._lock:
+            entries = self._entries_of(content_hash)
+            for entry in entries:
+                entry.update(status=READY, error=None, ingested_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+                if meta is not None:
+                    entry['rows'] = meta.get('rows')
+                    entry['schema'] = meta.get('schema')
+            self._finish_append(entries)
+            if entries:
+                self._save()
+            return bool(entries)
+
+    def record_pending(self, content_hash: str) -> None:
+        """标记内容正在导入"""
+        with self._lock:
+            entries = [entry for entry in self._entries_of(content_hash) if entry.get('status') != INGESTING]
+            for entry in entries:
+                entry.update(status=INGESTING, error=None)
+            if entries:
+                self._save()
+
+    def record_failure(self, content_hash: str, error: str) -> None:
+        """记录导入失败及原因"""
+        with self._lock:
+            entries = self._entries_of(content_hash)
+            for entry in entries:
+                entry.update(status=FAILED, error=error)
+            self._finish_append(entries)
+            if entries:
+                self._save()
+
+    def delete(self, name: str) -> bool:
+        """删除文件，内容不再被引用时一并删除数据与旁路文件"""
+        with self._lock:
+            manifest = self._load()
+            entry = manifest.pop(name, None)
+            if entry is None:
+                return False
+            self._release(entry['hash'])
+            if entry.get('append_base'):
+                self._release(entry['append_base']['hash'])
+            self._save()
+            return True
+
+    def _release(self, content_hash: str) -> None:
+        """内容不再被任何文件名引用（包括作为进行中追加导入的基础）时删除"""
+        if any(entry['hash'] == content_hash or (entry.get('append_base') or {}).get('hash') == content_hash
+               for entry in self._manifest.values()):
+            return
+        path = self.object_path(content_hash)
+        invalidate_file(path)
+        remove_sidecar(path)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+file_store = FileStore()
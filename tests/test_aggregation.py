@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from aggregation import AggregationCache, aggregation_cache
+from core import calculate_statistics
+from engine import use_engine
+from loader import ingest_file, load_dataframe
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'a': ['x', 'x', 'y', 'y', 'y'],
+        'b': ['p', None, 'q', 'q', 'r'],
+        'c': ['m', 'n', 'm', 'n', 'm'],
+        'v': [1.0, 2.0, 3.0, np.nan, 5.0],
+    })
+
+
+def _direct(df: pd.DataFrame, group_cols, funcs) -> pd.DataFrame:
+    return df.groupby(group_cols, observed=True)['v'].agg(funcs)
+
+
+def test_rollup_keeps_rows_with_null_finer_key():
+    df = _frame()
+    cache = AggregationCache(2 ** 20)
+    funcs = ['count', 'sum', 'mean', 'min', 'max']
+    cache.aggregate(df, ('f',), ['a', 'b'], 'v', funcs)
+    result = cache.aggregate(df, ('f',), ['a'], 'v', funcs)
+    tm.assert_frame_equal(result, _direct(df, ['a'], funcs), check_names=False)
+
+
+def test_rollup_from_finer_grouping_without_nulls():
+    df = _frame()
+    cache = AggregationCache(2 ** 20)
+    funcs = ['count', 'sum', 'mean', 'min', 'max']
+    cache.aggregate(df, ('f',), ['a', 'c'], 'v', funcs)
+    assert cache._find_finer(('f',), ('a',), 'v') is not None
+    result = cache.aggregate(df, ('f',), ['a'], 'v', funcs)
+    tm.assert_frame_equal(result, _direct(df, ['a'], funcs), check_names=False)
+
+
+def test_finer_grouping_with_null_key_is_not_used():
+    df = _frame()
+    cache = AggregationCache(2 ** 20)
+    cache.aggregate(df, ('f',), ['a', 'b'], 'v', ['count'])
+    assert cache._find_finer(('f',), ('a',), 'v') is None
+
+
+@pytest.mark.parametrize('b_nulls', [False, True])
+def test_rollup_through_engine_with_projected_columns(tmp_path, b_nulls):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        'a': rng.choice(['x', 'y', 'z'], 500),
+        'b': rng.choice(['p', 'q', 'r', 's'], 500).astype(object),
+        'c': rng.choice(['m', 'n'], 500),
+        'v': rng.uniform(0, 100, 500).round(2),
+    })
+    if b_nulls:
+        df.loc[::7, 'b'] = None
+    path = str(tmp_path / 'rollup.csv')
+    df.to_csv(path, index=False)
+    ingest_file(path)
+    use_engine('pandas')
+    aggregation_cache.clear()
+    full = load_dataframe(path)
+
+    # 引擎只加载所需的列，较粗分组由已缓存的较细分组得到
+    calculate_statistics(full, ['a', 'b'], 'v', ['计数'], filepath=path)
+    result = calculate_statistics(full, ['a'], 'v', ['计数', '求和', '平均值'], filepath=path)
+    expected = df.groupby('a')['v'].agg(['count', 'sum', 'mean'])
+    np.testing.assert_allclose(result.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+    assert list(result.index.astype(str)) == list(expected.index)
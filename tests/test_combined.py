@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from combined import combined_statistics, median_edges
+from config import COMBINED_MEDIAN_BINS
+from loader import ingest_file, load_dataframe
+
+FUNCS = ['计数', '求和', '平均值', '最大值', '最小值', '标准差', '中位数']
+
+
+def _frame(regions, rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'region': rng.choice(regions, rows),
+        'channel': rng.choice(['online', 'offline'], rows),
+        'sales': np.round(rng.normal(200, 80, rows), 2),
+    })
+    # 分组键与统计值都带有空值
+    df.loc[rng.random(rows) < 0.05, 'region'] = None
+    df.loc[rng.random(rows) < 0.05, 'sales'] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def paths(tmp_path_factory):
+    root = tmp_path_factory.mktemp('combined')
+    frames = [
+        _frame(['north', 'south'], 3000, 0),
+        # 与第一个文件的分组不相交
+        _frame(['east', 'west'], 2000, 1),
+        _frame(['north', 'east', 'central'], 500, 2),
+        # 只有一行的分组
+        pd.DataFrame({'region': ['solo', None], 'channel': ['online', 'online'], 'sales': [42.0, 7.0]}),
+    ]
+    result = []
+    for i, df in enumerate(frames):
+        path = str(root / f'part{i}.csv')
+        df.to_csv(path, index=False)
+        ingest_file(path)
+        result.append(path)
+    return result
+
+
+def _expected(paths, group_cols) -> pd.DataFrame:
+    df = pd.concat([load_dataframe(path) for path in paths], ignore_index=True)
+    return df.groupby(group_cols)['sales'].agg(['count', 'sum', 'mean', 'max', 'min', 'std', 'median'])
+
+
+@pytest.mark.parametrize('group_cols', [['region'], ['region', 'channel']])
+def test_combined_statistics_match_concatenated_frame(paths, group_cols):
+    result = combined_statistics(paths, group_cols, 'sales', FUNCS)
+    expected = _expected(paths, group_cols)
+    expected.columns = FUNCS
+    # 空值分组键的行不计入任何分组，不相交的分组各自保留
+    assert set(result.index.get_level_values(0)) == {'north', 'south', 'east', 'west', 'central', 'solo'}
+    assert result.index.tolist() == expected.index.tolist()
+    # 各文件的分类列类别不同，分组键的类型与拼接后的不同，只比较取值
+    result.index = expected.index
+    exact = ['计数', '最大值', '最小值']
+    tm.assert_frame_equal(result[exact], expected[exact], check_exact=True, check_dtype=False, check_names=False)
+    # 求和、平均值与标准差只有浮点运算顺序带来的差异
+    tm.assert_frame_equal(result[['求和', '平均值', '标准差']], expected[['求和', '平均值', '标准差']],
+                          rtol=1e-12, atol=1e-9, check_names=False)
+
+    edges = median_edges(paths, 'sales')
+    width = edges[1] - edges[0]
+    assert len(edges) == COMBINED_MEDIAN_BINS + 1
+    assert (result['中位数'] - expected['中位数']).abs().max() <= width
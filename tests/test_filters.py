@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from filters import BitmapIndex, FilterIndexCache, OP_IN, filter_dataframe
+
+
+def _series(rows: int = 8000) -> pd.Series:
+    return pd.Series(np.arange(rows) % 50).astype(str)
+
+
+def test_cache_charges_bitmaps_built_after_insert():
+    cache = FilterIndexCache(10 ** 9)
+    series = _series()
+    index = cache.get(('f',), 'c', series)
+    assert isinstance(index, BitmapIndex)
+    before = cache.total_bytes
+    assert before == index.nbytes
+    index.isin(['1', '2', '3'])
+    assert index.nbytes > before
+    assert cache.total_bytes == index.nbytes
+
+
+def test_cache_evicts_when_index_grows_past_budget():
+    series = _series()
+    base = BitmapIndex(series).nbytes
+    cache = FilterIndexCache(2 * base + len(BitmapIndex(series).null_bits))
+    first = cache.get(('f',), 'a', series)
+    cache.get(('f',), 'b', series)
+    assert cache.total_bytes == 2 * base
+    # 第二个索引增加两个位图后超出预算，最久未使用的第一个索引被淘汰
+    second = cache.get(('f',), 'b', series)
+    second.isin(['1', '2'])
+    assert cache.total_bytes == second.nbytes
+    assert cache.get(('f',), 'a', series) is not first
+
+
+def test_filter_results_match_mask():
+    df = pd.DataFrame({'c': _series(1000)})
+    positions = filter_dataframe(df, [('c', OP_IN, ('1', '7'))], key=('f',))
+    expected = np.flatnonzero(df['c'].isin(['1', '7']).to_numpy())
+    np.testing.assert_array_equal(positions, expected)
@@ -0,0 +1,118 @@
+import io
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import PROFILE_HLL_PRECISION
+from ingest import append_to_parquet
+from loader import ingest_file, sidecar_path
+from schema import TEXT_KINDS
+from storage import APPENDED, STORED, UPDATED, FileStore
+
+
+def _frame(rows: int, start: int = 0, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = np.arange(start, start + rows)
+    return pd.DataFrame({
+        'id': ids,
+        'region': np.where(rng.random(rows) < 0.1, None, rng.choice(['north', 'south', 'east'], rows)),
+        'amount': np.round(rng.random(rows) * (100 + start), 2),
+        'day': (pd.Timestamp('2024-01-01') + pd.to_timedelta(ids % 400, unit='D')).strftime('%Y-%m-%d'),
+        # 不同值超过 PROFILE_KEEP_COUNTS_MAX，合并后的基数由HyperLogLog估算
+        'note': [f'note-{i % 2500}' for i in ids],
+    })
+
+
+def _csv(df: pd.DataFrame, header: bool = True) -> bytes:
+    return df.to_csv(index=False, header=header).encode('utf-8')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileStore(root=str(tmp_path / 'data'))
+
+
+def _upload(store: FileStore, content: bytes, name: str = 'sales.csv'):
+    status, path = store.store_upload(io.BytesIO(content), name)
+    entry = store.get_entry(name)
+    base = store.append_base(entry['hash'])
+    meta = ingest_file(path, base=(store.object_path(base['hash']), base['size']) if base else None)
+    store.record_ingest(entry['hash'], meta)
+    return status, path, meta
+
+
+def test_appended_rows_merge_into_full_profile(store, tmp_path):
+    first = _csv(_frame(3000))
+    # 新增的行扩大了 id、amount 与 day 的取值范围并带有空值
+    appended = first + _csv(_frame(1000, start=3000, seed=1), header=False)
+    assert _upload(store, first)[0] == STORED
+
+    status, path, meta = _upload(store, appended)
+    assert status == APPENDED
+    assert meta['base_rows'] == 3000
+    assert store.get_entry('sales.csv')['rows'] == 4000
+    assert 'append_base' not in store.get_entry('sales.csv')
+
+    full_path = str(tmp_path / 'full.csv')
+    shutil.copyfile(path, full_path)
+    full = ingest_file(full_path)
+    assert 'base_rows' not in full
+    assert meta['schema'] == full['schema']
+    assert meta['columns'] == full['columns']
+    pd.testing.assert_frame_equal(pd.read_parquet(sidecar_path(path)), pd.read_parquet(sidecar_path(full_path)))
+
+    for col, expected in full['profile']['columns'].items():
+        merged = meta['profile']['columns'][col]
+        assert (merged['nulls'], merged['min'], merged['max']) == (expected['nulls'], expected['min'], expected['max'])
+        if merged['distinct_exact']:
+            assert merged['distinct'] == expected['distinct']
+            assert merged['top'] == expected['top']
+        else:
+            # 基数估算的相对误差约为 1.04/sqrt(2^p)，按三倍误差校验
+            tolerance = 3 * 1.04 / np.sqrt(2 ** PROFILE_HLL_PRECISION)
+            assert merged['distinct'] == pytest.approx(expected['distinct'], rel=tolerance)
+    assert not meta['profile']['columns']['note']['distinct_exact']
+
+
+def test_changed_earlier_row_is_not_an_append(store):
+    df = _frame(200)
+    _upload(store, _csv(df))
+    changed = df.copy()
+    changed.loc[5, 'amount'] = 12345.5
+    status, _, meta = _upload(store, _csv(changed) + _csv(_frame(50, start=200), header=False))
+    assert status == UPDATED
+    assert 'base_rows' not in meta
+    assert meta['rows'] == 250
+
+
+def test_changed_header_is_not_an_append(store):
+    df = _frame(200)
+    _upload(store, _csv(df))
+    renamed = df.rename(columns={'amount': 'total'})
+    status, _, meta = _upload(store, _csv(renamed) + _csv(_frame(50, start=200), header=False))
+    assert status == UPDATED
+    assert 'total' in meta['schema']
+
+
+def test_appended_rows_that_widen_a_column_fall_back_to_full_import(store, tmp_path):
+    first = _csv(_frame(200))
+    tail = _frame(50, start=200)
+    tail['amount'] = tail['amount'].astype(object)
+    tail.loc[10, 'amount'] = 'pending'
+    _, base_path, _ = _upload(store, first)
+    content = first + _csv(tail, header=False)
+
+    # 增量导入拒绝改变列类型的新增行
+    probe = str(tmp_path / 'probe.csv')
+    with open(probe, 'wb') as f:
+        f.write(content)
+    with pytest.raises(ValueError):
+        append_to_parquet(base_path, sidecar_path(base_path), probe, len(first), sidecar_path(probe))
+
+    status, _, meta = _upload(store, content)
+    assert status == APPENDED
+    assert 'base_rows' not in meta
+    assert meta['rows'] == 250
+    assert meta['schema']['amount'] in TEXT_KINDS
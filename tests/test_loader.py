@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from compaction import compact_dataframe
+from loader import map_arrow, write_arrow
+
+
+def test_mapped_dataset_matches_compacted_frame(tmp_path):
+    rows = 1000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'region': rng.choice(['north', 'south', None], rows),
+        'customer': [f'C{i:05d}' for i in rng.integers(0, 400, rows)],
+        'value': rng.random(rows),
+    })
+    compacted, report = compact_dataframe(df)
+    assert isinstance(compacted['customer'].dtype, pd.CategoricalDtype)
+    filepath = str(tmp_path / 'data.csv')
+    assert write_arrow(filepath, compacted, report)
+
+    mapped, mapped_report = map_arrow(filepath)
+    pd.testing.assert_frame_equal(mapped, compacted)
+    pd.testing.assert_frame_equal(mapped_report, report, check_dtype=False)
+    # 分类列的编码直接引用映射的页面
+    assert not mapped['customer'].array.codes.flags.writeable
+    assert mapped['region'].isna().sum() == df['region'].isna().sum()
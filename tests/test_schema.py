@@ -0,0 +1,53 @@
+import datetime
+
+import pandas as pd
+
+from loader import ingest_file, load_dataframe
+from schema import apply_schema, infer_and_convert, merge_kind, propose_kind
+
+
+def test_timestamp_column_without_keyword_keeps_time():
+    values = pd.Series(['2024-01-02 10:30:00', '2024-01-03 00:00:00', None])
+    assert propose_kind('ts', values) == ('datetime', '%Y-%m-%d %H:%M:%S')
+    df, kinds, _ = infer_and_convert(pd.DataFrame({'ts': values}))
+    assert kinds['ts'] == 'datetime'
+    assert df['ts'].iloc[0] == pd.Timestamp('2024-01-02 10:30:00')
+    assert df['ts'].isna().iloc[2]
+
+
+def test_midnight_values_are_dates():
+    values = pd.Series(['2024-01-02 00:00:00', '2024-01-03 00:00:00'])
+    assert propose_kind('ts', values)[0] == 'date'
+    df, kinds, _ = infer_and_convert(pd.DataFrame({'day': ['2024-01-02', '2024-01-03']}))
+    assert kinds['day'] == 'date'
+    assert df['day'].iloc[0] == datetime.date(2024, 1, 2)
+
+
+def test_date_column_widens_when_later_rows_have_times():
+    # 样本只含零点时推断为日期，后续数据块出现含时刻的值时放宽为日期时间而不是截断
+    fmt = '%Y-%m-%d %H:%M:%S'
+    chunk = pd.DataFrame({'ts': ['2024-01-01 00:00:00', '2024-01-05 08:15:00']})
+    assert apply_schema(chunk, {'ts': 'date'}, {'ts': fmt}) == {'ts': ('datetime', fmt)}
+    assert apply_schema(chunk, {'ts': 'datetime'}, {'ts': fmt}) == {}
+    assert chunk['ts'].iloc[1] == pd.Timestamp('2024-01-05 08:15:00')
+
+
+def test_merge_date_kinds():
+    fmt = '%Y-%m-%d %H:%M:%S'
+    assert merge_kind(('date', fmt), ('datetime', fmt)) == ('datetime', fmt)
+    assert merge_kind(('datetime', fmt), ('date', '%Y-%m-%d')) == ('datetime', None)
+    assert merge_kind(('date', None), ('string', None)) == ('string', None)
+
+
+def test_streamed_ingest_keeps_time_of_day(tmp_path):
+    path = str(tmp_path / 'events.csv')
+    pd.DataFrame({
+        'ts': ['2024-01-02 10:30:00', '2024-01-02 23:59:59', ''],
+        'day': ['2024-01-02', '2024-01-03', '2024-01-04'],
+        'n': [1, 2, 3],
+    }).to_csv(path, index=False)
+    meta = ingest_file(path)
+    assert meta['schema'] == {'ts': 'datetime', 'day': 'date', 'n': 'int'}
+    df = load_dataframe(path)
+    assert df['ts'].iloc[1] == pd.Timestamp('2024-01-02 23:59:59')
+    assert df['day'].iloc[0] == datetime.date(2024, 1, 2)
@@ -0,0 +1,90 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from aggregation import aggregation_cache
+from filters import OP_IN, filter_dataframe, filter_index_cache
+from loader import get_file_key, ingest_file, invalidate_file, load_dataframe
+from pagination import cached_sort_permutation, sort_cache_key, sort_permutation_cache
+from search import ColumnSearchIndex, SearchIndex, SearchIndexCache, search_dataframe, search_index_cache
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'name': ['banana', None, 'nano', np.nan, 'Banana split'],
+        'value': [1.5, np.nan, 2.0, np.nan, 3.25],
+    })
+
+
+def test_nulls_are_not_indexed():
+    index = ColumnSearchIndex(_frame()['name'])
+    assert list(index.strings) == ['banana', 'nano', 'Banana split']
+    assert list(index.postings['nan']) == [0, 1, 2]
+    assert list(index.codes) == [0, -1, 1, -1, 2]
+    assert not index.match('None').any()
+
+
+def test_search_for_nan_does_not_match_nulls():
+    df = _frame()
+    index = SearchIndex(len(df))
+    np.testing.assert_array_equal(index.search(df, 'nan'), [0, 2, 4])
+    np.testing.assert_array_equal(index.search(df, 'nan', columns=['value']), [])
+    np.testing.assert_array_equal(index.search(df, '^$', regex=True), [])
+
+
+def test_extended_keeps_nulls_out():
+    df = _frame()
+    base = SearchIndex(len(df))
+    base.search(df, 'ban')
+    appended = pd.concat([df, pd.DataFrame({'name': [None, 'cabana', 'nano'], 'value': [np.nan, 1.0, 4.0]})],
+                         ignore_index=True)
+    extended = base.extended(appended, len(df))
+    np.testing.assert_array_equal(extended.search(appended, 'nan'),
+                                  SearchIndex(len(appended)).search(appended, 'nan'))
+    np.testing.assert_array_equal(extended.search(appended, 'ban', columns=['name']), [0, 4, 6])
+    assert extended.column(appended, 'name').codes[5] == -1
+
+
+def test_cache_does_not_keep_dataframes_alive():
+    cache = SearchIndexCache(10 ** 9)
+    df = _frame()
+    cache.get(('f',), df).search(df, 'ban')
+    ref = weakref.ref(df)
+    del df
+    gc.collect()
+    assert ref() is None
+    assert cache.total_bytes == cache.peek(('f',)).nbytes > 0
+
+
+def test_cache_evicts_by_bytes_as_columns_are_indexed():
+    df = pd.DataFrame({'name': [f'item {i}' for i in range(2000)]})
+    probe = SearchIndex(len(df))
+    probe.search(df, 'item')
+    cache = SearchIndexCache(int(probe.nbytes * 1.5))
+    cache.get(('a',), df).search(df, 'item')
+    assert cache.peek(('a',)) is not None
+    # 第二个文件建立列索引后超出预算，最久未使用的索引被淘汰
+    cache.get(('b',), df).search(df, 'item')
+    assert cache.peek(('a',)) is None
+    assert cache.total_bytes == probe.nbytes
+
+
+def test_invalidate_file_drops_derived_indexes(tmp_path):
+    path = str(tmp_path / 'names.csv')
+    _frame().to_csv(path, index=False)
+    ingest_file(path)
+    key = get_file_key(path)
+    df = load_dataframe(path)
+    search_dataframe(df, 'ban', key=key)
+    filter_dataframe(df, [('name', OP_IN, ('nano',))], key=key)
+    cached_sort_permutation(key, df, ['value'], [True])
+    aggregation_cache.aggregate(df, key, ['name'], 'value', ['count'])
+    assert search_index_cache.peek(key) is not None
+
+    invalidate_file(path)
+    assert search_index_cache.peek(key) is None
+    assert not [k for k, _ in filter_index_cache._entries.items() if k[0] == key]
+    assert sort_permutation_cache.get(sort_cache_key(key, ['value'], [True])) is None
+    assert aggregation_cache.entries_of(key) == []
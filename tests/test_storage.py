@@ -0,0 +1,86 @@
+import io
+import os
+
+import pytest
+
+from loader import ingest_file, sidecar_path
+from storage import DUPLICATE, MANIFEST_NAME, READY, STORED, UNCHANGED, FileStore
+
+CONTENT = b'region,sales\nnorth,1\nsouth,2\n'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FileStore(root=str(tmp_path))
+
+
+def _objects(store: FileStore) -> list:
+    return sorted(f for f in os.listdir(store.objects_dir) if f.endswith('.csv'))
+
+
+def _upload(store: FileStore, name: str, content: bytes = CONTENT):
+    return store.store_upload(io.BytesIO(content), name, chunk_size=8)
+
+
+def test_identical_uploads_share_one_object(store):
+    status, path = _upload(store, 'a.csv')
+    assert status == STORED
+    content_hash = store.get_entry('a.csv')['hash']
+    store.record_ingest(content_hash, ingest_file(path))
+
+    assert _upload(store, 'a.csv') == (UNCHANGED, path)
+    assert _upload(store, 'b.csv') == (DUPLICATE, path)
+    assert _objects(store) == [content_hash + '.csv']
+    # 相同内容复用已有的导入结果
+    entry = store.get_entry('b.csv')
+    assert (entry['status'], entry['rows'], entry['schema']) == (READY, 2, store.get_entry('a.csv')['schema'])
+
+
+def test_shared_object_is_kept_until_last_name_is_deleted(store):
+    _, path = _upload(store, 'a.csv')
+    _upload(store, 'b.csv')
+    ingest_file(path)
+
+    assert store.delete('a.csv')
+    assert store.list_files() == ['b.csv']
+    assert store.path_of('b.csv') == path
+    assert os.path.exists(path) and os.path.exists(sidecar_path(path))
+
+    assert store.delete('b.csv')
+    assert not store.delete('b.csv')
+    assert store.list_files() == []
+    assert not os.path.exists(path) and not os.path.exists(sidecar_path(path))
+
+
+def test_legacy_files_are_migrated_without_manifest(tmp_path):
+    for name in ('x.csv', 'y.csv'):
+        (tmp_path / name).write_bytes(CONTENT)
+    (tmp_path / 'z.csv').write_bytes(b'a\n1\n')
+    ingest_file(str(tmp_path / 'x.csv'))
+    assert os.path.exists(sidecar_path(str(tmp_path / 'x.csv')))
+
+    store = FileStore(root=str(tmp_path))
+    assert store.list_files() == ['x.csv', 'y.csv', 'z.csv']
+    assert store.get_entry('x.csv')['hash'] == store.get_entry('y.csv')['hash']
+    assert len(_objects(store)) == 2
+    assert all(store.status_of(name) == READY for name in store.list_files())
+    assert open(store.path_of('y.csv'), 'rb').read() == CONTENT
+    # 旧文件及其旁路文件已移走，清单已写入
+    assert sorted(os.listdir(tmp_path)) == [MANIFEST_NAME, 'objects']
+    assert FileStore(root=str(tmp_path)).list_files() == ['x.csv', 'y.csv', 'z.csv']
+
+
+def test_manifest_is_reloaded_when_changed_on_disk(tmp_path):
+    store = FileStore(root=str(tmp_path))
+    other = FileStore(root=str(tmp_path))
+    _upload(store, 'a.csv')
+    manifest = store._load()
+    # 清单未变化时使用内存中的副本
+    assert store._load() is manifest
+
+    # 另一个进程写入了清单
+    _upload(other, 'b.csv', b'region,sales\neast,3\n')
+    mtime = os.path.getmtime(store.manifest_path) + 1
+    os.utime(store.manifest_path, (mtime, mtime))
+    assert store.list_files() == ['a.csv', 'b.csv']
+    assert store.get_entry('b.csv') == other.get_entry('b.csv')
@@ -1,5 +1,5 @@
 import streamlit as st
-from config import USERS, SESSION_STATE_USER, SESSION_STATE_AUTHENTICATED
+from config import USERS, USER_ROLES, DEFAULT_ROLE, ROLE_ADMIN, SESSION_STATE_USER, SESSION_STATE_AUTHENTICATED
 
 def login(username: str, password: str) -> bool:
     """
@@ -34,6 +34,20 @@ def get_current_user() -> str:
     return "访客"
     # return st.session_state.get(SESSION_STATE_USER, None)
 
+def get_user_role(username: str = None) -> str:
+    """
+    获取用户角色，默认为当前用户
+    """
+    if username is None:
+        username = get_current_user()
+    return USER_ROLES.get(username, DEFAULT_ROLE)
+
+def is_admin() -> bool:
+    """
+    检查当前用户是否为管理员
+    """
+    return get_user_role() == ROLE_ADMIN
+
 def show_login_page():
     """
     显示登录页面